@@ -0,0 +1,121 @@
+"""
+Adaptive Concurrency cho OMDb API
+Điều chỉnh số request đồng thời theo kiểu AIMD (tăng cộng, giảm nhân)
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+class AIMDConcurrencyLimiter:
+    """
+    Giới hạn số request đang chạy (in-flight) bằng một cửa sổ thay đổi theo tình trạng server
+
+    - Request thành công và latency bình thường: window += increase / window
+      (tăng khoảng `increase` sau mỗi vòng đầy cửa sổ)
+    - 429 / 5xx / timeout hoặc latency trung bình (EWMA) vượt latency_tolerance
+      lần mức nền: window *= decrease_factor
+    - Chỉ giảm một lần cho mỗi đợt quá tải: request bắt đầu trước lần giảm gần
+      nhất thì không làm giảm thêm
+
+    Mức latency nền là phân vị 10% của `latency_window` request gần nhất.
+    """
+
+    MIN_SAMPLES = 20
+    EWMA_ALPHA = 0.1
+
+    def __init__(self, initial: float = 4, min_limit: int = 1, max_limit: int = 64,
+                 increase: float = 1.0, decrease_factor: float = 0.5,
+                 latency_tolerance: float = 3.0, latency_window: int = 200):
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor phải nằm trong khoảng (0, 1)")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+
+        self._window = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._latencies = deque(maxlen=latency_window)
+        self._latency_ewma: Optional[float] = None
+        self._ewma_samples = 0
+        self._condition = threading.Condition()
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def window(self) -> float:
+        """Kích thước cửa sổ hiện tại (số request đồng thời cho phép)"""
+        return self._window
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> float:
+        """Chờ tới khi còn chỗ trong cửa sổ; trả về thời điểm bắt đầu (truyền lại cho release)"""
+        with self._condition:
+            while self._in_flight >= max(self.min_limit, math.floor(self._window)):
+                self._condition.wait()
+            self._in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, latency: Optional[float] = None, overloaded: bool = False):
+        """
+        Báo kết quả của một request
+
+        Args:
+            started: giá trị acquire() trả về
+            latency: thời gian request (giây), None nếu lỗi kết nối
+            overloaded: server báo quá tải (429, 5xx, timeout)
+        """
+        with self._condition:
+            self._in_flight -= 1
+
+            if latency is not None and not overloaded:
+                self._latencies.append(latency)
+                self._latency_ewma = (latency if self._latency_ewma is None else
+                                      self._latency_ewma + self.EWMA_ALPHA * (latency - self._latency_ewma))
+                self._ewma_samples += 1
+                baseline = self._baseline_latency()
+                if (baseline is not None and self._ewma_samples >= self.MIN_SAMPLES // 2
+                        and self._latency_ewma > baseline * self.latency_tolerance):
+                    overloaded = True
+
+            if overloaded:
+                if started >= self._last_decrease:
+                    self._window = max(self.min_limit, self._window * self.decrease_factor)
+                    self._last_decrease = time.monotonic()
+                    self.decreases += 1
+                    # Đo lại latency sau khi giảm để không giảm liên tiếp vì số liệu cũ
+                    self._latency_ewma = None
+                    self._ewma_samples = 0
+            elif self._window < self.max_limit:
+                self._window = min(self.max_limit, self._window + self.increase / self._window)
+                self.increases += 1
+
+            self._condition.notify_all()
+
+    def _baseline_latency(self) -> Optional[float]:
+        if len(self._latencies) < self.MIN_SAMPLES:
+            return None
+        return sorted(self._latencies)[len(self._latencies) // 10]
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                'window': round(self._window, 2),
+                'in_flight': self._in_flight,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'baseline_latency_ms': (None if self._baseline_latency() is None
+                                        else round(self._baseline_latency() * 1000, 2)),
+                'latency_ewma_ms': None if self._latency_ewma is None else round(self._latency_ewma * 1000, 2),
+            }
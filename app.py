@@ -11,6 +11,8 @@ from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 import os
 
+from processed_schema import load_processed_data
+
 # ==================== CẤU HÌNH TRANG ====================
 
 st.set_page_config(
@@ -67,13 +69,8 @@ def load_data():
     """Load dữ liệu đã xử lý"""
     data_path = 'data/processed_movies.csv'
     if os.path.exists(data_path):
-        df = pd.read_csv(data_path, encoding='utf-8-sig')
-        # Chuyển đổi kiểu dữ liệu
-        if 'Year' in df.columns:
-            df['Year'] = pd.to_numeric(df['Year'], errors='coerce')
-        if 'Rating' in df.columns:
-            df['Rating'] = pd.to_numeric(df['Rating'], errors='coerce')
-        return df
+        # Schema gọn (category, int16, float32) - xem processed_schema.py
+        return load_processed_data(data_path)
     else:
         st.error("❌ Không tìm thấy file dữ liệu! Vui lòng chạy data_collection.py và data_preprocessing.py trước.")
         st.stop()
@@ -143,6 +140,10 @@ if selected_country != 'Tất cả' and country_col:
 if rating_min > 0:
     df_filtered = df_filtered[df_filtered['Rating'] >= rating_min]
 
+# Bỏ các category không còn phim sau khi lọc để value_counts/biểu đồ không hiện nhóm rỗng
+category_cols = df_filtered.select_dtypes(include='category').columns
+df_filtered = df_filtered.assign(**{col: df_filtered[col].cat.remove_unused_categories() for col in category_cols})
+
 st.sidebar.markdown(f"**📊 Số phim sau lọc: {len(df_filtered)}**")
 
 # ==================== TAB NAVIGATION ====================
@@ -0,0 +1,375 @@
+"""
+Async Data Collection Script for IMDb Movie Data
+Phiên bản asyncio của MovieDataCollector (dùng aiohttp)
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+import pandas as pd
+
+from collection_metrics import CollectionMetrics
+from data_collection import OMDB_MAX_PAGES, OMDB_PAGE_SIZE, POPULAR_QUERIES, is_cacheable_response
+from omdb_transport import OMDbTransportError, RetryPolicy
+from rate_limiter import QuotaExceededError, TokenBucketRateLimiter
+from response_cache import OMDbResponseCache
+
+
+class AsyncMovieDataCollector:
+    """
+    Thu thập dữ liệu phim từ OMDb API bằng asyncio
+
+    Tất cả request dùng chung một aiohttp.ClientSession (connection pool),
+    số request đồng thời được giới hạn bằng semaphore. Timeout, lỗi kết nối, 429 và 5xx
+    được thử lại theo cùng RetryPolicy với OMDbTransport.
+    """
+
+    def __init__(self, api_key: str, base_url: str = "http://www.omdbapi.com/",
+                 max_concurrency: int = 20, max_search_concurrency: int = 4,
+                 timeout: float = 10, rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                 cache: Optional[OMDbResponseCache] = None, observer: Optional[Callable] = None,
+                 metrics: Optional[CollectionMetrics] = None, retry_policy: Optional[RetryPolicy] = None):
+        self.api_key = api_key
+        # observer(params, status, elapsed, error, body) được gọi sau mỗi request HTTP (body: bytes đã đọc)
+        # (mặc định là metrics nếu có)
+        self.observer = observer or metrics
+        self.metrics = metrics
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.request_count = 0
+        self.retry_count = 0
+        if metrics is not None:
+            # Collector có retry_count / rate_limiter như OMDbTransport
+            metrics.attach(transport=self, cache=cache)
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.max_search_concurrency = max_search_concurrency
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._detail_sem: Optional[asyncio.Semaphore] = None
+        self._search_sem: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        await self._ensure_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _ensure_session(self):
+        """Tạo session và semaphore (phải gọi trong event loop đang chạy)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency + self.max_search_concurrency,
+                                             ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._detail_sem = asyncio.Semaphore(self.max_concurrency)
+            self._search_sem = asyncio.Semaphore(self.max_search_concurrency)
+
+    async def close(self):
+        """Đóng session và giải phóng connection pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _get_json(self, params: Dict) -> Dict:
+        # SQLite cache có khóa và I/O đồng bộ: chạy trong thread để không chặn event loop
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, params)
+            if self.metrics is not None:
+                self.metrics.record_cache(params, cached is not None)
+            if cached is not None:
+                return cached
+        data = await self._fetch_json(params)
+        if self.cache is not None and is_cacheable_response(data):
+            await asyncio.to_thread(self.cache.put, params, data)
+        return data
+
+    async def _acquire_token(self):
+        """Lấy token của rate limiter; khóa file (fcntl) chạy trong thread, chờ bằng asyncio.sleep"""
+        while True:
+            wait = await asyncio.to_thread(self.rate_limiter.try_acquire)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def _fetch_json(self, params: Dict) -> Dict:
+        """
+        Gửi GET tới OMDb và trả về JSON, thử lại theo retry_policy
+
+        Raises:
+            OMDbTransportError: nếu vẫn lỗi sau retry_policy.max_retries lần thử lại
+            QuotaExceededError: nếu rate_limiter báo đã hết hạn mức trong ngày
+        """
+        await self._ensure_session()
+        policy = self.retry_policy
+        last_error: Optional[BaseException] = None
+
+        for attempt in range(policy.max_retries + 1):
+            retry_after = None
+            if self.rate_limiter is not None:
+                await self._acquire_token()
+            self.request_count += 1
+            if attempt > 0:
+                self.retry_count += 1
+            started = time.perf_counter()
+            try:
+                async with self._session.get(self.base_url, params=params) as response:
+                    payload = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                if self.observer is not None:
+                    self.observer(params, None, time.perf_counter() - started, e, None)
+            else:
+                if self.observer is not None:
+                    # Truyền body đã đọc (đã giải nén) để số bytes giống OMDbTransport (len(response.content))
+                    self.observer(params, response.status, time.perf_counter() - started, None, payload)
+                if not policy.should_retry(response.status):
+                    # OMDb đôi khi trả content-type text/html nên tự parse JSON;
+                    # lỗi 4xx (vd. 401 Invalid API key) vẫn có JSON mô tả lỗi
+                    try:
+                        return json.loads(payload)
+                    except ValueError:
+                        if response.status == 200:
+                            return {}
+                        raise OMDbTransportError(f"HTTP {response.status}") from None
+                last_error = OMDbTransportError(f"HTTP {response.status}")
+                retry_after = policy.parse_retry_after(response.headers)
+
+            if attempt < policy.max_retries:
+                await asyncio.sleep(policy.delay(attempt, retry_after))
+
+        raise OMDbTransportError(
+            f"Thất bại sau {policy.max_retries + 1} lần thử: {last_error}"
+        ) from last_error
+
+    async def _search_page(self, query: str, year: str = None, page: int = 1) -> Dict:
+        """Gọi API tìm kiếm cho một trang kết quả"""
+        params = {
+            'apikey': self.api_key,
+            's': query,
+            'type': 'movie'
+        }
+        if year:
+            params['y'] = year
+        if page > 1:
+            params['page'] = page
+
+        await self._ensure_session()
+        async with self._search_sem:
+            return await self._get_json(params)
+
+    async def search_movies(self, query: str, year: str = None, max_pages: int = 1,
+                            on_page: Callable[[int, List[Dict]], None] = None) -> Optional[List[Dict]]:
+        """
+        Tìm kiếm phim theo từ khóa (None nếu API key không hợp lệ)
+
+        Các trang sau trang đầu được tải đồng thời; on_page(page, movies) được gọi
+        ngay khi từng trang về để pipeline bắt đầu lấy chi tiết sớm.
+        """
+        try:
+            data = await self._search_page(query, year)
+            if data.get('Response') != 'True':
+                if 'Invalid API key' in data.get('Error', ''):
+                    if self.metrics is not None:
+                        self.metrics.record_error('invalid_api_key')
+                    print("\n❌ API key không hợp lệ! Vui lòng kiểm tra lại.")
+                    return None  # Signal to stop
+                return []
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            print(f"  ⚠️ Lỗi khi tìm kiếm '{query}': {e!r}")
+            if self.metrics is not None:
+                self.metrics.record_error('search_failed')
+            return []
+
+        pages_results = {1: data.get('Search', [])}
+        if on_page is not None:
+            on_page(1, pages_results[1])
+
+        try:
+            total_results = int(data.get('totalResults', len(pages_results[1])))
+        except ValueError:
+            total_results = len(pages_results[1])
+        total_pages = min(OMDB_MAX_PAGES, -(-total_results // OMDB_PAGE_SIZE))
+        pages = total_pages if max_pages is None else min(total_pages, max_pages)
+
+        async def fetch_page(page: int):
+            try:
+                page_data = await self._search_page(query, year, page)
+            except QuotaExceededError:
+                raise
+            except Exception as e:
+                print(f"  ⚠️ Lỗi khi tìm kiếm '{query}' trang {page}: {e!r}")
+                if self.metrics is not None:
+                    self.metrics.record_error('search_failed')
+                return
+            if page_data.get('Response') == 'True':
+                pages_results[page] = page_data.get('Search', [])
+                if on_page is not None:
+                    on_page(page, pages_results[page])
+
+        await asyncio.gather(*(fetch_page(page) for page in range(2, pages + 1)))
+        return [movie for page in sorted(pages_results) for movie in pages_results[page]]
+
+    async def get_movie_details(self, imdb_id: str) -> Dict:
+        """Lấy thông tin chi tiết của một phim"""
+        params = {
+            'apikey': self.api_key,
+            'i': imdb_id,
+            'plot': 'full'
+        }
+
+        try:
+            await self._ensure_session()
+            async with self._detail_sem:
+                data = await self._get_json(params)
+            if data.get('Response') == 'True':
+                return data
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            print(f"  ⚠️ Lỗi khi lấy chi tiết phim {imdb_id}: {e!r}")
+            if self.metrics is not None:
+                self.metrics.record_error('detail_failed')
+        return {}
+
+    async def collect_movies(self, queries: List[str], max_pages: int = 1) -> Optional[pd.DataFrame]:
+        """
+        Chạy tìm kiếm và lấy chi tiết theo kiểu pipeline
+
+        Chi tiết phim được lấy ngay khi trang tìm kiếm tương ứng trả về,
+        không đợi tất cả từ khóa tìm xong. Thứ tự kết quả giống
+        MovieDataCollector.collect_popular_movies (theo thứ tự xuất hiện
+        đầu tiên trong các từ khóa). Trả về None nếu API key không hợp lệ.
+        """
+        await self._ensure_session()
+
+        # imdbID -> (vị trí từ khóa, trang, vị trí trong trang) nhỏ nhất đã gặp
+        first_seen: Dict[str, tuple] = {}
+        details_by_id: Dict[str, Dict] = {}
+        detail_tasks: List[asyncio.Task] = []
+        invalid_key = asyncio.Event()
+        quota_exceeded = asyncio.Event()
+
+        async def fetch(imdb_id: str):
+            if quota_exceeded.is_set():
+                return
+            try:
+                details = await self.get_movie_details(imdb_id)
+            except QuotaExceededError:
+                quota_exceeded.set()
+                return
+            if details:
+                details_by_id[imdb_id] = details
+                if self.metrics is not None:
+                    self.metrics.record_titles()
+
+        async def search(query_index: int, query: str):
+            if quota_exceeded.is_set():
+                return
+
+            def on_page(page: int, movies: List[Dict]):
+                for position, movie in enumerate(movies):
+                    imdb_id = movie.get('imdbID')
+                    if not imdb_id:
+                        continue
+                    key = (query_index, page, position)
+                    if imdb_id not in first_seen:
+                        first_seen[imdb_id] = key
+                        detail_tasks.append(asyncio.create_task(fetch(imdb_id)))
+                    elif key < first_seen[imdb_id]:
+                        # Từ khóa đứng trước trả về muộn hơn: chỉ cập nhật thứ tự
+                        first_seen[imdb_id] = key
+
+            try:
+                movies = await self.search_movies(query, max_pages=max_pages, on_page=on_page)
+            except QuotaExceededError as e:
+                if not quota_exceeded.is_set():
+                    print(f"\n⛔ {e}. Dừng thu thập và lưu kết quả hiện có.")
+                    if self.metrics is not None:
+                        self.metrics.record_error('quota_exceeded')
+                quota_exceeded.set()
+                return
+            if movies is None:
+                invalid_key.set()
+                return
+            print(f"📍 [{query_index + 1}/{len(queries)}] {query}: {len(movies)} kết quả")
+
+        await asyncio.gather(*(search(i, q) for i, q in enumerate(queries)))
+
+        if invalid_key.is_set():
+            for task in detail_tasks:
+                task.cancel()
+            await asyncio.gather(*detail_tasks, return_exceptions=True)
+            return None
+
+        await asyncio.gather(*detail_tasks)
+
+        ordered_ids = sorted(details_by_id, key=first_seen.__getitem__)
+        return pd.DataFrame([details_by_id[imdb_id] for imdb_id in ordered_ids])
+
+    async def collect_popular_movies(self, queries: List[str], save_path: str = 'data/raw_movies.csv',
+                                     max_pages: int = 1):
+        """
+        Thu thập dữ liệu từ danh sách các từ khóa phổ biến (async)
+
+        Args:
+            queries: Danh sách các từ khóa tìm kiếm
+            save_path: Đường dẫn lưu file
+            max_pages: Số trang kết quả tìm kiếm tối đa cho mỗi từ khóa (None = tất cả)
+        """
+        print(f"🎬 Bắt đầu thu thập (async) dữ liệu từ {len(queries)} từ khóa...")
+        try:
+            df = await self.collect_movies(queries, max_pages=max_pages)
+        finally:
+            await self.close()
+
+        if df is None:
+            print("\n❌ Dừng thu thập do API key không hợp lệ!")
+            return pd.DataFrame()
+
+        # Tạo thư mục nếu chưa tồn tại
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+
+        df.to_csv(save_path, index=False, encoding='utf-8-sig')
+        print(f"\n✅ Đã lưu {len(df)} phim vào {save_path}")
+        if self.metrics is not None:
+            print(f"📊 Số liệu: {self.metrics.summary_line()}")
+
+        return df
+
+
+def main():
+    """Chạy thu thập async với danh sách từ khóa mặc định"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    api_key = os.getenv('OMDB_API_KEY')
+    if not api_key or api_key == 'your_api_key_here':
+        print("⚠️ Không tìm thấy API key. Tạo file .env với nội dung: OMDB_API_KEY=your_key")
+        return
+
+    metrics_dir = os.getenv('OMDB_METRICS_DIR', 'data/metrics')
+    metrics = CollectionMetrics(json_path=os.path.join(metrics_dir, 'omdb_collection_async.json'),
+                                prometheus_path=os.path.join(metrics_dir, 'omdb_collection_async.prom'),
+                                job='omdb_collection_async')
+    if os.getenv('OMDB_METRICS_FLUSH_SEC'):
+        metrics.start_periodic_flush(float(os.environ['OMDB_METRICS_FLUSH_SEC']))
+    collector = AsyncMovieDataCollector(api_key, metrics=metrics)
+    try:
+        asyncio.run(collector.collect_popular_movies(POPULAR_QUERIES))
+    finally:
+        metrics.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Attribute Index
+Bảng bridge chuẩn hóa (movie_id -> attribute_code) và ma trận multi-hot thưa (scipy.sparse)
+cho các thuộc tính nhiều giá trị ghép bằng dấu phẩy: Genre, Country, Language, Director, Actors.
+Truy vấn kiểu "phim có genre X" hay "đếm phim theo mọi genre" thành phép toán trên mảng số nguyên
+thay vì tách chuỗi ở mỗi lần truy vấn.
+
+movie_id là vị trí dòng (0-based) trong DataFrame / file processed dùng để xây index.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Thuộc tính -> các tên cột có thể chứa nó (cột đầu tiên có trong DataFrame được dùng)
+MULTI_VALUED_ATTRIBUTES = {
+    'Genre': ['Genre', 'genre'],
+    'Country': ['Country'],
+    'Language': ['Language'],
+    'Director': ['Director'],
+    'Actors': ['Actors'],
+}
+
+# Giá trị coi như thiếu (handle_missing_values điền 'Unknown', OMDb trả 'N/A')
+MISSING_VALUES = ['', 'Unknown', 'N/A']
+
+
+def attribute_index_dir(csv_path: str) -> str:
+    """Thư mục attribute index đi kèm processed CSV (vd. data/processed_movies.attribute_index)"""
+    return os.path.splitext(csv_path)[0] + '.attribute_index'
+
+
+def load_attribute_index(csv_path: str, n_movies: Optional[int] = None) -> Optional['AttributeIndex']:
+    """
+    Đọc attribute index đã lưu cùng processed CSV
+
+    Trả về None nếu chưa có, cũ hơn CSV (index được ghi sau CSV) hoặc số phim khác n_movies
+    """
+    directory = attribute_index_dir(csv_path)
+    meta_path = os.path.join(directory, 'index.json')
+    if not os.path.exists(meta_path):
+        return None
+    if os.path.exists(csv_path) and os.path.getmtime(meta_path) < os.path.getmtime(csv_path):
+        return None
+    index = AttributeIndex.load(directory)
+    if n_movies is not None and index.n_movies != n_movies:
+        return None
+    return index
+
+
+class AttributeIndex:
+    """
+    Index các thuộc tính nhiều giá trị
+
+    Với mỗi thuộc tính:
+        vocabularies[attr]  - pd.Index các giá trị (vị trí = attribute_code, sắp xếp theo chữ cái)
+        bridges[attr]       - DataFrame (movie_id int32, code int32), mỗi cặp một dòng
+        matrix(attr)        - csr_matrix (n_movies x n_values), 1 nếu phim có giá trị đó
+    """
+
+    def __init__(self, n_movies: int, vocabularies: Dict[str, pd.Index], bridges: Dict[str, pd.DataFrame]):
+        self.n_movies = n_movies
+        self.vocabularies = vocabularies
+        self.bridges = bridges
+        self._matrices: Dict[str, sparse.csr_matrix] = {}
+        self._columns: Dict[str, sparse.csc_matrix] = {}
+
+    @property
+    def attributes(self) -> List[str]:
+        return list(self.vocabularies)
+
+    def matrix(self, attribute: str) -> sparse.csr_matrix:
+        """Ma trận multi-hot (phim x giá trị) của thuộc tính"""
+        if attribute not in self._matrices:
+            bridge = self.bridges[attribute]
+            self._matrices[attribute] = sparse.csr_matrix(
+                (np.ones(len(bridge), dtype=np.int8), (bridge['movie_id'].to_numpy(), bridge['code'].to_numpy())),
+                shape=(self.n_movies, len(self.vocabularies[attribute])),
+            )
+        return self._matrices[attribute]
+
+    def _csc(self, attribute: str) -> sparse.csc_matrix:
+        if attribute not in self._columns:
+            self._columns[attribute] = self.matrix(attribute).tocsc()
+        return self._columns[attribute]
+
+    def codes(self, attribute: str, values: Iterable[str]) -> np.ndarray:
+        """attribute_code của các giá trị (giá trị không có trong index bị bỏ qua)"""
+        codes = self.vocabularies[attribute].get_indexer(list(values))
+        return codes[codes >= 0]
+
+    def movies_with(self, attribute: str, value: str) -> np.ndarray:
+        """movie_id (đã sắp xếp) của các phim có giá trị `value`"""
+        codes = self.codes(attribute, [value])
+        if not len(codes):
+            return np.empty(0, dtype=np.int32)
+        matrix = self._csc(attribute)
+        return np.sort(matrix.indices[matrix.indptr[codes[0]]:matrix.indptr[codes[0] + 1]])
+
+    def mask(self, attribute: str, values: Iterable[str], how: str = 'any') -> np.ndarray:
+        """
+        Mask boolean (độ dài n_movies) các phim có ít nhất một ('any') hoặc tất cả ('all')
+        các giá trị trong `values`
+        """
+        values = list(values)
+        codes = self.codes(attribute, values)
+        if how == 'all' and len(codes) < len(set(values)):
+            return np.zeros(self.n_movies, dtype=bool)
+        hits = self._csc(attribute)[:, codes].getnnz(axis=1)
+        return hits == len(codes) if how == 'all' else hits > 0
+
+    def counts(self, attribute: str) -> pd.Series:
+        """Số phim theo từng giá trị (giảm dần)"""
+        counts = self._csc(attribute).getnnz(axis=0)
+        return pd.Series(counts, index=self.vocabularies[attribute], name='Count').sort_values(
+            ascending=False, kind='stable')
+
+    def save(self, directory: str = 'data/processed_movies.attribute_index'):
+        """Lưu bridge table và bảng giá trị ra Parquet (ma trận dựng lại từ bridge khi đọc)"""
+        os.makedirs(directory, exist_ok=True)
+        for attribute, vocabulary in self.vocabularies.items():
+            pd.DataFrame({'code': np.arange(len(vocabulary), dtype=np.int32), 'value': vocabulary}) \
+                .to_parquet(os.path.join(directory, f"{attribute}_values.parquet"), index=False)
+            self.bridges[attribute].to_parquet(os.path.join(directory, f"{attribute}_bridge.parquet"), index=False)
+        meta_path = os.path.join(directory, 'index.json')
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'n_movies': self.n_movies, 'attributes': self.attributes}, f, indent=2)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @classmethod
+    def load(cls, directory: str = 'data/processed_movies.attribute_index') -> 'AttributeIndex':
+        with open(os.path.join(directory, 'index.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        vocabularies, bridges = {}, {}
+        for attribute in meta['attributes']:
+            values = pd.read_parquet(os.path.join(directory, f"{attribute}_values.parquet"))
+            vocabularies[attribute] = pd.Index(values['value'], name=attribute)
+            bridges[attribute] = pd.read_parquet(os.path.join(directory, f"{attribute}_bridge.parquet"))
+        return cls(meta['n_movies'], vocabularies, bridges)
+
+
+def _explode(values: pd.Series, offset: int) -> pd.DataFrame:
+    """Cặp (movie_id, giá trị) không trùng của một cột chuỗi ghép bằng dấu phẩy"""
+    text = pd.Series(values.astype(str).where(values.notna()).to_numpy(dtype=object), dtype='str')
+    long = pd.DataFrame({'movie_id': np.arange(offset, offset + len(values), dtype=np.int32),
+                         'value': text}).dropna()
+    long['value'] = long['value'].str.split(',')
+    long = long.explode('value', ignore_index=True)
+    long['value'] = long['value'].str.strip()
+    return long[~long['value'].isin(MISSING_VALUES)].drop_duplicates()
+
+
+class AttributeIndexBuilder:
+    """
+    Xây AttributeIndex theo từng phần (vd. từng chunk của chế độ out-of-core)
+
+    Mỗi lần add: tách dấu phẩy / explode / strip vector hóa từng thuộc tính, factorize theo
+    từ điển giá trị chung (mã tạm theo thứ tự gặp); build sắp xếp từ điển và đổi mã tạm sang
+    attribute_code. Chỉ giữ từ điển và các cặp (movie_id, code) int32, không giữ chuỗi gốc.
+    """
+
+    def __init__(self, attributes: Optional[Dict[str, List[str]]] = None):
+        self.attributes = MULTI_VALUED_ATTRIBUTES if attributes is None else attributes
+        self.n_movies = 0
+        self._sources: Optional[Dict[str, str]] = None
+        self._values: Dict[str, pd.Index] = {}
+        self._pairs: Dict[str, List[pd.DataFrame]] = {}
+
+    def add(self, df: pd.DataFrame) -> 'AttributeIndexBuilder':
+        """Thêm các phim của df (movie_id tiếp theo các phần đã thêm)"""
+        if self._sources is None:
+            self._sources = {}
+            for attribute, candidates in self.attributes.items():
+                column = next((col for col in candidates if col in df.columns), None)
+                if column is not None:
+                    self._sources[attribute] = column
+                    self._values[attribute] = pd.Index([], dtype=object)
+                    self._pairs[attribute] = []
+        for attribute, column in self._sources.items():
+            long = _explode(df[column], self.n_movies)
+            codes, uniques = pd.factorize(long['value'])
+            # Giá trị mới được nối vào cuối từ điển chung, mã tạm = vị trí trong từ điển
+            known = self._values[attribute]
+            new = uniques[known.get_indexer(uniques) < 0]
+            if len(new):
+                known = self._values[attribute] = known.append(pd.Index(new, dtype=object))
+            self._pairs[attribute].append(pd.DataFrame({
+                'movie_id': long['movie_id'].to_numpy(dtype=np.int32),
+                'code': known.get_indexer(uniques).astype(np.int32)[codes],
+            }))
+        self.n_movies += len(df)
+        return self
+
+    def build(self) -> AttributeIndex:
+        vocabularies, bridges = {}, {}
+        for attribute, values in (self._values or {}).items():
+            order = np.argsort(values.to_numpy(), kind='stable')
+            remap = np.empty(len(order), dtype=np.int32)
+            remap[order] = np.arange(len(order), dtype=np.int32)
+            vocabularies[attribute] = pd.Index(values.to_numpy()[order], dtype=object, name=attribute)
+            pairs = self._pairs[attribute]
+            bridge = pd.concat(pairs, ignore_index=True) if pairs else \
+                pd.DataFrame({'movie_id': np.empty(0, np.int32), 'code': np.empty(0, np.int32)})
+            bridge['code'] = remap[bridge['code'].to_numpy()]
+            bridges[attribute] = bridge.sort_values(['movie_id', 'code'], ignore_index=True)
+        return AttributeIndex(self.n_movies, vocabularies, bridges)
+
+
+def build_attribute_index(df: pd.DataFrame, attributes: Optional[Dict[str, List[str]]] = None) -> AttributeIndex:
+    """
+    Xây AttributeIndex cho cả DataFrame (một lần AttributeIndexBuilder.add)
+
+    Từng thuộc tính được xử lý riêng để bảng dạng dài tạm thời chỉ chứa một cột
+    (peak bộ nhớ bằng khoảng một nửa so với gom mọi cột vào một bảng).
+    """
+    return AttributeIndexBuilder(attributes).add(df).build()
@@ -0,0 +1,204 @@
+"""
+Benchmark Collection - Đo thông lượng của bộ thu thập dữ liệu
+Chạy MovieDataCollector / AsyncMovieDataCollector với OMDb stub server local
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from typing import Dict, List
+
+import numpy as np
+
+from adaptive_concurrency import AIMDConcurrencyLimiter
+from async_data_collection import AsyncMovieDataCollector
+from data_collection import POPULAR_QUERIES, MovieDataCollector
+from omdb_stub_server import OMDbStubServer, StubConfig, build_fixture_corpus
+from omdb_transport import OMDbTransport, RetryPolicy
+from rate_limiter import TokenBucketRateLimiter
+
+
+class LatencyRecorder:
+    """Observer ghi lại độ trễ và mã trạng thái của mỗi request HTTP"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, params, status, elapsed, error, response=None):
+        key = str(status) if error is None else type(error).__name__
+        with self._lock:
+            self.latencies.append(elapsed)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def percentiles(self) -> Dict[str, float]:
+        if not self.latencies:
+            return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0}
+        p50, p95, p99 = np.percentile(np.array(self.latencies) * 1000, [50, 95, 99])
+        return {'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2),
+                'p99_ms': round(float(p99), 2)}
+
+
+def run_sync(url: str, queries: List[str], max_workers: int, max_pages: int, rate: float,
+             adaptive: bool = False) -> Dict:
+    """Chạy MovieDataCollector (đồng bộ) và trả về kết quả đo"""
+    recorder = LatencyRecorder()
+    concurrency_limiter = AIMDConcurrencyLimiter(max_limit=max_workers) if adaptive else None
+    transport = OMDbTransport(url, backoff_base=0.05, pool_maxsize=max(16, max_workers),
+                              rate_limiter=TokenBucketRateLimiter(rate_per_sec=rate, burst=rate),
+                              observer=recorder, concurrency_limiter=concurrency_limiter)
+    collector = MovieDataCollector('benchmark', transport=transport)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        started = time.perf_counter()
+        with redirect_stdout(StringIO()):
+            df = collector.collect_popular_movies(queries, os.path.join(tmp_dir, 'raw.csv'),
+                                                  max_workers=max_workers, max_pages=max_pages)
+        elapsed = time.perf_counter() - started
+    transport.close()
+    return {
+        'titles': len(df),
+        'seconds': round(elapsed, 3),
+        'titles_per_sec': round(len(df) / elapsed, 2) if elapsed > 0 else 0.0,
+        'requests': transport.request_count,
+        'retries': transport.retry_count,
+        'failed': len(collector.failed_ids),
+        'statuses': recorder.statuses,
+        'concurrency_window': concurrency_limiter.window if concurrency_limiter else max_workers,
+        **recorder.percentiles(),
+    }
+
+
+def run_async(url: str, queries: List[str], max_concurrency: int, max_pages: int, rate: float) -> Dict:
+    """Chạy AsyncMovieDataCollector và trả về kết quả đo"""
+    recorder = LatencyRecorder()
+    collector = AsyncMovieDataCollector(
+        'benchmark', base_url=url, max_concurrency=max_concurrency,
+        rate_limiter=TokenBucketRateLimiter(rate_per_sec=rate, burst=rate), observer=recorder,
+        retry_policy=RetryPolicy(backoff_base=0.05)
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        started = time.perf_counter()
+        with redirect_stdout(StringIO()):
+            df = asyncio.run(collector.collect_popular_movies(
+                queries, os.path.join(tmp_dir, 'raw.csv'), max_pages=max_pages
+            ))
+        elapsed = time.perf_counter() - started
+    return {
+        'titles': len(df),
+        'seconds': round(elapsed, 3),
+        'titles_per_sec': round(len(df) / elapsed, 2) if elapsed > 0 else 0.0,
+        'requests': collector.request_count,
+        'retries': collector.retry_count,
+        'failed': None,
+        'statuses': recorder.statuses,
+        **recorder.percentiles(),
+    }
+
+
+def check_regression(results: Dict[str, Dict], baseline_path: str, max_regression: float) -> List[str]:
+    """So sánh titles/sec với baseline, trả về danh sách các mode bị chậm đi quá ngưỡng"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    failures = []
+    for mode, result in results.items():
+        if mode not in baseline:
+            continue
+        expected = baseline[mode]['titles_per_sec']
+        if expected > 0 and result['titles_per_sec'] < expected * (1 - max_regression):
+            failures.append(f"{mode}: {result['titles_per_sec']} < {expected} titles/sec "
+                            f"(ngưỡng -{max_regression:.0%})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark bộ thu thập dữ liệu với OMDb stub server')
+    parser.add_argument('--corpus', default='data/processed_movies.csv')
+    parser.add_argument('--queries', type=int, default=len(POPULAR_QUERIES),
+                        help='Số từ khóa dùng trong POPULAR_QUERIES')
+    parser.add_argument('--modes', default='sync-serial,sync-pool,async',
+                        help='Các mode cần chạy: sync-serial, sync-pool, sync-adaptive, async')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Số luồng / mức đồng thời (với sync-adaptive là cửa sổ tối đa)')
+    parser.add_argument('--max-pages', type=int, default=1)
+    parser.add_argument('--rate', type=float, default=1000.0, help='Giới hạn request/giây phía client')
+    parser.add_argument('--latency', default='lognormal',
+                        choices=['none', 'constant', 'uniform', 'lognormal', 'exponential'])
+    parser.add_argument('--latency-ms', type=float, default=30.0)
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Ghi kết quả ra file JSON')
+    parser.add_argument('--baseline', help='File JSON kết quả trước đó để so sánh')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Tỉ lệ giảm titles/sec tối đa cho phép so với baseline')
+    parser.add_argument('--min-titles-per-sec', type=float, default=None,
+                        help='Ngưỡng titles/sec tối thiểu (áp dụng cho mọi mode)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.corpus):
+        print(f"❌ Không tìm thấy file {args.corpus}")
+        sys.exit(2)
+
+    corpus = build_fixture_corpus(args.corpus)
+    config = StubConfig(latency=args.latency, latency_ms=args.latency_ms,
+                        latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+                        rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    queries = POPULAR_QUERIES[:args.queries]
+
+    print(f"🧪 Benchmark với {len(corpus)} phim, {len(queries)} từ khóa")
+    print(f"   Latency: {args.latency} {args.latency_ms}ms, lỗi 5xx: {args.error_rate:.1%}, "
+          f"429: {args.rate_limit_rate:.1%}\n")
+
+    runners = {
+        'sync-serial': lambda url: run_sync(url, queries, 1, args.max_pages, args.rate),
+        'sync-pool': lambda url: run_sync(url, queries, args.workers, args.max_pages, args.rate),
+        'sync-adaptive': lambda url: run_sync(url, queries, args.workers, args.max_pages, args.rate,
+                                              adaptive=True),
+        'async': lambda url: run_async(url, queries, args.workers, args.max_pages, args.rate),
+    }
+
+    results = {}
+    for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+        if mode not in runners:
+            print(f"⚠️ Bỏ qua mode không hợp lệ: {mode}")
+            continue
+        # Mỗi mode dùng server mới để số liệu không ảnh hưởng lẫn nhau
+        with OMDbStubServer(corpus, config) as server:
+            results[mode] = runners[mode](server.url)
+        r = results[mode]
+        print(f"📊 {mode:12s} {r['titles']:5d} phim  {r['seconds']:7.2f}s  "
+              f"{r['titles_per_sec']:8.2f} phim/s  p50 {r['p50_ms']:6.1f}ms  "
+              f"p95 {r['p95_ms']:6.1f}ms  p99 {r['p99_ms']:6.1f}ms  retry {r['retries']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Đã lưu kết quả vào {args.output}")
+
+    failures = []
+    if args.min_titles_per_sec is not None:
+        failures += [f"{mode}: {r['titles_per_sec']} < {args.min_titles_per_sec} titles/sec"
+                     for mode, r in results.items() if r['titles_per_sec'] < args.min_titles_per_sec]
+    if args.baseline:
+        failures += check_regression(results, args.baseline, args.max_regression)
+
+    if failures:
+        print("\n❌ Benchmark không đạt:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("\n✅ Benchmark đạt")
+
+
+if __name__ == '__main__':
+    main()
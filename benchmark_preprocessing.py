@@ -0,0 +1,243 @@
+"""
+Benchmark Preprocessing - So sánh các bước làm sạch của MovieDataPreprocessor
+với bản cũ (apply + re từng dòng) trên dữ liệu tổng hợp kiểu OMDb, và (--workers)
+ROW_LOCAL_STEPS tuần tự với parallel_preprocessing trên nhiều process
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import ROW_LOCAL_STEPS, MovieDataPreprocessor, normalize_raw_columns
+
+# Các bước được đo (theo thứ tự trong chain)
+BENCHMARK_STEPS = ('clean_year', 'clean_rating', 'clean_runtime', 'clean_box_office',
+                   'clean_budget', 'split_genres', 'extract_country')
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime', 'Drama',
+          'Family', 'Fantasy', 'Horror', 'Mystery', 'Romance', 'Sci-Fi', 'Thriller']
+COUNTRIES = ['USA', 'UK', 'France', 'Germany', 'Japan', 'India', 'Canada', 'South Korea']
+
+
+class LegacyMovieDataPreprocessor(MovieDataPreprocessor):
+    """Các bước làm sạch bản cũ (apply/lambda + re cho từng dòng), giữ lại để so sánh"""
+
+    def clean_year(self):
+        if 'Year' in self.df.columns:
+            self.df['Year'] = pd.to_numeric(self.df['Year'], errors='coerce')
+            self.df['Year'] = self.df['Year'].apply(
+                lambda x: x if 1900 <= x <= 2025 else np.nan
+            )
+        return self
+
+    def clean_rating(self):
+        for col in ['imdbRating', 'Rating']:
+            if col in self.df.columns:
+                self.df[col] = pd.to_numeric(self.df[col], errors='coerce')
+                self.df[col] = self.df[col].apply(
+                    lambda x: x if 0 <= x <= 10 else np.nan
+                )
+        if 'imdbRating' in self.df.columns:
+            self.df.rename(columns={'imdbRating': 'Rating'}, inplace=True)
+        return self
+
+    def clean_runtime(self):
+        if 'Runtime' in self.df.columns:
+            if self.df['Runtime'].dtype == 'object':
+                self.df['Runtime'] = self.df['Runtime'].apply(
+                    lambda x: re.findall(r'\d+', str(x))[0] if pd.notna(x) and re.findall(r'\d+', str(x)) else np.nan
+                )
+            self.df['Runtime'] = pd.to_numeric(self.df['Runtime'], errors='coerce')
+        return self
+
+    def clean_box_office(self):
+        if 'BoxOffice' in self.df.columns:
+            if self.df['BoxOffice'].dtype == 'object':
+                self.df['BoxOffice'] = self.df['BoxOffice'].apply(
+                    lambda x: re.sub(r'[^\d]', '', str(x)) if pd.notna(x) else np.nan
+                )
+            self.df['BoxOffice'] = pd.to_numeric(self.df['BoxOffice'], errors='coerce')
+        return self
+
+    def clean_budget(self):
+        if 'Budget' in self.df.columns:
+            if self.df['Budget'].dtype == 'object':
+                self.df['Budget'] = self.df['Budget'].apply(
+                    lambda x: re.sub(r'[^\d]', '', str(x)) if pd.notna(x) else np.nan
+                )
+            self.df['Budget'] = pd.to_numeric(self.df['Budget'], errors='coerce')
+        return self
+
+    def split_genres(self):
+        if 'Genre' in self.df.columns:
+            self.df['Genres_List'] = self.df['Genre'].apply(
+                lambda x: [g.strip() for g in str(x).split(',')] if pd.notna(x) else []
+            )
+            self.df['Primary_Genre'] = self.df['Genres_List'].apply(
+                lambda x: x[0] if len(x) > 0 else 'Unknown'
+            )
+            self.df['Genre_Count'] = self.df['Genres_List'].apply(len)
+        return self
+
+    def extract_country(self):
+        if 'Country' in self.df.columns:
+            self.df['Primary_Country'] = self.df['Country'].apply(
+                lambda x: str(x).split(',')[0].strip() if pd.notna(x) else 'Unknown'
+            )
+        return self
+
+
+def make_raw_movies(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Dữ liệu raw tổng hợp giống output của OMDb (chuỗi '142 min', '$1,234,567', 'N/A', ...)"""
+    rng = np.random.default_rng(seed)
+
+    def with_missing(values, rate=0.05):
+        values = np.asarray(values, dtype=object)
+        values[rng.random(rows) < rate] = None
+        return values
+
+    genre_counts = rng.integers(1, 4, rows)
+    genres = [', '.join(rng.choice(GENRES, count, replace=False)) for count in genre_counts]
+    countries = [', '.join(rng.choice(COUNTRIES, count, replace=False)) for count in rng.integers(1, 3, rows)]
+    money = rng.integers(10_000, 900_000_000, rows)
+
+    df = pd.DataFrame({
+        'Title': [f"Movie {i}" for i in range(rows)],
+        'Year': with_missing(rng.integers(1880, 2030, rows).astype(str)),
+        'imdbRating': with_missing(np.where(rng.random(rows) < 0.02, 'N/A',
+                                            (rng.integers(0, 110, rows) / 10).astype(str))),
+        'Runtime': with_missing(np.where(rng.random(rows) < 0.02, 'N/A',
+                                         np.char.add(rng.integers(60, 240, rows).astype(str), ' min'))),
+        'BoxOffice': with_missing([f"${value:,}" for value in money], rate=0.3),
+        'Budget': with_missing([f"${value // 3:,}" for value in money], rate=0.5),
+        'Genre': with_missing(genres),
+        'Country': with_missing(countries),
+    })
+    # Giống kiểu pandas.read_csv trả về: cột chuỗi là object
+    return df.astype(object)
+
+
+def run_steps(preprocessor_class, df: pd.DataFrame, repeat: int = 1) -> Dict:
+    """
+    Chạy lần lượt BENCHMARK_STEPS `repeat` lần (mỗi lần trên bản sao mới của df),
+    trả về thời gian tốt nhất của từng bước và DataFrame kết quả
+    """
+    timings = {step: float('inf') for step in BENCHMARK_STEPS}
+    for _ in range(repeat):
+        preprocessor = preprocessor_class(df, verbose=False)
+        for step in BENCHMARK_STEPS:
+            started = time.perf_counter()
+            getattr(preprocessor, step)()
+            timings[step] = min(timings[step], time.perf_counter() - started)
+    return {'timings': timings, 'df': preprocessor.get_processed_data()}
+
+
+def run_parallel_benchmark(df: pd.DataFrame, workers_list, repeat: int = 1) -> Dict:
+    """
+    Thời gian tốt nhất của ROW_LOCAL_STEPS tuần tự và qua process_partitions với từng số worker;
+    kết quả song song phải giống hệt tuần tự
+    """
+    from parallel_preprocessing import available_cpus, process_partitions
+
+    df = normalize_raw_columns(df)
+
+    def serial():
+        preprocessor = MovieDataPreprocessor(df, verbose=False)
+        for step in ROW_LOCAL_STEPS:
+            getattr(preprocessor, step)()
+        return preprocessor.get_processed_data()
+
+    def best(run):
+        timings, result = [], None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            with redirect_stdout(StringIO()):
+                result = run()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+
+    serial_sec, expected = best(serial)
+    results = {'cpus': available_cpus(), 'serial_sec': round(serial_sec, 4), 'workers': {}}
+    print(f"\n🧵 ROW_LOCAL_STEPS trên {len(df):,} dòng, {results['cpus']} CPU khả dụng")
+    print(f"{'Chế độ':18s} {'Thời gian':>12s} {'Tăng tốc':>10s}")
+    print(f"{'tuần tự':18s} {serial_sec:10.3f}s {1.0:9.1f}x")
+    for workers in workers_list:
+        seconds, result = best(lambda: process_partitions(df, workers=workers))
+        pd.testing.assert_frame_equal(result, expected, check_exact=True)
+        effective = min(workers, results['cpus'])
+        results['workers'][workers] = {'effective_workers': effective, 'sec': round(seconds, 4),
+                                       'speedup': round(serial_sec / seconds, 2)}
+        label = f"{workers} worker" + (f" (chạy {effective})" if effective != workers else '')
+        print(f"{label:18s} {seconds:10.3f}s {serial_sec / seconds:9.1f}x")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark các bước làm sạch của MovieDataPreprocessor')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Số lần chạy mỗi bản, lấy thời gian tốt nhất của từng bước')
+    parser.add_argument('--skip-legacy', action='store_true', help='Chỉ đo bản vector hóa')
+    parser.add_argument('--workers', type=lambda value: [int(n) for n in value.split(',') if n.strip()],
+                        default=None, help='Đo thêm parallel_preprocessing với các số worker này, vd. 2,4,8')
+    parser.add_argument('--output', help='Ghi kết quả ra file JSON')
+    args = parser.parse_args()
+
+    print(f"🧪 Tạo {args.rows:,} phim raw tổng hợp...")
+    df = make_raw_movies(args.rows, args.seed)
+
+    with redirect_stdout(StringIO()):
+        vectorized = run_steps(MovieDataPreprocessor, df, args.repeat)
+        legacy = None if args.skip_legacy else run_steps(LegacyMovieDataPreprocessor, df, args.repeat)
+
+    results = {}
+    print(f"\n{'Bước':18s} {'Vector hóa':>12s} {'Bản cũ':>12s} {'Tăng tốc':>10s}")
+    for step in BENCHMARK_STEPS:
+        new_sec = vectorized['timings'][step]
+        old_sec = legacy['timings'][step] if legacy else None
+        results[step] = {'vectorized_sec': round(new_sec, 4),
+                         'legacy_sec': round(old_sec, 4) if legacy else None,
+                         'speedup': round(old_sec / new_sec, 1) if legacy and new_sec > 0 else None}
+        old_text = f"{old_sec:10.3f}s" if legacy else f"{'-':>11s}"
+        speedup = f"{results[step]['speedup']:9.1f}x" if legacy else f"{'-':>10s}"
+        print(f"{step:18s} {new_sec:10.3f}s {old_text} {speedup}")
+
+    total_new = sum(vectorized['timings'].values())
+    summary = {'rows': args.rows, 'vectorized_sec': round(total_new, 4)}
+    if legacy:
+        total_old = sum(legacy['timings'].values())
+        summary.update({'legacy_sec': round(total_old, 4), 'speedup': round(total_old / total_new, 1)})
+        print(f"{'Tổng':18s} {total_new:10.3f}s {total_old:10.3f}s {total_old / total_new:9.1f}x")
+
+    parallel = run_parallel_benchmark(df, args.workers, args.repeat) if args.workers else None
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'summary': summary, 'steps': results, 'parallel': parallel},
+                      f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Đã lưu kết quả vào {args.output}")
+
+    if legacy:
+        # Kết quả phải giống hệt bản cũ (so trên bản ghi CSV để kiểm tra cả cột list)
+        new_csv = vectorized['df'].to_csv(index=False)
+        old_csv = legacy['df'].to_csv(index=False)
+        if new_csv != old_csv:
+            print("\n❌ Kết quả khác với bản cũ")
+            sys.exit(1)
+        pd.testing.assert_frame_equal(vectorized['df'], legacy['df'], check_exact=True)
+        print("\n✅ Kết quả giống hệt bản cũ")
+
+
+if __name__ == '__main__':
+    main()
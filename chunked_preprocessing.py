@@ -0,0 +1,392 @@
+"""
+Chunked Preprocessing
+Tiền xử lý out-of-core: đọc raw theo chunk có kích thước cố định, chạy các bước theo dòng
+(ROW_LOCAL_STEPS) trên từng chunk; các bước toàn cục được xử lý bằng nhiều lượt đọc:
+- remove_duplicates: tập hash (uint64) của khóa Title + Year đã gặp, khóa spill ra đĩa để xác
+  nhận khi hash trùng; giữ bản ghi đầu tiên
+- handle_missing_values: median chính xác của toàn bộ dữ liệu bằng histogram thu hẹp dần
+  trên các giá trị số đã spill ra đĩa
+
+Output giống chế độ in-memory: CSV, Parquet (mỗi chunk một row group, cùng schema khai báo)
+và attribute index (xây dần theo chunk). Cột số không thu hẹp được (narrow_fits) ở bất kỳ chunk
+nào hay với median điền vào thì giữ kiểu gốc ở mọi chunk, như khi kiểm tra trên cả file.
+
+Bộ nhớ đỉnh phụ thuộc chunksize (cộng 24 bytes/phim cho tập hash và 8 bytes mỗi cặp
+phim - giá trị của attribute index), không phụ thuộc kích thước nội dung file.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import ROW_LOCAL_STEPS, MovieDataPreprocessor, normalize_raw_columns
+from processed_schema import COMPACT_SCHEMA, compact_dtypes, narrow_fits, processed_parquet_path
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Số bin mỗi lượt thu hẹp khi tìm median
+HISTOGRAM_BINS = 4096
+
+
+def _infer_csv_dtypes(path: str, chunksize: int) -> Dict[str, type]:
+    """
+    Lượt đọc schema (CSV): cột có giá trị chuỗi ở bất kỳ chunk nào được đọc dạng chuỗi
+    ở mọi chunk, giống kiểu pandas suy ra khi đọc cả file một lần
+    """
+    string_columns = []
+    for chunk in pd.read_csv(path, encoding='utf-8-sig', chunksize=chunksize):
+        for col in chunk.columns:
+            if col not in string_columns and not pd.api.types.is_numeric_dtype(chunk[col]):
+                string_columns.append(col)
+    return {col: str for col in string_columns}
+
+
+def iter_raw_chunks(path: str, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """Đọc raw layer (Parquet hoặc CSV) theo chunk, đã chuẩn hóa tên cột"""
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield normalize_raw_columns(pa.Table.from_batches([batch]).to_pandas())
+        return
+
+    dtypes = _infer_csv_dtypes(path, chunksize)
+    for chunk in pd.read_csv(path, encoding='utf-8-sig', chunksize=chunksize, dtype=dtypes):
+        yield normalize_raw_columns(chunk)
+
+
+class _SeenKeys:
+    """
+    Các khóa đã gặp, dùng cho remove_duplicates giữa các chunk
+
+    Khóa được ghi ra file trên đĩa (mỗi khóa một chuỗi bytes); trong bộ nhớ chỉ giữ hash (uint64)
+    kèm vị trí và độ dài của khóa trong file. Hash trùng chỉ là ứng viên: khóa được đọc lại và so
+    sánh nên hai khóa khác nhau có cùng hash vẫn được giữ, giống remove_duplicates in-memory.
+
+    Hash lưu dạng các run đã sắp xếp; run mới được gộp với run cuối khi không nhỏ hơn
+    (như cộng nhị phân) nên có O(log n) run và mỗi hash chỉ được sắp xếp lại O(log n) lần,
+    thay vì sắp xếp lại toàn bộ tập ở mỗi chunk
+    """
+
+    def __init__(self, spill_dir: str):
+        # Mỗi run: (hash đã sắp xếp, vị trí khóa trong file, độ dài khóa)
+        self.runs: List[tuple] = []
+        self._file = open(os.path.join(spill_dir, 'seen-keys.bin'), 'w+b')
+        self._size = 0
+
+    @staticmethod
+    def _keys(chunk: pd.DataFrame) -> pd.DataFrame:
+        if 'Title' in chunk.columns and 'Year' in chunk.columns:
+            keys = chunk[['Title', 'Year']].copy()
+            # Year số ở chunk này có thể là int, ở chunk khác là float
+            if pd.api.types.is_numeric_dtype(keys['Year']):
+                keys['Year'] = keys['Year'].astype('float64')
+            return keys
+        return chunk
+
+    @staticmethod
+    def _encode(keys: pd.DataFrame) -> List[bytes]:
+        """Khóa của từng dòng dạng bytes: repr của từng giá trị (thiếu -> \\x00), nối bằng \\x1f"""
+        columns = [keys[col].astype(object).where(keys[col].notna()).map(repr, na_action='ignore')
+                   .fillna('\x00').tolist() for col in keys.columns]
+        return ['\x1f'.join(values).encode('utf-8') for values in zip(*columns)]
+
+    def _stored(self, offset: int, length: int) -> bytes:
+        self._file.seek(offset)
+        return self._file.read(length)
+
+    def first_seen(self, chunk: pd.DataFrame) -> np.ndarray:
+        """Mask các dòng có khóa chưa gặp (trong chunk và ở các chunk trước)"""
+        keys = self._keys(chunk)
+        mask = ~keys.duplicated().to_numpy()
+        hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        rows = np.flatnonzero(mask)
+        encoded = dict(zip(rows.tolist(), self._encode(keys.iloc[rows])))
+
+        self._file.flush()
+        for run_hashes, offsets, lengths in self.runs:
+            positions = np.searchsorted(run_hashes, hashes[rows])
+            inside = positions < len(run_hashes)
+            candidates = inside.copy()
+            candidates[inside] = run_hashes[positions[inside]] == hashes[rows][inside]
+            for row, position in zip(rows[candidates].tolist(), positions[candidates].tolist()):
+                # Các khóa cùng hash nằm liền nhau trong run
+                while position < len(run_hashes) and run_hashes[position] == hashes[row]:
+                    if self._stored(offsets[position], lengths[position]) == encoded[row]:
+                        mask[row] = False
+                        break
+                    position += 1
+            rows = np.flatnonzero(mask)
+
+        # Ghi khóa mới ra file, thêm hash của chúng thành run mới
+        new_keys = [encoded[row] for row in rows.tolist()]
+        lengths = np.fromiter(map(len, new_keys), dtype=np.int64, count=len(new_keys))
+        offsets = self._size + np.cumsum(lengths) - lengths
+        self._file.seek(self._size)
+        self._file.write(b''.join(new_keys))
+        self._size += int(lengths.sum())
+        order = np.argsort(hashes[rows], kind='stable')
+        run = (hashes[rows][order], offsets[order], lengths[order])
+        while self.runs and len(self.runs[-1][0]) <= len(run[0]):
+            previous = self.runs.pop()
+            merged = [np.concatenate([old, new]) for old, new in zip(previous, run)]
+            order = np.argsort(merged[0], kind='stable')
+            run = tuple(values[order] for values in merged)
+        if len(run[0]):
+            self.runs.append(run)
+        return mask
+
+    def close(self):
+        self._file.close()
+
+
+def _parquet_schema(table):
+    """
+    Schema Parquet chung cho mọi chunk: chỉ số dictionary (category) int32 thay vì int8/int16
+    tùy số category của chunk, list rỗng ở chunk đầu (list<null>) thành list<string>
+    """
+    import pyarrow as pa
+
+    fields = []
+    for field in table.schema:
+        dtype = field.type
+        if pa.types.is_dictionary(dtype):
+            dtype = pa.dictionary(pa.int32(), dtype.value_type, dtype.ordered)
+        elif pa.types.is_list(dtype) and pa.types.is_null(dtype.value_type):
+            dtype = pa.list_(pa.string())
+        fields.append(field.with_type(dtype))
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+def _unify_dtype(dtypes: list):
+    """Kiểu chung của một cột qua các chunk (int ở chunk này, float ở chunk khác -> float)"""
+    unique = list(dict.fromkeys(dtypes))
+    if len(unique) == 1:
+        return unique[0]
+    if all(isinstance(dtype, np.dtype) and dtype.kind in 'iuf' for dtype in unique):
+        return np.result_type(*unique)
+    return np.dtype('object')
+
+
+def _kth_smallest(values: np.ndarray, k: int, lo: float, hi: float, block_size: int) -> float:
+    """
+    Phần tử nhỏ thứ k (0-based) của mảng trên đĩa (memmap), đọc theo block
+
+    Mỗi lượt đếm histogram trong [lo, hi]; bin chứa hạng k đủ nhỏ thì gom giá trị của bin
+    và sắp xếp, nếu không thì thu hẹp [lo, hi] về bin đó.
+    """
+    def blocks():
+        for start in range(0, len(values), block_size):
+            yield np.asarray(values[start:start + block_size])
+
+    while lo < hi:
+        edges = np.linspace(lo, hi, HISTOGRAM_BINS + 1)
+        below = 0
+        counts = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        for block in blocks():
+            below += np.count_nonzero(block < lo)
+            counts += np.histogram(block[(block >= lo) & (block <= hi)], bins=edges)[0]
+        cumulative = below + np.cumsum(counts)
+        index = int(np.searchsorted(cumulative, k, side='right'))
+        rank_offset = int(cumulative[index] - counts[index])
+        bin_lo, bin_hi = edges[index], edges[index + 1]
+        last = index == HISTOGRAM_BINS - 1
+
+        def in_bin(block):
+            return (block >= bin_lo) & ((block <= bin_hi) if last else (block < bin_hi))
+
+        if counts[index] <= block_size:
+            collected = np.sort(np.concatenate([block[in_bin(block)] for block in blocks()]))
+            return float(collected[k - rank_offset])
+
+        # Bin quá lớn: thu hẹp về [min, max] thực tế của các giá trị trong bin
+        lo, hi = np.inf, -np.inf
+        for block in blocks():
+            inside = block[in_bin(block)]
+            if len(inside):
+                lo, hi = min(lo, inside.min()), max(hi, inside.max())
+    return float(lo)
+
+
+def exact_median(path: str, count: int, lo: float, hi: float, block_size: int = DEFAULT_CHUNKSIZE) -> float:
+    """Median chính xác (giống Series.median) của các giá trị float64 ghi liên tiếp trong file"""
+    if count == 0:
+        return np.nan
+    values = np.memmap(path, dtype=np.float64, mode='r', shape=(count,))
+    lower = _kth_smallest(values, (count - 1) // 2, lo, hi, block_size)
+    if count % 2:
+        return lower
+    upper = _kth_smallest(values, count // 2, lo, hi, block_size)
+    return np.mean([lower, upper])
+
+
+def preprocess_movie_data_chunked(input_path: str = 'data/raw_movies.csv',
+                                  output_path: str = 'data/processed_movies.csv',
+                                  chunksize: int = DEFAULT_CHUNKSIZE,
+                                  spill_dir: Optional[str] = None,
+                                  attribute_index: bool = True, profiler=None) -> Dict:
+    """
+    Tiền xử lý theo chunk, kết quả giống preprocess_movie_data
+
+    Lượt 1: đọc chunk, loại trùng, chạy ROW_LOCAL_STEPS, spill chunk đã xử lý và các giá trị số
+            (để tính median) ra thư mục tạm
+    Lượt 2: tính median chính xác cho các cột số còn thiếu giá trị
+    Lượt 3: đọc lại từng chunk, điền missing values, áp dụng schema gọn và ghi nối tiếp vào
+            output_path và file Parquet đi kèm, đồng thời xây attribute index
+
+    Args:
+        spill_dir: Thư mục chứa dữ liệu tạm (mặc định cạnh output_path)
+        attribute_index: Xây và lưu attribute index như save_processed_data
+        profiler: StepMemoryProfiler; kiểm tra ngân sách bộ nhớ trước mỗi chunk (check_budget)
+
+    Returns:
+        Dict thống kê (số dòng, số bản ghi trùng, số chunk, median đã dùng)
+    """
+    print(f"🔧 BẮT ĐẦU TIỀN XỬ LÝ DỮ LIỆU (chunk {chunksize:,} dòng)\n")
+
+    output_dir = os.path.dirname(output_path) or '.'
+    os.makedirs(output_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='.preprocess-', dir=spill_dir or output_dir)
+
+    seen = _SeenKeys(work_dir)
+    stats = {'rows_in': 0, 'rows_out': 0, 'duplicates': 0, 'chunks': 0, 'medians': {}}
+    column_dtypes: Dict[str, list] = {}
+    # Thống kê giá trị số cho median: cột -> {count, missing, min, max}
+    numeric: Dict[str, Dict] = {}
+    value_files = {}
+    # Cột số của schema gọn có giá trị không giữ nguyên khi thu hẹp (giữ kiểu gốc ở mọi chunk)
+    narrowed = {col: kind for col, kind in COMPACT_SCHEMA.items() if kind not in ('category', 'list')}
+    wide = set()
+
+    try:
+        # Lượt 1: các bước theo dòng
+        chunk_paths = []
+        for number, chunk in enumerate(iter_raw_chunks(input_path, chunksize), 1):
+            if profiler is not None:
+                profiler.check_budget(f"chunk {number}")
+            stats['rows_in'] += len(chunk)
+            raw_rows = len(chunk)
+            chunk = chunk[seen.first_seen(chunk)]
+            stats['duplicates'] += raw_rows - len(chunk)
+            if chunk.empty:
+                continue
+
+            preprocessor = MovieDataPreprocessor(chunk, verbose=False, copy=False)
+            for step in ROW_LOCAL_STEPS:
+                getattr(preprocessor, step)()
+            chunk = preprocessor.get_processed_data()
+
+            for col in chunk.columns:
+                column_dtypes.setdefault(col, []).append(chunk[col].dtype)
+                if col in narrowed and col not in wide and not narrow_fits(chunk[col], narrowed[col]):
+                    wide.add(col)
+            for col in chunk.select_dtypes(include=[np.number]).columns:
+                values = chunk[col].to_numpy(dtype='float64', na_value=np.nan)
+                present = values[~np.isnan(values)]
+                entry = numeric.setdefault(col, {'count': 0, 'missing': 0, 'min': np.inf, 'max': -np.inf})
+                entry['count'] += len(present)
+                entry['missing'] += len(values) - len(present)
+                if len(present):
+                    entry['min'] = min(entry['min'], present.min())
+                    entry['max'] = max(entry['max'], present.max())
+                if col not in value_files:
+                    value_files[col] = open(os.path.join(work_dir, f"values-{len(value_files)}.f64"), 'wb')
+                value_files[col].write(present.tobytes())
+
+            chunk_path = os.path.join(work_dir, f"part-{len(chunk_paths):05d}.pkl")
+            chunk.to_pickle(chunk_path)
+            chunk_paths.append(chunk_path)
+            stats['rows_out'] += len(chunk)
+            print(f"  📦 Chunk {len(chunk_paths)}: {stats['rows_out']:,}/{stats['rows_in']:,} dòng đã xử lý")
+        stats['chunks'] = len(chunk_paths)
+        for f in value_files.values():
+            f.close()
+
+        if stats['duplicates']:
+            print(f"✅ Đã loại bỏ {stats['duplicates']} bản ghi trùng lặp")
+
+        # Lượt 2: median toàn cục cho cột số (theo kiểu chung của cột) còn thiếu giá trị
+        dtypes = {col: _unify_dtype(col_dtypes) for col, col_dtypes in column_dtypes.items()}
+        numeric_cols = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()}) \
+            .select_dtypes(include=[np.number]).columns
+        for col in numeric_cols:
+            entry = numeric.get(col)
+            if entry and entry['missing']:
+                stats['medians'][col] = exact_median(value_files[col].name, entry['count'],
+                                                     entry['min'], entry['max'], block_size=chunksize)
+                if col in narrowed and not narrow_fits(pd.Series([stats['medians'][col]]), narrowed[col]):
+                    wide.add(col)
+        schema = {col: kind for col, kind in COMPACT_SCHEMA.items() if col not in wide}
+
+        # Lượt 3: điền missing values và ghi output theo từng chunk
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from attribute_index import AttributeIndexBuilder, attribute_index_dir
+
+        print("\n📊 Xử lý missing values:")
+        missing_counts: Dict[str, int] = {}
+        tmp_path = output_path + '.tmp'
+        parquet_path = processed_parquet_path(output_path)
+        builder = AttributeIndexBuilder() if attribute_index else None
+        writer = None
+        with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+            for index, chunk_path in enumerate(chunk_paths):
+                if profiler is not None:
+                    profiler.check_budget(f"ghi chunk {index + 1}")
+                chunk = pd.read_pickle(chunk_path)
+                for col, dtype in dtypes.items():
+                    if chunk[col].dtype != dtype:
+                        chunk[col] = chunk[col].astype(dtype)
+                for col in chunk.columns[chunk.isna().any()]:
+                    missing_counts[col] = missing_counts.get(col, 0) + int(chunk[col].isna().sum())
+
+                preprocessor = MovieDataPreprocessor(chunk, verbose=False, copy=False)
+                preprocessor.handle_missing_values(medians=stats['medians'])
+                # Cùng một schema cho mọi chunk nên kiểu giống hệt chạy in-memory
+                chunk = compact_dtypes(preprocessor.get_processed_data(), schema)
+                chunk.to_csv(f, index=False, header=index == 0)
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(parquet_path + '.tmp', _parquet_schema(table))
+                writer.write_table(table.cast(writer.schema))
+                if builder is not None:
+                    builder.add(chunk)
+        if writer is not None:
+            writer.close()
+        # Parquet thay sau CSV để không bị load_processed_data coi là cũ hơn
+        os.replace(tmp_path, output_path)
+        if writer is not None:
+            os.replace(parquet_path + '.tmp', parquet_path)
+        elif os.path.exists(parquet_path):
+            os.remove(parquet_path)
+        index_dir = None
+        if builder is not None:
+            index = builder.build()
+            if index.attributes:
+                index_dir = attribute_index_dir(output_path)
+                index.save(index_dir)
+
+        for col, count in missing_counts.items():
+            if col in stats['medians']:
+                print(f"  - {col}: Điền {count} giá trị bằng median")
+
+        print(f"\n💾 Đã lưu dữ liệu đã xử lý vào {output_path} (và {parquet_path})")
+        if index_dir is not None:
+            print(f"   - Attribute index: {index_dir}")
+        print(f"   - Số lượng phim: {stats['rows_out']}")
+        print(f"   - Số chunk: {stats['chunks']}")
+        print("\n✅ HOÀN THÀNH TIỀN XỬ LÝ DỮ LIỆU!")
+        return stats
+    finally:
+        seen.close()
+        for f in value_files.values():
+            f.close()
+        for path in (output_path + '.tmp', processed_parquet_path(output_path) + '.tmp'):
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(work_dir, ignore_errors=True)
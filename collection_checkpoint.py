@@ -0,0 +1,201 @@
+"""
+Checkpoint cho quá trình thu thập dữ liệu
+Ghi kết quả dạng NDJSON append-only để có thể tiếp tục khi bị gián đoạn
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+import pandas as pd
+
+
+def write_movies(chunks: Iterable[List[Dict]], columns: List[str], save_path: str) -> int:
+    """
+    Ghi chi tiết phim (theo từng chunk) ra CSV hoặc Parquet theo đuôi file, qua file tạm
+
+    Returns:
+        Số phim đã ghi
+    """
+    directory = os.path.dirname(save_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = save_path + '.tmp'
+
+    count = 0
+    if save_path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Dữ liệu thô của OMDb là chuỗi; các trường lồng nhau (Ratings) lưu dạng JSON
+        schema = pa.schema([(column, pa.string()) for column in columns])
+        with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+            for chunk in chunks:
+                table = {
+                    column: [
+                        None if movie.get(column) is None
+                        else json.dumps(movie[column], ensure_ascii=False)
+                        if isinstance(movie[column], (list, dict)) else str(movie[column])
+                        for movie in chunk
+                    ]
+                    for column in columns
+                }
+                writer.write_table(pa.table(table, schema=schema))
+                count += len(chunk)
+    else:
+        with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+            pd.DataFrame(columns=columns).to_csv(f, index=False)
+            for chunk in chunks:
+                pd.DataFrame(chunk).reindex(columns=columns).to_csv(f, index=False, header=False)
+                count += len(chunk)
+
+    os.replace(tmp_path, save_path)
+    return count
+
+
+class CollectionCheckpoint:
+    """
+    File checkpoint NDJSON (mỗi dòng một bản ghi JSON)
+
+    Các loại bản ghi:
+        {"type": "movie", "query": ..., "data": {...}}   - chi tiết một phim
+        {"type": "query_done", "query": ...}              - đã xử lý xong một từ khóa
+
+    Từ file có thể dựng lại con trỏ tiến độ (các từ khóa đã xong, các imdbID
+    đã lấy) mà không cần giữ toàn bộ dữ liệu trong bộ nhớ.
+    """
+
+    def __init__(self, path: str = 'data/raw_movies.checkpoint.ndjson'):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._truncate_partial_line()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def reset(self):
+        """Xóa checkpoint cũ để bắt đầu lại từ đầu"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _truncate_partial_line(self):
+        """Cắt bỏ dòng cuối bị ghi dở (process bị dừng giữa chừng)"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            # Lùi lại tới ký tự xuống dòng gần nhất
+            position = size - 1
+            while position > 0:
+                f.seek(position - 1)
+                if f.read(1) == b'\n':
+                    break
+                position -= 1
+            f.truncate(position)
+
+    def _write(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def append_movie(self, details: Dict, query: str = None):
+        """Ghi chi tiết một phim"""
+        self._write({'type': 'movie', 'query': query, 'data': details})
+
+    def mark_query_done(self, query: str):
+        """Đánh dấu từ khóa đã xử lý xong (ghi xuống đĩa ngay)"""
+        self._write({'type': 'query_done', 'query': query})
+        os.fsync(self._file.fileno())
+
+    def _iter_records(self) -> Iterator[Dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Dòng cuối ghi dở
+                    continue
+
+    def load_progress(self) -> Tuple[Set[str], Set[str]]:
+        """
+        Đọc con trỏ tiến độ từ checkpoint
+
+        Returns:
+            (các từ khóa đã xong, các imdbID đã lấy chi tiết)
+        """
+        done_queries, fetched_ids = set(), set()
+        for record in self._iter_records():
+            if record.get('type') == 'query_done':
+                done_queries.add(record['query'])
+            elif record.get('type') == 'movie':
+                imdb_id = record['data'].get('imdbID')
+                if imdb_id:
+                    fetched_ids.add(imdb_id)
+        return done_queries, fetched_ids
+
+    def iter_movies(self) -> Iterator[Dict]:
+        """Duyệt chi tiết các phim theo thứ tự đã ghi"""
+        for record in self._iter_records():
+            if record.get('type') == 'movie':
+                yield record['data']
+
+    def _columns(self) -> List[str]:
+        """Hợp các cột của mọi bản ghi (giữ thứ tự xuất hiện đầu tiên)"""
+        columns = {}
+        for movie in self.iter_movies():
+            for key in movie:
+                columns.setdefault(key, None)
+        return list(columns)
+
+    def _iter_chunks(self, chunk_size: int) -> Iterator[List[Dict]]:
+        chunk = []
+        for movie in self.iter_movies():
+            chunk.append(movie)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def archive(self, path: str, append: bool = False) -> int:
+        """Ghi response gốc của các phim vào raw archive (.ndjson.gz / .parquet)"""
+        from raw_archive import write_raw_archive
+        columns = self._columns() if path.endswith('.parquet') else None
+        return write_raw_archive(self.iter_movies(), path, columns=columns, append=append)
+
+    def compact(self, save_path: str, chunk_size: int = 5000) -> int:
+        """
+        Gộp checkpoint thành file output (CSV hoặc Parquet theo đuôi file, xem write_movies)
+
+        Đọc và ghi theo từng chunk nên bộ nhớ không phụ thuộc kích thước checkpoint.
+
+        Returns:
+            Số phim đã ghi
+        """
+        return write_movies(self._iter_chunks(chunk_size), self._columns(), save_path)
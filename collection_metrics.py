@@ -0,0 +1,331 @@
+"""
+Collection Metrics cho bộ thu thập OMDb
+Đếm request, bytes, latency theo endpoint, cache, retry, lỗi và tốc độ thu thập;
+xuất ra JSON và file text theo định dạng Prometheus (node_exporter textfile collector)
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from response_cache import endpoint_of
+
+# Ngưỡng (giây) của histogram latency, giống mặc định của Prometheus client
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _response_size(response) -> int:
+    """
+    Số bytes body đã nhận (sau giải nén): requests.Response hoặc body (bytes) mà
+    AsyncMovieDataCollector đã đọc; không dùng Content-Length (không có khi chunked / nén)
+    """
+    if response is None:
+        return 0
+    if isinstance(response, (bytes, bytearray)):
+        return len(response)
+    content = getattr(response, 'content', None)
+    return len(content) if isinstance(content, bytes) else 0
+
+
+class LatencyHistogram:
+    """Histogram latency với các bucket cố định (không lưu từng giá trị)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Phần tử cuối là +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Các cặp (le, số quan sát <= le) theo định dạng Prometheus"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((f"{bound:g}", total))
+        result.append(('+Inf', self.count))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Ước lượng phân vị bằng nội suy tuyến tính trong bucket (như histogram_quantile)"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip(self.buckets, self.counts):
+            if seen + count >= rank and count > 0:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum_seconds': round(self.sum, 6),
+            'mean_ms': round(self.sum / self.count * 1000, 2) if self.count else 0.0,
+            'p50_ms': round(self.quantile(0.5) * 1000, 2),
+            'p95_ms': round(self.quantile(0.95) * 1000, 2),
+            'p99_ms': round(self.quantile(0.99) * 1000, 2),
+            'max_ms': round(self.max * 1000, 2),
+            'buckets': dict(self.cumulative()),
+        }
+
+
+class CollectionMetrics:
+    """
+    Số liệu của một lần thu thập, an toàn khi dùng từ nhiều luồng
+
+    - Dùng làm observer(params, status, elapsed, error, response) của OMDbTransport
+      hoặc AsyncMovieDataCollector (response là body đã đọc) để đếm request, bytes, latency và lỗi HTTP
+    - record_cache / record_titles / record_error được collector gọi trực tiếp
+    - attach(...) gắn transport / cache / concurrency limiter để đọc thêm số liệu lúc xuất
+    - Xuất ra json_path / prometheus_path khi flush(), định kỳ nếu gọi start_periodic_flush()
+    - labels: nhãn cố định gắn vào mọi sample (vd. {'shard': '3'} để các process không trùng series)
+    """
+
+    def __init__(self, json_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+                 job: str = 'omdb_collection', labels: Optional[Dict[str, str]] = None):
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.job = job
+        self.labels = dict(labels or {})
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+        self.requests: Dict[Tuple[str, str], int] = {}    # (endpoint, status) -> số request
+        self.bytes_received: Dict[str, int] = {}           # endpoint -> bytes
+        self.latency: Dict[str, LatencyHistogram] = {}     # endpoint -> histogram
+        self.cache_lookups: Dict[Tuple[str, str], int] = {}  # (endpoint, hit/miss) -> số lần
+        self.retryable_responses = 0
+        self.titles = 0
+        self.errors: Dict[str, int] = {}                   # loại lỗi -> số lần
+
+        self.transport = None
+        self.cache = None
+        self.concurrency_limiter = None
+        self._flush_thread: Optional[threading.Thread] = None
+        self._stop_flush = threading.Event()
+
+    def attach(self, transport=None, cache=None, concurrency_limiter=None):
+        """Gắn các thành phần có bộ đếm riêng (đọc lúc xuất số liệu)"""
+        self.transport = transport or self.transport
+        self.cache = cache or self.cache
+        self.concurrency_limiter = concurrency_limiter or self.concurrency_limiter
+        return self
+
+    # ----- Ghi nhận -----
+
+    def __call__(self, params: Dict, status: Optional[int], elapsed: float, error, response=None):
+        endpoint = endpoint_of(params)
+        status_label = str(status) if error is None else 'error'
+        size = _response_size(response)
+        with self._lock:
+            key = (endpoint, status_label)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes_received[endpoint] = self.bytes_received.get(endpoint, 0) + size
+            self.latency.setdefault(endpoint, LatencyHistogram()).observe(elapsed)
+            if error is not None:
+                error_type = type(error).__name__
+                self.errors[error_type] = self.errors.get(error_type, 0) + 1
+                self.retryable_responses += 1
+            elif status in RETRYABLE_STATUS_CODES:
+                error_type = f"http_{status}"
+                self.errors[error_type] = self.errors.get(error_type, 0) + 1
+                self.retryable_responses += 1
+
+    def record_cache(self, params: Dict, hit: bool):
+        key = (endpoint_of(params), 'hit' if hit else 'miss')
+        with self._lock:
+            self.cache_lookups[key] = self.cache_lookups.get(key, 0) + 1
+
+    def record_titles(self, count: int = 1):
+        with self._lock:
+            self.titles += count
+
+    def record_error(self, error_type: str):
+        """Lỗi ở mức thu thập (vd. detail_failed, search_failed, quota_exceeded)"""
+        with self._lock:
+            self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+    # ----- Xuất số liệu -----
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def snapshot(self) -> Dict:
+        """Toàn bộ số liệu hiện tại dưới dạng dict (dùng cho JSON)"""
+        with self._lock:
+            elapsed = self.elapsed
+            endpoints = sorted(set(self.bytes_received) | {endpoint for endpoint, _ in self.cache_lookups})
+            summary = {
+                'job': self.job,
+                'labels': dict(self.labels),
+                'started_at': self.started_at,
+                'elapsed_seconds': round(elapsed, 3),
+                'requests_total': sum(self.requests.values()),
+                'bytes_received_total': sum(self.bytes_received.values()),
+                'titles_collected': self.titles,
+                'titles_per_sec': round(self.titles / elapsed, 3) if elapsed > 0 else 0.0,
+                'retryable_responses': self.retryable_responses,
+                'errors': dict(sorted(self.errors.items())),
+                'endpoints': {
+                    endpoint: {
+                        'requests': {status: count for (name, status), count in sorted(self.requests.items())
+                                     if name == endpoint},
+                        'bytes_received': self.bytes_received.get(endpoint, 0),
+                        'cache_hits': self.cache_lookups.get((endpoint, 'hit'), 0),
+                        'cache_misses': self.cache_lookups.get((endpoint, 'miss'), 0),
+                        'latency': (self.latency[endpoint].to_dict() if endpoint in self.latency
+                                    else LatencyHistogram().to_dict()),
+                    }
+                    for endpoint in endpoints
+                },
+            }
+
+        if self.transport is not None:
+            summary['retries_total'] = self.transport.retry_count
+            rate_limiter = self.transport.rate_limiter
+            if rate_limiter is not None and rate_limiter.daily_quota is not None:
+                summary['quota_remaining'] = rate_limiter.remaining_quota()
+        if self.cache is not None:
+            summary['cache'] = self.cache.stats()
+        if self.concurrency_limiter is not None:
+            summary['concurrency'] = self.concurrency_limiter.stats()
+        return summary
+
+    def to_prometheus(self) -> str:
+        """Số liệu theo định dạng text exposition của Prometheus"""
+        summary = self.snapshot()
+        base_labels = {'job': self.job, **self.labels}
+        base_text = ','.join(f'{key}="{value}"' for key, value in base_labels.items())
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[Dict[str, str], float]]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                labels = {**base_labels, **labels}
+                label_text = ','.join(f'{key}="{value_}"' for key, value_ in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        endpoints = summary['endpoints']
+        metric('omdb_requests_total', 'counter', 'Số request HTTP tới OMDb theo endpoint và mã trạng thái',
+               [({'endpoint': endpoint, 'status': status}, count)
+                for endpoint, info in endpoints.items() for status, count in info['requests'].items()])
+        metric('omdb_response_bytes_total', 'counter', 'Số bytes response nhận được',
+               [({'endpoint': endpoint}, info['bytes_received']) for endpoint, info in endpoints.items()])
+
+        lines.append('# HELP omdb_request_duration_seconds Latency của request HTTP tới OMDb')
+        lines.append('# TYPE omdb_request_duration_seconds histogram')
+        with self._lock:
+            histograms = {endpoint: (histogram.cumulative(), histogram.sum, histogram.count)
+                          for endpoint, histogram in self.latency.items()}
+        for endpoint, (buckets, total, count) in sorted(histograms.items()):
+            for le, value in buckets:
+                lines.append(f'omdb_request_duration_seconds_bucket{{{base_text},endpoint="{endpoint}",'
+                             f'le="{le}"}} {value}')
+            lines.append(f'omdb_request_duration_seconds_sum{{{base_text},endpoint="{endpoint}"}} {total:.6f}')
+            lines.append(f'omdb_request_duration_seconds_count{{{base_text},endpoint="{endpoint}"}} {count}')
+
+        metric('omdb_cache_lookups_total', 'counter', 'Số lần tra cache response theo kết quả',
+               [({'endpoint': endpoint, 'result': result}, info[key])
+                for endpoint, info in endpoints.items()
+                for result, key in (('hit', 'cache_hits'), ('miss', 'cache_misses'))])
+        metric('omdb_retryable_responses_total', 'counter', 'Số response 429/5xx/lỗi kết nối (sẽ được thử lại)',
+               [({}, summary['retryable_responses'])])
+        if 'retries_total' in summary:
+            metric('omdb_retries_total', 'counter', 'Số lần transport gửi lại request',
+                   [({}, summary['retries_total'])])
+        metric('omdb_errors_total', 'counter', 'Số lỗi theo loại',
+               [({'type': error_type}, count) for error_type, count in summary['errors'].items()])
+        metric('omdb_titles_collected_total', 'counter', 'Số phim đã lấy chi tiết',
+               [({}, summary['titles_collected'])])
+        metric('omdb_titles_per_second', 'gauge', 'Tốc độ thu thập trung bình từ đầu lần chạy',
+               [({}, summary['titles_per_sec'])])
+        metric('omdb_collection_duration_seconds', 'gauge', 'Thời gian chạy của lần thu thập',
+               [({}, summary['elapsed_seconds'])])
+        metric('omdb_collection_started_timestamp_seconds', 'gauge', 'Thời điểm bắt đầu lần thu thập',
+               [({}, round(summary['started_at'], 3))])
+        if 'quota_remaining' in summary:
+            metric('omdb_quota_remaining', 'gauge', 'Số request còn lại trong hạn mức hôm nay',
+                   [({}, summary['quota_remaining'])])
+        if 'concurrency' in summary:
+            metric('omdb_concurrency_window', 'gauge', 'Cửa sổ đồng thời AIMD hiện tại',
+                   [({}, summary['concurrency']['window'])])
+        metric('omdb_metrics_flush_timestamp_seconds', 'gauge', 'Thời điểm ghi file số liệu',
+               [({}, round(time.time(), 3))])
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _write_atomic(path: str, content: str):
+        # Ghi file tạm rồi đổi tên để exporter không bao giờ đọc phải file ghi dở
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def write_json(self, path: str):
+        self._write_atomic(path, json.dumps(self.snapshot(), indent=2, ensure_ascii=False))
+
+    def write_prometheus(self, path: str):
+        self._write_atomic(path, self.to_prometheus())
+
+    def flush(self):
+        """Ghi số liệu ra các file đã cấu hình"""
+        if self.json_path:
+            self.write_json(self.json_path)
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
+
+    def start_periodic_flush(self, interval: float = 30.0):
+        """Ghi số liệu mỗi `interval` giây trong luồng nền (dừng bằng stop())"""
+        if self._flush_thread is not None:
+            return
+
+        def run():
+            while not self._stop_flush.wait(interval):
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"  ⚠️ Không ghi được file số liệu: {e}")
+
+        self._stop_flush.clear()
+        self._flush_thread = threading.Thread(target=run, name='metrics-flush', daemon=True)
+        self._flush_thread.start()
+
+    def stop(self):
+        """Dừng luồng ghi định kỳ và ghi lần cuối"""
+        if self._flush_thread is not None:
+            self._stop_flush.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.flush()
+
+    def summary_line(self) -> str:
+        summary = self.snapshot()
+        return (f"{summary['requests_total']} request, "
+                f"{summary['bytes_received_total'] / 1024:.0f} KB, "
+                f"{summary['titles_collected']} phim ({summary['titles_per_sec']:.2f} phim/s), "
+                f"{sum(summary['errors'].values())} lỗi")
@@ -14,12 +14,17 @@ from wordcloud import WordCloud
 import os
 from sklearn.linear_model import LinearRegression
 
+from attribute_index import MULTI_VALUED_ATTRIBUTES, AttributeIndex, build_attribute_index, load_attribute_index
+from processed_schema import load_processed_data
+
 
 class MovieDataAnalyzer:
     """Class để phân tích và trực quan hóa dữ liệu phim"""
     
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, attribute_index: AttributeIndex = None):
         self.df = df
+        # Index đã lưu bởi save_processed_data (None thì dựng lại từ chuỗi khi cần)
+        self.attribute_index = attribute_index
         self.output_dir = 'visualizations'
         os.makedirs(self.output_dir, exist_ok=True)
         
@@ -62,7 +67,7 @@ class MovieDataAnalyzer:
         top_genres = self.df['Primary_Genre'].value_counts().head(8).index
         df_filtered = self.df[self.df['Primary_Genre'].isin(top_genres)]
         
-        avg_runtime = df_filtered.groupby('Primary_Genre')['Runtime'].mean().sort_values(ascending=True).reset_index()
+        avg_runtime = df_filtered.groupby('Primary_Genre', observed=True)['Runtime'].mean().sort_values(ascending=True).reset_index()
         
         fig = px.bar(
             avg_runtime,
@@ -380,12 +385,11 @@ class MovieDataAnalyzer:
     
     def plot_genre_wordcloud(self, save=True):
         """WordCloud từ thể loại"""
-        # Kết hợp tất cả genres
-        all_genres = []
-        for genres_list in self.df['Genres_List']:
-            all_genres.extend(genres_list)
-        
-        text = ' '.join(all_genres)
+        # Số phim theo mọi thể loại (không chỉ thể loại chính) từ multi-hot
+        index = self.attribute_index
+        if index is None or 'Genre' not in index.attributes:
+            index = build_attribute_index(self.df, {'Genre': MULTI_VALUED_ATTRIBUTES['Genre']})
+        genre_counts = index.counts('Genre')
         
         wordcloud = WordCloud(
             width=1200,
@@ -393,7 +397,7 @@ class MovieDataAnalyzer:
             background_color='white',
             colormap='plasma',
             max_words=50
-        ).generate(text)
+        ).generate_from_frequencies(genre_counts[genre_counts > 0].to_dict())
         
         fig, ax = plt.subplots(figsize=(15, 8))
         ax.imshow(wordcloud, interpolation='bilinear')
@@ -416,7 +420,7 @@ class MovieDataAnalyzer:
         top_genres = self.df['Primary_Genre'].value_counts().head(5).index
         df_filtered = self.df[self.df['Primary_Genre'].isin(top_genres)]
         
-        genre_decade_data = df_filtered.groupby(['Decade', 'Primary_Genre']).size().reset_index(name='Count')
+        genre_decade_data = df_filtered.groupby(['Decade', 'Primary_Genre'], observed=True).size().reset_index(name='Count')
         
         fig = px.bar(
             genre_decade_data,
@@ -512,11 +516,11 @@ def main():
         print(f"💡 Vui lòng chạy data_preprocessing.py trước")
         return
     
-    df = pd.read_csv(data_path, encoding='utf-8-sig')
+    df = load_processed_data(data_path)
     print(f"📂 Đã đọc {len(df)} phim từ {data_path}")
     
     # Khởi tạo analyzer
-    analyzer = MovieDataAnalyzer(df)
+    analyzer = MovieDataAnalyzer(df, attribute_index=load_attribute_index(data_path, n_movies=len(df)))
     
     # Tạo tất cả biểu đồ
     analyzer.generate_all_visualizations()
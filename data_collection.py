@@ -3,21 +3,114 @@ Data Collection Script for IMDb Movie Data
 Sử dụng OMDb API để thu thập dữ liệu phim
 """
 
-import requests
 import pandas as pd
-import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 
+from omdb_transport import OMDbTransport
+from rate_limiter import QuotaExceededError, TokenBucketRateLimiter
+from adaptive_concurrency import AIMDConcurrencyLimiter
+from collection_metrics import CollectionMetrics
+from response_cache import OMDbResponseCache
+from collection_checkpoint import CollectionCheckpoint, write_movies
+from raw_archive import write_raw_archive
+from incremental_collection import KnownMovieIndex, append_to_raw_store, index_path_for
+
+# Danh sách các từ khóa phổ biến mở rộng
+POPULAR_QUERIES = [
+    # Franchises lớn
+    'Star Wars', 'Marvel', 'Avengers', 'Iron Man', 'Captain America',
+    'Batman', 'Superman', 'Spider-Man', 'Wonder Woman', 'Aquaman',
+    'Lord of the Rings', 'Hobbit', 'Harry Potter',
+    'James Bond', 'Mission Impossible', 'Fast Furious',
+    'Jurassic', 'Transformers', 'Pirates Caribbean',
+    
+    # Directors nổi tiếng
+    'Nolan', 'Spielberg', 'Tarantino', 'Scorsese', 'Cameron',
+    'Fincher', 'Coen', 'Anderson', 'Villeneuve', 'Kubrick',
+    
+    # Classics
+    'Godfather', 'Pulp Fiction', 'Forrest Gump', 'Shawshank',
+    'Fight Club', 'Matrix', 'Inception', 'Interstellar',
+    'Titanic', 'Avatar', 'Gladiator', 'Braveheart',
+    
+    # Animation
+    'Toy Story', 'Finding Nemo', 'Frozen', 'Lion King',
+    'Up', 'Inside Out', 'Coco', 'Moana', 'Zootopia',
+    
+    # Horror/Thriller
+    'Exorcist', 'Shining', 'Silence Lambs', 'Psycho',
+    'Alien', 'Terminator', 'Predator', 'Jaws',
+    
+    # Comedy/Drama
+    'Forrest', 'Life Beautiful', 'Green Mile', 'Prestige',
+    'Departed', 'Usual Suspects', 'Good Will', 'American'
+]
+
+
+# Các lỗi OMDb là kết quả hợp lệ (không phải lỗi tạm thời) nên có thể cache
+CACHEABLE_ERRORS = {'Movie not found!', 'Too many results.'}
+
+
+# OMDb trả 10 kết quả mỗi trang và cho phép tối đa 100 trang
+OMDB_PAGE_SIZE = 10
+OMDB_MAX_PAGES = 100
+
+
+def is_cacheable_response(data: Dict) -> bool:
+    """Response có nên lưu vào cache không"""
+    return data.get('Response') == 'True' or data.get('Error') in CACHEABLE_ERRORS
+
+
 class MovieDataCollector:
     """Class để thu thập dữ liệu phim từ OMDb API"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: str = "http://www.omdbapi.com/",
+                 transport: OMDbTransport = None, rate_limiter: TokenBucketRateLimiter = None,
+                 cache: OMDbResponseCache = None, page_workers: int = 4,
+                 concurrency_limiter: AIMDConcurrencyLimiter = None,
+                 metrics: CollectionMetrics = None):
         self.api_key = api_key
-        self.base_url = "http://www.omdbapi.com/"
+        self.base_url = base_url
+        # Cache response trên đĩa (None = luôn gọi API)
+        self.cache = cache
+        # Session keep-alive + retry dùng chung cho mọi request.
+        # Mặc định giới hạn 5 request/giây (thay cho time.sleep(0.2) cố định).
+        # concurrency_limiter (AIMD) tự điều chỉnh số request đồng thời theo phản hồi của server
+        self.transport = transport or OMDbTransport(
+            base_url, rate_limiter=rate_limiter or TokenBucketRateLimiter(rate_per_sec=5.0),
+            concurrency_limiter=concurrency_limiter,
+            pool_maxsize=max(16, concurrency_limiter.max_limit if concurrency_limiter else 0),
+            observer=metrics
+        )
+        # Số liệu request / cache / lỗi / tốc độ thu thập (None = chỉ in tiến độ)
+        self.metrics = metrics
+        if metrics is not None:
+            if self.transport.observer is None:
+                self.transport.observer = metrics
+            metrics.attach(transport=self.transport, cache=cache,
+                           concurrency_limiter=self.transport.concurrency_limiter)
+        # Số trang tìm kiếm tải song song cho một từ khóa
+        self.page_workers = page_workers
+        # Các phim lấy chi tiết thất bại sau khi đã thử lại
+        self.failed_ids = []
+    
+    def _get_json(self, params: Dict) -> Dict:
+        """Gọi API, đọc/ghi cache nếu có"""
+        if self.cache is not None:
+            cached = self.cache.get(params)
+            if self.metrics is not None:
+                self.metrics.record_cache(params, cached is not None)
+            if cached is not None:
+                return cached
+        data = self.transport.get_json(params)
+        if self.cache is not None and is_cacheable_response(data):
+            self.cache.put(params, data)
+        return data
         
-    def search_movies(self, query: str, year: str = None) -> List[Dict]:
-        """Tìm kiếm phim theo từ khóa"""
+    def _search_page(self, query: str, year: str = None, page: int = 1) -> Dict:
+        """Gọi API tìm kiếm cho một trang kết quả (10 phim/trang)"""
         params = {
             'apikey': self.api_key,
             's': query,
@@ -25,25 +118,73 @@ class MovieDataCollector:
         }
         if year:
             params['y'] = year
-            
+        if page > 1:
+            params['page'] = page
+        return self._get_json(params)
+    
+    def search_movies(self, query: str, year: str = None, max_pages: int = 1) -> List[Dict]:
+        """
+        Tìm kiếm phim theo từ khóa
+        
+        Args:
+            query: Từ khóa tìm kiếm
+            year: Lọc theo năm (tùy chọn)
+            max_pages: Số trang tối đa cần lấy (None = tất cả, OMDb giới hạn 100 trang).
+                Các trang sau trang đầu được tải song song.
+        """
         try:
-            response = requests.get(self.base_url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('Response') == 'True':
-                    return data.get('Search', [])
-                else:
-                    # API trả về lỗi
-                    error = data.get('Error', 'Unknown error')
-                    if 'Invalid API key' in error:
-                        print(f"\n❌ API key không hợp lệ! Vui lòng kiểm tra lại.")
-                        print(f"💡 Đảm bảo bạn đã click link kích hoạt trong email!")
-                        return None  # Signal to stop
-                    # Không tìm thấy phim thì bỏ qua
-                    return []
+            data = self._search_page(query, year)
+            if data.get('Response') == 'True':
+                results = data.get('Search', [])
+            else:
+                # API trả về lỗi
+                error = data.get('Error', 'Unknown error')
+                if 'Invalid API key' in error:
+                    if self.metrics is not None:
+                        self.metrics.record_error('invalid_api_key')
+                    print(f"\n❌ API key không hợp lệ! Vui lòng kiểm tra lại.")
+                    print(f"💡 Đảm bảo bạn đã click link kích hoạt trong email!")
+                    return None  # Signal to stop
+                # Không tìm thấy phim thì bỏ qua
+                return []
+        except QuotaExceededError:
+            raise
         except Exception as e:
             print(f"  ⚠️ Lỗi khi tìm kiếm '{query}': {e}")
-        return []
+            if self.metrics is not None:
+                self.metrics.record_error('search_failed')
+            return []
+        
+        # Phân trang dựa trên totalResults
+        try:
+            total_results = int(data.get('totalResults', len(results)))
+        except ValueError:
+            total_results = len(results)
+        total_pages = min(OMDB_MAX_PAGES, -(-total_results // OMDB_PAGE_SIZE))
+        pages = total_pages if max_pages is None else min(total_pages, max_pages)
+        if pages < total_pages:
+            print(f"  ℹ️ '{query}' có {total_results} kết quả, chỉ lấy {pages}/{total_pages} trang")
+        if pages <= 1:
+            return results
+        
+        def fetch_page(page: int) -> List[Dict]:
+            try:
+                page_data = self._search_page(query, year, page)
+                if page_data.get('Response') == 'True':
+                    return page_data.get('Search', [])
+            except QuotaExceededError:
+                raise
+            except Exception as e:
+                print(f"  ⚠️ Lỗi khi tìm kiếm '{query}' trang {page}: {e}")
+                if self.metrics is not None:
+                    self.metrics.record_error('search_failed')
+            return []
+        
+        # executor.map giữ đúng thứ tự trang
+        with ThreadPoolExecutor(max_workers=min(self.page_workers, pages - 1)) as executor:
+            for page_results in executor.map(fetch_page, range(2, pages + 1)):
+                results.extend(page_results)
+        return results
     
     def get_movie_details(self, imdb_id: str) -> Dict:
         """Lấy thông tin chi tiết của một phim"""
@@ -54,61 +195,206 @@ class MovieDataCollector:
         }
         
         try:
-            response = requests.get(self.base_url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('Response') == 'True':
-                    return data
+            data = self._get_json(params)
+            if data.get('Response') == 'True':
+                return data
+        except QuotaExceededError:
+            raise
         except Exception as e:
             print(f"  ⚠️ Lỗi khi lấy chi tiết phim {imdb_id}: {e}")
+            self.failed_ids.append(imdb_id)
+            if self.metrics is not None:
+                self.metrics.record_error('detail_failed')
         return {}
     
-    def collect_popular_movies(self, queries: List[str], save_path: str = 'data/raw_movies.csv'):
+    def collect_popular_movies(self, queries: List[str], save_path: str = 'data/raw_movies.csv',
+                               max_workers: int = 1, checkpoint_path: str = None,
+                               resume: bool = False, max_pages: int = 1,
+                               incremental: bool = False, refresh_days: float = None,
+                               known_paths: List[str] = None, archive_path: str = None):
         """
         Thu thập dữ liệu từ danh sách các từ khóa phổ biến
         
         Args:
             queries: Danh sách các từ khóa tìm kiếm
-            save_path: Đường dẫn lưu file
+            save_path: Đường dẫn lưu file (.csv hoặc .parquet, xem write_movies)
+            max_workers: Số luồng lấy chi tiết phim song song (1 = tuần tự như cũ).
+                Thứ tự phim trong kết quả luôn giống chế độ tuần tự. Khi transport có
+                concurrency_limiter, số request thực sự chạy đồng thời do cửa sổ AIMD quyết định
+                (số luồng được nâng lên max_limit của limiter).
+            checkpoint_path: File NDJSON để ghi từng phim ngay khi lấy được
+                (None = giữ trong bộ nhớ rồi ghi một lần ở cuối như cũ)
+            resume: Tiếp tục từ checkpoint, bỏ qua các từ khóa và phim đã xong
+            max_pages: Số trang kết quả tìm kiếm tối đa cho mỗi từ khóa (None = tất cả)
+            incremental: Chỉ lấy chi tiết các phim chưa có trong raw store / known_paths
+                và append phần mới vào save_path (thay vì ghi đè)
+            refresh_days: Ở chế độ incremental, lấy lại các phim đã lấy cách đây hơn N ngày
+            known_paths: Các dataset khác chứa cột imdbID để coi là đã có
+                (mặc định data/processed_movies.csv)
+            archive_path: Lưu nguyên response chi tiết phim (.ndjson.gz hoặc .parquet, xem
+                raw_archive.py); ở chế độ incremental archive NDJSON được ghi nối thêm
         """
         all_movies = []
         seen_ids = set()
+        done_queries = set()
+        
+        known_index = None
+        if incremental:
+            if known_paths is None:
+                known_paths = ['data/processed_movies.csv']
+            known_index = KnownMovieIndex.load(index_path_for(save_path), [save_path, *known_paths])
+            fresh_ids = known_index.fresh_ids(refresh_days)
+            print(f"📚 Đã có {len(known_index)} phim, "
+                  f"{len(known_index) - len(fresh_ids)} phim cần làm mới")
+        
+        checkpoint = None
+        if checkpoint_path:
+            checkpoint = CollectionCheckpoint(checkpoint_path)
+            if resume:
+                done_queries, seen_ids = checkpoint.load_progress()
+                print(f"♻️ Tiếp tục từ checkpoint: {len(done_queries)} từ khóa, "
+                      f"{len(seen_ids)} phim đã có")
+            else:
+                checkpoint.reset()
+            checkpoint.open()
+        
+        if known_index is not None:
+            seen_ids |= fresh_ids
         
         print(f"🎬 Bắt đầu thu thập dữ liệu từ {len(queries)} từ khóa...")
+        rate_limiter = self.transport.rate_limiter
+        if rate_limiter is not None and rate_limiter.daily_quota is not None:
+            print(f"📊 Hạn mức còn lại hôm nay: {rate_limiter.remaining_quota()} request")
+        concurrency_limiter = self.transport.concurrency_limiter
+        if concurrency_limiter is not None:
+            max_workers = max(max_workers, concurrency_limiter.max_limit)
+            print(f"📈 Tự điều chỉnh số request đồng thời (AIMD), cửa sổ ban đầu "
+                  f"{concurrency_limiter.window:.0f}, tối đa {concurrency_limiter.max_limit}")
+        elif max_workers > 1:
+            print(f"⚡ Lấy chi tiết song song với {max_workers} luồng")
         
-        for i, query in enumerate(queries, 1):
-            print(f"📍 [{i}/{len(queries)}] Tìm kiếm: {query}")
-            movies = self.search_movies(query)
-            
-            # Kiểm tra nếu API key không hợp lệ
-            if movies is None:
-                print("\n❌ Dừng thu thập do API key không hợp lệ!")
-                print("💡 Vui lòng:")
-                print("   1. Kiểm tra email và click link kích hoạt")
-                print("   2. Đợi vài phút để API key được kích hoạt")
-                print("   3. Chạy lại script này")
-                return pd.DataFrame()
-            
-            for movie in movies:
-                imdb_id = movie.get('imdbID')
-                if imdb_id and imdb_id not in seen_ids:
-                    print(f"  ⏳ Lấy chi tiết: {movie.get('Title', 'N/A')}")
-                    details = self.get_movie_details(imdb_id)
+        executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+        try:
+            for i, query in enumerate(queries, 1):
+                if query in done_queries:
+                    continue
+                print(f"📍 [{i}/{len(queries)}] Tìm kiếm: {query}")
+                movies = self.search_movies(query, max_pages=max_pages)
+                
+                # Kiểm tra nếu API key không hợp lệ
+                if movies is None:
+                    print("\n❌ Dừng thu thập do API key không hợp lệ!")
+                    print("💡 Vui lòng:")
+                    print("   1. Kiểm tra email và click link kích hoạt")
+                    print("   2. Đợi vài phút để API key được kích hoạt")
+                    print("   3. Chạy lại script này")
+                    return pd.DataFrame()
+                
+                # Chọn các phim chưa có (giữ nguyên thứ tự kết quả tìm kiếm)
+                pending = []
+                pending_ids = set()
+                for movie in movies:
+                    imdb_id = movie.get('imdbID')
+                    if imdb_id and imdb_id not in seen_ids and imdb_id not in pending_ids:
+                        print(f"  ⏳ Lấy chi tiết: {movie.get('Title', 'N/A')}")
+                        pending.append(imdb_id)
+                        pending_ids.add(imdb_id)
+                
+                # executor.map trả kết quả đúng thứ tự đầu vào nên output vẫn xác định
+                if executor is not None:
+                    results = executor.map(self.get_movie_details, pending)
+                else:
+                    results = map(self.get_movie_details, pending)
+                
+                for imdb_id, details in zip(pending, results):
                     if details:
-                        all_movies.append(details)
+                        if checkpoint is not None:
+                            checkpoint.append_movie(details, query)
+                        else:
+                            all_movies.append(details)
                         seen_ids.add(imdb_id)
-                    time.sleep(0.2)  # Tránh rate limit
+                        if self.metrics is not None:
+                            self.metrics.record_titles()
+                
+                if checkpoint is not None:
+                    checkpoint.mark_query_done(query)
+        except QuotaExceededError as e:
+            # Hết hạn mức: dừng lại nhưng vẫn lưu những phim đã lấy được
+            print(f"\n⛔ {e}. Dừng thu thập và lưu kết quả hiện có.")
+            if self.metrics is not None:
+                self.metrics.record_error('quota_exceeded')
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+            if checkpoint is not None:
+                checkpoint.close()
+        
+        if self.failed_ids:
+            print(f"\n⚠️ {len(self.failed_ids)} phim không lấy được chi tiết sau khi thử lại: "
+                  f"{', '.join(self.failed_ids[:10])}{' ...' if len(self.failed_ids) > 10 else ''}")
+        
+        if concurrency_limiter is not None:
+            aimd_stats = concurrency_limiter.stats()
+            print(f"📈 Cửa sổ AIMD cuối: {aimd_stats['window']} "
+                  f"(+{aimd_stats['increases']} / -{aimd_stats['decreases']} lần)")
+        
+        if self.cache is not None:
+            cache_stats = self.cache.stats()
+            print(f"🗄️ Cache: {cache_stats['hits']} hit / {cache_stats['misses']} miss "
+                  f"({cache_stats['hit_rate']:.0%})")
         
-        # Chuyển sang DataFrame
-        df = pd.DataFrame(all_movies)
+        if self.metrics is not None:
+            print(f"📊 Số liệu: {self.metrics.summary_line()}")
         
-        # Tạo thư mục nếu chưa tồn tại
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        if archive_path:
+            if checkpoint is not None:
+                archived = checkpoint.archive(archive_path, append=incremental)
+            else:
+                archived = write_raw_archive(all_movies, archive_path, append=incremental)
+            print(f"🗃️ Đã lưu {archived} response gốc vào {archive_path}")
         
-        # Lưu file
-        df.to_csv(save_path, index=False, encoding='utf-8-sig')
+        if checkpoint is not None:
+            # Gộp checkpoint thành file output theo từng chunk
+            # (chế độ incremental: gộp ra file delta rồi mới append vào raw store)
+            output_path = save_path + '.delta' + os.path.splitext(save_path)[1] if incremental else save_path
+            checkpoint.compact(output_path)
+            if output_path.endswith('.parquet'):
+                df = pd.read_parquet(output_path)
+            else:
+                df = pd.read_csv(output_path, encoding='utf-8-sig')
+            if incremental:
+                os.remove(output_path)
+        else:
+            # Chuyển sang DataFrame
+            df = pd.DataFrame(all_movies)
+        
+        fetched_ids = df['imdbID'].dropna().tolist() if 'imdbID' in df.columns else []
+        
+        if incremental:
+            refreshed_ids = {imdb_id for imdb_id in fetched_ids if imdb_id in known_index}
+            appended = append_to_raw_store(save_path, df, refreshed_ids)
+            known_index.record(fetched_ids)
+            known_index.save()
+            print(f"\n✅ Đã thêm {appended} phim vào {save_path} "
+                  f"({appended - len(refreshed_ids)} mới, {len(refreshed_ids)} làm mới)")
+            return df
+        
+        if checkpoint is None and save_path.endswith('.parquet'):
+            # Cùng định dạng Parquet với chế độ checkpoint (mọi cột dạng chuỗi)
+            write_movies([all_movies], list(df.columns), save_path)
+        elif checkpoint is None:
+            # Tạo thư mục nếu chưa tồn tại
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            
+            # Lưu file
+            df.to_csv(save_path, index=False, encoding='utf-8-sig')
         print(f"\n✅ Đã lưu {len(df)} phim vào {save_path}")
         
+        # Raw store vừa được ghi lại toàn bộ nên index cũng làm lại từ đầu
+        known_index = KnownMovieIndex(index_path_for(save_path))
+        known_index.record(fetched_ids)
+        known_index.save()
+        
         return df
 
 
@@ -231,40 +517,69 @@ def main():
         # Sử dụng API thật
         print("🔑 Sử dụng OMDb API để thu thập dữ liệu...")
         print(f"🎯 Mục tiêu: Thu thập 100+ phim từ nhiều thể loại\n")
-        collector = MovieDataCollector(api_key)
-        
-        # Danh sách các từ khóa phổ biến mở rộng
-        popular_queries = [
-            # Franchises lớn
-            'Star Wars', 'Marvel', 'Avengers', 'Iron Man', 'Captain America',
-            'Batman', 'Superman', 'Spider-Man', 'Wonder Woman', 'Aquaman',
-            'Lord of the Rings', 'Hobbit', 'Harry Potter',
-            'James Bond', 'Mission Impossible', 'Fast Furious',
-            'Jurassic', 'Transformers', 'Pirates Caribbean',
-            
-            # Directors nổi tiếng
-            'Nolan', 'Spielberg', 'Tarantino', 'Scorsese', 'Cameron',
-            'Fincher', 'Coen', 'Anderson', 'Villeneuve', 'Kubrick',
-            
-            # Classics
-            'Godfather', 'Pulp Fiction', 'Forrest Gump', 'Shawshank',
-            'Fight Club', 'Matrix', 'Inception', 'Interstellar',
-            'Titanic', 'Avatar', 'Gladiator', 'Braveheart',
-            
-            # Animation
-            'Toy Story', 'Finding Nemo', 'Frozen', 'Lion King',
-            'Up', 'Inside Out', 'Coco', 'Moana', 'Zootopia',
-            
-            # Horror/Thriller
-            'Exorcist', 'Shining', 'Silence Lambs', 'Psycho',
-            'Alien', 'Terminator', 'Predator', 'Jaws',
-            
-            # Comedy/Drama
-            'Forrest', 'Life Beautiful', 'Green Mile', 'Prestige',
-            'Departed', 'Usual Suspects', 'Good Will', 'American'
-        ]
+        # Ngân sách request dùng chung cho mọi process thu thập trên máy này
+        rate_limiter = TokenBucketRateLimiter(
+            rate_per_sec=float(os.getenv('OMDB_RATE_PER_SEC', '5')),
+            daily_quota=int(os.getenv('OMDB_DAILY_QUOTA', '1000')),
+            state_path='data/.omdb_rate_limit.json'
+        )
+        # Cache response trên đĩa để chạy lại không tải lại (OMDB_CACHE=0 để tắt)
+        cache = None
+        if os.getenv('OMDB_CACHE', '1') != '0':
+            cache = OMDbResponseCache('data/.omdb_cache.sqlite')
+        # OMDB_ADAPTIVE=1: tự điều chỉnh số request đồng thời theo phản hồi của OMDb
+        concurrency_limiter = None
+        if os.getenv('OMDB_ADAPTIVE', '0') == '1':
+            concurrency_limiter = AIMDConcurrencyLimiter(
+                max_limit=int(os.getenv('OMDB_MAX_CONCURRENCY', '32'))
+            )
+        # Số liệu thu thập: JSON + file Prometheus (textfile collector) trong OMDB_METRICS_DIR,
+        # OMDB_METRICS_FLUSH_SEC=N để ghi định kỳ trong lúc chạy
+        metrics_dir = os.getenv('OMDB_METRICS_DIR', 'data/metrics')
+        metrics_flush_sec = float(os.environ['OMDB_METRICS_FLUSH_SEC']) if os.getenv('OMDB_METRICS_FLUSH_SEC') else None
         
-        df = collector.collect_popular_movies(popular_queries)
+        # Số luồng lấy chi tiết song song (mặc định 4, đặt OMDB_MAX_WORKERS=1 để chạy tuần tự)
+        max_workers = int(os.getenv('OMDB_MAX_WORKERS', '4'))
+        shards = int(os.getenv('OMDB_SHARDS', '1'))
+        if shards > 1:
+            # Chia danh sách từ khóa cho nhiều process (xem sharded_collection.py),
+            # mỗi shard ghi số liệu riêng vào metrics_dir
+            from sharded_collection import run_sharded
+            df = run_sharded(
+                api_key, POPULAR_QUERIES, shards,
+                max_workers=max_workers, max_pages=int(os.getenv('OMDB_MAX_PAGES', '3')),
+                rate_per_sec=rate_limiter.rate_per_sec, daily_quota=rate_limiter.daily_quota,
+                rate_limit_state=rate_limiter.state_path,
+                cache_path=cache.path if cache is not None else None,
+                metrics_dir=metrics_dir, metrics_flush_sec=metrics_flush_sec
+            )
+            print(f"📊 Đã ghi số liệu của từng shard vào {metrics_dir}")
+            if df is None:
+                return
+        else:
+            metrics = CollectionMetrics(json_path=os.path.join(metrics_dir, 'omdb_collection.json'),
+                                        prometheus_path=os.path.join(metrics_dir, 'omdb_collection.prom'))
+            if metrics_flush_sec:
+                metrics.start_periodic_flush(metrics_flush_sec)
+            collector = MovieDataCollector(api_key, rate_limiter=rate_limiter, cache=cache,
+                                           concurrency_limiter=concurrency_limiter, metrics=metrics)
+            try:
+                # Ghi checkpoint để chạy lại với OMDB_RESUME=1 nếu bị gián đoạn
+                df = collector.collect_popular_movies(
+                    POPULAR_QUERIES, max_workers=max_workers,
+                    checkpoint_path='data/raw_movies.checkpoint.ndjson',
+                    resume=os.getenv('OMDB_RESUME', '0') == '1',
+                    max_pages=int(os.getenv('OMDB_MAX_PAGES', '3')),
+                    # OMDB_INCREMENTAL=1: chỉ lấy phim mới; OMDB_REFRESH_DAYS=N: làm mới phim cũ hơn N ngày
+                    incremental=os.getenv('OMDB_INCREMENTAL', '0') == '1',
+                    refresh_days=float(os.environ['OMDB_REFRESH_DAYS']) if os.getenv('OMDB_REFRESH_DAYS') else None,
+                    # Response gốc (giữ nguyên Ratings lồng nhau), OMDB_ARCHIVE= để tắt
+                    archive_path=os.getenv('OMDB_ARCHIVE', 'data/raw_movies.archive.ndjson.gz') or None
+                )
+            finally:
+                # Kể cả khi lỗi / Ctrl+C: dừng luồng ghi định kỳ và ghi số liệu lần cuối
+                metrics.stop()
+                print(f"📊 Đã ghi số liệu vào {metrics_dir}")
     else:
         # Sử dụng dataset mẫu
         print("⚠️ Không tìm thấy API key. Sử dụng dataset mẫu...")
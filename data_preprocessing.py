@@ -3,42 +3,146 @@ Data Preprocessing Script for IMDb Movie Data
 Chuẩn hóa kiểu dữ liệu, xử lý missing values, tạo features mới
 """
 
+import argparse
+import functools
+import re
+import sys
+from contextlib import nullcontext
 import pandas as pd
 import numpy as np
-import re
 import os
+from typing import Dict, List, Optional
+
+from dataset_ingest import read_raw_columns, read_raw_dataset
+from memory_budget import MemoryBudgetExceeded, StepMemoryProfiler
+from processed_schema import RATING_LABELS, RUNTIME_LABELS, compact_dtypes, memory_mb, processed_parquet_path
+
+# File processed đầy đủ mà data_analysis / dashboard đọc
+PROCESSED_PATH = 'data/processed_movies.csv'
+
+# Chuẩn hóa tên cột để thống nhất (dataset IMDB-Movie-Data)
+RAW_COLUMN_MAPPING = {
+    'Runtime (Minutes)': 'Runtime',
+    'Revenue (Millions)': 'BoxOffice',
+    'Rank': 'ID'
+}
+
+# Các bước chỉ phụ thuộc từng dòng (chạy được độc lập trên từng chunk), theo đúng thứ tự
+# của chain trong preprocess_movie_data. Hai bước toàn cục là remove_duplicates (trước)
+# và handle_missing_values (sau, cần median của toàn bộ dữ liệu).
+ROW_LOCAL_STEPS = (
+    'clean_year',
+    'clean_rating',
+    'clean_runtime',
+    'clean_box_office',
+    'clean_budget',
+    'split_genres',
+    'extract_country',
+    'create_decade',
+    'create_roi',
+    'create_profit',
+    'categorize_rating',
+    'categorize_runtime',
+)
+
+# Toàn bộ chain của preprocess_movie_data theo thứ tự; ở chế độ lazy các bước này được ghi
+# vào plan (lazy_preprocessing) thay vì chạy ngay
+PREPROCESS_CHAIN = ('remove_duplicates',) + ROW_LOCAL_STEPS + ('handle_missing_values', 'apply_compact_schema')
+
+def _is_text(series: pd.Series) -> bool:
+    """Cột dạng chuỗi (object hoặc str của pandas 3) cần làm sạch bằng regex"""
+    return pd.api.types.is_string_dtype(series.dtype)
+
+
+def _as_text(series: pd.Series) -> pd.Series:
+    """Giá trị dạng chuỗi như str(x), giữ nguyên NaN"""
+    return series.astype(str).where(series.notna())
+
+
+def _step(method):
+    """
+    Bước của chain: ở chế độ lazy, bước thuộc PREPROCESS_CHAIN chỉ được ghi vào plan, bước khác
+    chạy plan trước; đo bộ nhớ khi preprocessor có profiler (StepMemoryProfiler), ngân sách bộ nhớ
+    được kiểm tra trước và sau bước nên bị dừng thì self.df vẫn là kết quả của bước trước
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.plan is not None:
+            if method.__name__ in PREPROCESS_CHAIN:
+                self.plan.append((method.__name__, args, kwargs))
+                return self
+            self._run_plan()
+        if self.profiler is None:
+            return method(self, *args, **kwargs)
+        with self.profiler.step(method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def enable_copy_on_write():
+    """Bật copy-on-write của pandas (luôn bật từ pandas 3)"""
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
 
 
 class MovieDataPreprocessor:
     """Class để tiền xử lý dữ liệu phim"""
     
-    def __init__(self, df: pd.DataFrame):
-        self.df = df.copy()
+    def __init__(self, df: pd.DataFrame, verbose: bool = True, copy: bool = True,
+                 profiler: Optional[StepMemoryProfiler] = None, lazy: bool = False,
+                 columns: Optional[List[str]] = None):
+        """
+        Args:
+            copy: False = không sao chép cả frame; dùng bản shallow copy, dựa vào copy-on-write
+                  (enable_copy_on_write) để cột của df gốc chỉ bị sao chép khi bị ghi
+            profiler: StepMemoryProfiler đo bộ nhớ từng bước (None = không đo)
+            lazy: Chỉ ghi các bước vào plan, tối ưu và chạy khi cần kết quả (lazy_preprocessing);
+                  df không bị sao chép vì plan chỉ đọc các cột cần
+            columns: Cột cần có trong kết quả ở chế độ lazy (None = mọi cột)
+        """
+        self.df = df.copy() if copy and not lazy else df.copy(deep=False)
+        self.verbose = verbose
+        self.profiler = profiler
+        self.plan: Optional[List] = [] if lazy else None
+        self.columns = columns
+    
+    def _log(self, message: str = ''):
+        if self.verbose:
+            print(message)
+    
+    def _run_plan(self):
+        """Tối ưu rồi chạy các bước đã ghi (chế độ lazy)"""
+        if not self.plan:
+            return
+        from lazy_preprocessing import execute_plan, optimize_plan
+        
+        plan = optimize_plan(self.plan, list(self.df.columns), self.columns)
+        self._log(plan.explain())
+        self.df = execute_plan(self.df, plan, verbose=self.verbose, profiler=self.profiler)
+        self.plan = []
         
+    @_step
     def clean_year(self):
         """Chuẩn hóa cột Year"""
         if 'Year' in self.df.columns:
             # Chuyển về dạng số, xử lý các giá trị không hợp lệ
-            self.df['Year'] = pd.to_numeric(self.df['Year'], errors='coerce')
+            year = pd.to_numeric(self.df['Year'], errors='coerce')
             # Lọc các năm hợp lý (1900-2025)
-            self.df['Year'] = self.df['Year'].apply(
-                lambda x: x if 1900 <= x <= 2025 else np.nan
-            )
-            print(f"✅ Đã chuẩn hóa cột Year")
+            self.df['Year'] = year.where(year.between(1900, 2025))
+            self._log(f"✅ Đã chuẩn hóa cột Year")
         return self
     
+    @_step
     def clean_rating(self):
         """Chuẩn hóa cột Rating (imdbRating)"""
         rating_cols = ['imdbRating', 'Rating']
         
         for col in rating_cols:
             if col in self.df.columns:
-                self.df[col] = pd.to_numeric(self.df[col], errors='coerce')
+                rating = pd.to_numeric(self.df[col], errors='coerce')
                 # Rating từ 0-10
-                self.df[col] = self.df[col].apply(
-                    lambda x: x if 0 <= x <= 10 else np.nan
-                )
-                print(f"✅ Đã chuẩn hóa cột {col}")
+                self.df[col] = rating.where(rating.between(0, 10))
+                self._log(f"✅ Đã chuẩn hóa cột {col}")
         
         # Rename để thống nhất
         if 'imdbRating' in self.df.columns:
@@ -46,116 +150,134 @@ class MovieDataPreprocessor:
             
         return self
     
+    @_step
     def clean_runtime(self):
         """Chuẩn hóa cột Runtime (phút)"""
         if 'Runtime' in self.df.columns:
-            # Xử lý string dạng "142 min" -> 142
-            if self.df['Runtime'].dtype == 'object':
-                self.df['Runtime'] = self.df['Runtime'].apply(
-                    lambda x: re.findall(r'\d+', str(x))[0] if pd.notna(x) and re.findall(r'\d+', str(x)) else np.nan
-                )
-            self.df['Runtime'] = pd.to_numeric(self.df['Runtime'], errors='coerce')
-            print(f"✅ Đã chuẩn hóa cột Runtime")
+            # Xử lý string dạng "142 min" -> 142 (nhóm chữ số đầu tiên)
+            runtime = self.df['Runtime']
+            if _is_text(runtime):
+                runtime = _as_text(runtime).str.extract(r'(\d+)', expand=False)
+            self.df['Runtime'] = pd.to_numeric(runtime, errors='coerce')
+            self._log(f"✅ Đã chuẩn hóa cột Runtime")
         return self
     
+    @_step
     def clean_box_office(self):
         """Chuẩn hóa cột BoxOffice (USD)"""
         if 'BoxOffice' in self.df.columns:
             # Xử lý string dạng "$123,456,789" -> 123456789
-            if self.df['BoxOffice'].dtype == 'object':
-                self.df['BoxOffice'] = self.df['BoxOffice'].apply(
-                    lambda x: re.sub(r'[^\d]', '', str(x)) if pd.notna(x) else np.nan
-                )
-            self.df['BoxOffice'] = pd.to_numeric(self.df['BoxOffice'], errors='coerce')
-            print(f"✅ Đã chuẩn hóa cột BoxOffice")
+            box_office = self.df['BoxOffice']
+            if _is_text(box_office):
+                box_office = _as_text(box_office).str.replace(r'[^\d]', '', regex=True)
+            self.df['BoxOffice'] = pd.to_numeric(box_office, errors='coerce')
+            self._log(f"✅ Đã chuẩn hóa cột BoxOffice")
         return self
     
+    @_step
     def clean_budget(self):
         """Chuẩn hóa cột Budget"""
         if 'Budget' in self.df.columns:
-            if self.df['Budget'].dtype == 'object':
-                self.df['Budget'] = self.df['Budget'].apply(
-                    lambda x: re.sub(r'[^\d]', '', str(x)) if pd.notna(x) else np.nan
-                )
-            self.df['Budget'] = pd.to_numeric(self.df['Budget'], errors='coerce')
-            print(f"✅ Đã chuẩn hóa cột Budget")
+            budget = self.df['Budget']
+            if _is_text(budget):
+                budget = _as_text(budget).str.replace(r'[^\d]', '', regex=True)
+            self.df['Budget'] = pd.to_numeric(budget, errors='coerce')
+            self._log(f"✅ Đã chuẩn hóa cột Budget")
         return self
     
+    @_step
     def split_genres(self):
         """Tách cột Genre thành list"""
         if 'Genre' in self.df.columns:
-            # Tách theo dấu phẩy
-            self.df['Genres_List'] = self.df['Genre'].apply(
-                lambda x: [g.strip() for g in str(x).split(',')] if pd.notna(x) else []
-            )
-            # Lấy genre đầu tiên làm primary genre
-            self.df['Primary_Genre'] = self.df['Genres_List'].apply(
-                lambda x: x[0] if len(x) > 0 else 'Unknown'
+            genres = _as_text(self.df['Genre'])
+            # Tổ hợp thể loại lặp lại rất nhiều: tách mỗi chuỗi khác nhau một lần
+            # (bỏ khoảng trắng ở hai đầu và quanh dấu phẩy), thiếu giá trị -> mã -1
+            codes, uniques = pd.factorize(genres)
+            parts = [[genre.strip() for genre in value.strip().split(',')] for value in uniques]
+            # Mỗi dòng một list riêng (sửa list của dòng này không ảnh hưởng dòng khác)
+            self.df['Genres_List'] = pd.Series(
+                [list(parts[code]) if code >= 0 else [] for code in codes], index=genres.index, dtype=object
             )
-            # Đếm số genre
-            self.df['Genre_Count'] = self.df['Genres_List'].apply(len)
-            print(f"✅ Đã tách cột Genre")
+            # Genre đầu tiên làm primary genre và số genre; phần tử cuối dành cho mã -1 (thiếu)
+            primary = np.array([part[0] for part in parts] + ['Unknown'], dtype=object)
+            counts = np.array([len(part) for part in parts] + [0], dtype='int64')
+            self.df['Primary_Genre'] = pd.Series(primary[codes], index=genres.index, dtype=genres.dtype)
+            self.df['Genre_Count'] = pd.Series(counts[codes], index=genres.index)
+            self._log(f"✅ Đã tách cột Genre")
         return self
     
+    @_step
     def extract_country(self):
         """Lấy quốc gia chính"""
         if 'Country' in self.df.columns:
             # Lấy quốc gia đầu tiên
-            self.df['Primary_Country'] = self.df['Country'].apply(
-                lambda x: str(x).split(',')[0].strip() if pd.notna(x) else 'Unknown'
-            )
-            print(f"✅ Đã trích xuất quốc gia chính")
+            self.df['Primary_Country'] = (_as_text(self.df['Country'])
+                                          .str.replace(r'(?s),.*', '', regex=True)
+                                          .str.strip()
+                                          .fillna('Unknown'))
+            self._log(f"✅ Đã trích xuất quốc gia chính")
         return self
     
+    @_step
     def create_decade(self):
         """Tạo cột Decade (thập kỷ)"""
         if 'Year' in self.df.columns:
             self.df['Decade'] = (self.df['Year'] // 10 * 10).astype('Int64')
-            print(f"✅ Đã tạo cột Decade")
+            self._log(f"✅ Đã tạo cột Decade")
         return self
     
+    @_step
     def create_roi(self):
         """Tạo cột ROI (Return on Investment)"""
         if 'BoxOffice' in self.df.columns and 'Budget' in self.df.columns:
-            self.df['ROI'] = (
-                (self.df['BoxOffice'] - self.df['Budget']) / self.df['Budget'] * 100
-            ).round(2)
-            self.df['ROI'] = self.df['ROI'].replace([np.inf, -np.inf], np.nan)
-            print(f"✅ Đã tạo cột ROI")
+            roi = ((self.df['BoxOffice'] - self.df['Budget']) / self.df['Budget'] * 100).round(2)
+            self.df['ROI'] = roi.replace([np.inf, -np.inf], np.nan)
+            self._log(f"✅ Đã tạo cột ROI")
         return self
     
+    @_step
     def create_profit(self):
         """Tạo cột Profit"""
         if 'BoxOffice' in self.df.columns and 'Budget' in self.df.columns:
             self.df['Profit'] = self.df['BoxOffice'] - self.df['Budget']
-            print(f"✅ Đã tạo cột Profit")
+            self._log(f"✅ Đã tạo cột Profit")
         return self
     
+    @_step
     def categorize_rating(self):
         """Phân loại Rating thành các nhóm"""
         if 'Rating' in self.df.columns:
             self.df['Rating_Category'] = pd.cut(
                 self.df['Rating'],
                 bins=[0, 5, 7, 8, 10],
-                labels=['Poor', 'Average', 'Good', 'Excellent']
+                labels=RATING_LABELS
             )
-            print(f"✅ Đã phân loại Rating")
+            self._log(f"✅ Đã phân loại Rating")
         return self
     
+    @_step
     def categorize_runtime(self):
         """Phân loại Runtime"""
         if 'Runtime' in self.df.columns:
             self.df['Runtime_Category'] = pd.cut(
                 self.df['Runtime'],
                 bins=[0, 90, 120, 150, 300],
-                labels=['Short', 'Medium', 'Long', 'Very Long']
+                labels=RUNTIME_LABELS
             )
-            print(f"✅ Đã phân loại Runtime")
+            self._log(f"✅ Đã phân loại Runtime")
         return self
     
-    def handle_missing_values(self):
-        """Xử lý missing values"""
-        print("\n📊 Xử lý missing values:")
+    @_step
+    def handle_missing_values(self, medians: Optional[Dict[str, float]] = None):
+        """
+        Xử lý missing values
+        
+        Args:
+            medians: Median tính sẵn cho từng cột số (vd. median toàn file ở chế độ chunk),
+                     cột không có trong dict dùng median của self.df
+        """
+        self._log("\n📊 Xử lý missing values:")
+        medians = medians or {}
         
         # Điền giá trị cho các cột số
         numeric_cols = self.df.select_dtypes(include=[np.number]).columns
@@ -163,104 +285,223 @@ class MovieDataPreprocessor:
             missing_count = self.df[col].isna().sum()
             if missing_count > 0:
                 # Điền median cho numeric
-                self.df[col].fillna(self.df[col].median(), inplace=True)
-                print(f"  - {col}: Điền {missing_count} giá trị bằng median")
+                median = medians[col] if col in medians else self.df[col].median()
+                self.df[col] = self.df[col].fillna(median)
+                self._log(f"  - {col}: Điền {missing_count} giá trị bằng median")
         
         # Điền giá trị cho các cột string
         string_cols = self.df.select_dtypes(include=['object']).columns
         for col in string_cols:
             missing_count = self.df[col].isna().sum()
             if missing_count > 0:
-                self.df[col].fillna('Unknown', inplace=True)
-                print(f"  - {col}: Điền {missing_count} giá trị bằng 'Unknown'")
+                self.df[col] = self.df[col].fillna('Unknown')
+                self._log(f"  - {col}: Điền {missing_count} giá trị bằng 'Unknown'")
         
         return self
     
+    @_step
     def remove_duplicates(self):
         """Loại bỏ các bản ghi trùng lặp"""
         initial_count = len(self.df)
         
-        # Xóa trùng dựa trên Title và Year
-        if 'Title' in self.df.columns and 'Year' in self.df.columns:
-            self.df.drop_duplicates(subset=['Title', 'Year'], keep='first', inplace=True)
-        else:
-            self.df.drop_duplicates(inplace=True)
+        # Xóa trùng dựa trên Title và Year; không có bản trùng thì giữ nguyên frame (không sao chép)
+        subset = ['Title', 'Year'] if 'Title' in self.df.columns and 'Year' in self.df.columns else None
+        duplicated = self.df.duplicated(subset=subset, keep='first')
+        if duplicated.any():
+            self.df = self.df[~duplicated.to_numpy()]
         
         removed_count = initial_count - len(self.df)
         if removed_count > 0:
-            print(f"✅ Đã loại bỏ {removed_count} bản ghi trùng lặp")
+            self._log(f"✅ Đã loại bỏ {removed_count} bản ghi trùng lặp")
+        return self
+    
+    @_step
+    def apply_compact_schema(self):
+        """Áp dụng schema gọn (processed_schema): category, int16/int32, float32 khi vừa"""
+        before = memory_mb(self.df)
+        self.df = compact_dtypes(self.df)
+        self._log(f"✅ Đã áp dụng schema gọn: {before:.1f} MB -> {memory_mb(self.df):.1f} MB")
+        return self
+    
+    @_step
+    def run_parallel(self, workers: Optional[int] = None, partitions: Optional[int] = None):
+        """
+        Chạy tất cả ROW_LOCAL_STEPS trên nhiều process (parallel_preprocessing)
+        
+        Args:
+            workers: Số process (mặc định = số CPU)
+            partitions: Số phân vùng theo dòng (mặc định = workers)
+        """
+        from parallel_preprocessing import process_partitions
+        
+        self.df = process_partitions(self.df, workers=workers, partitions=partitions)
         return self
     
     def get_processed_data(self):
-        """Trả về DataFrame đã xử lý"""
+        """Trả về DataFrame đã xử lý (chế độ lazy: chạy plan trước)"""
+        if self.plan:
+            self._run_plan()
         return self.df
     
-    def save_processed_data(self, output_path: str = 'data/processed_movies.csv'):
-        """Lưu dữ liệu đã xử lý"""
+    @_step
+    def save_processed_data(self, output_path: str = 'data/processed_movies.csv', attribute_index: bool = True):
+        """
+        Lưu dữ liệu đã xử lý
+
+        Args:
+            attribute_index: Xây và lưu attribute index (bỏ qua nếu không có cột nhiều giá trị)
+        """
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         self.df.to_csv(output_path, index=False, encoding='utf-8-sig')
-        print(f"\n💾 Đã lưu dữ liệu đã xử lý vào {output_path}")
-        print(f"   - Số lượng phim: {len(self.df)}")
-        print(f"   - Số cột: {len(self.df.columns)}")
+        # Bản Parquet giữ nguyên kiểu (category, int16, float32) cho load_processed_data;
+        # ghi sau CSV để không bị coi là cũ hơn
+        parquet_path = processed_parquet_path(output_path)
+        self.df.to_parquet(parquet_path + '.tmp', index=False)
+        os.replace(parquet_path + '.tmp', parquet_path)
+        self._log(f"\n💾 Đã lưu dữ liệu đã xử lý vào {output_path} (và {parquet_path})")
+        
+        # Bridge table + multi-hot cho Genre/Country/Language/Director/Actors (movie_id = vị trí dòng)
+        from attribute_index import attribute_index_dir, build_attribute_index
+        index = build_attribute_index(self.df) if attribute_index else None
+        if index is not None and index.attributes:
+            index_dir = attribute_index_dir(output_path)
+            index.save(index_dir)
+            self._log(f"   - Attribute index: {index_dir}")
+        self._log(f"   - Số lượng phim: {len(self.df)}")
+        self._log(f"   - Số cột: {len(self.df.columns)}")
         return self
 
 
+def normalize_raw_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Đổi tên cột theo RAW_COLUMN_MAPPING và chuyển BoxOffice từ triệu sang đơn vị bình thường"""
+    df = df.rename(columns=RAW_COLUMN_MAPPING)
+    # Chỉ cột số (triệu USD); chuỗi kiểu OMDb "$1,234" để clean_box_office xử lý
+    if 'BoxOffice' in df.columns and pd.api.types.is_numeric_dtype(df['BoxOffice']):
+        df['BoxOffice'] = df['BoxOffice'] * 1_000_000
+    return df
+
+
+def columns_output_path(output_path: str, columns: List[str]) -> str:
+    """File output riêng cho kết quả chỉ gồm một số cột (vd. data/processed_movies.Year-Rating.csv)"""
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}.{'-'.join(re.sub(r'[^0-9A-Za-z]+', '_', col) for col in columns)}{ext}"
+
+
 def preprocess_movie_data(input_path: str = 'data/raw_movies.csv', 
-                         output_path: str = 'data/processed_movies.csv'):
+                         output_path: str = PROCESSED_PATH,
+                         chunksize: Optional[int] = None,
+                         workers: Optional[int] = None,
+                         copy_free: bool = False,
+                         profiler: Optional[StepMemoryProfiler] = None,
+                         lazy: bool = False,
+                         columns: Optional[List[str]] = None,
+                         incremental: bool = False,
+                         full_refresh: bool = False,
+                         attribute_index: bool = True):
     """
     Function chính để xử lý dữ liệu phim
     
     Args:
-        input_path: Đường dẫn file input
+        input_path: Đường dẫn file input (Parquet có kiểu từ dataset_ingest hoặc CSV)
         output_path: Đường dẫn file output
+        chunksize: Số dòng mỗi chunk; đặt giá trị để chạy chế độ out-of-core
+                   (chunked_preprocessing), khi đó trả về dict thống kê thay vì DataFrame
+        workers: Số process cho các bước theo dòng (parallel_preprocessing), None/1 = tuần tự;
+                 không áp dụng cho chế độ chunk
+        copy_free: Dựa vào copy-on-write thay vì sao chép cả frame vào preprocessor
+        profiler: StepMemoryProfiler đo bộ nhớ từng bước (chế độ in-memory); raise
+                  MemoryBudgetExceeded ở ranh giới bước (chế độ chunk: giữa các chunk)
+                  khi RSS vượt ngân sách
+        lazy: Chain chỉ ghi plan, được tối ưu (bỏ bước/cột không cần, gộp bước) rồi chạy khi lưu
+              (lazy_preprocessing); workers không áp dụng cho chế độ này
+        columns: Chỉ tạo các cột này (bật lazy); chỉ các cột nguồn cần cho chúng được đọc.
+                 Nếu output_path là PROCESSED_PATH thì ghi sang columns_output_path để không
+                 ghi đè dữ liệu đầy đủ
+        incremental: Chỉ xử lý các dòng raw mới / đã đổi so với lần trước (incremental_preprocessing);
+                     các tham số khác không áp dụng cho chế độ này
+        full_refresh: Chế độ incremental: bỏ qua kết quả lần trước, xử lý lại toàn bộ
+        attribute_index: Xây attribute index khi lưu (in-memory và chunk); tắt để giảm peak bộ nhớ
     """
+    if incremental:
+        from incremental_preprocessing import preprocess_movie_data_incremental
+        return preprocess_movie_data_incremental(input_path, output_path, full_refresh=full_refresh)
+    
+    if chunksize:
+        from chunked_preprocessing import preprocess_movie_data_chunked
+        return preprocess_movie_data_chunked(input_path, output_path, chunksize=chunksize,
+                                             attribute_index=attribute_index, profiler=profiler)
+    
     print("🔧 BẮT ĐẦU TIỀN XỬ LÝ DỮ LIỆU\n")
     
-    # Đọc dữ liệu
-    df = pd.read_csv(input_path, encoding='utf-8-sig')
-    print(f"📂 Đã đọc {len(df)} phim từ {input_path}\n")
+    if copy_free:
+        enable_copy_on_write()
     
-    # Chuẩn hóa tên cột để thống nhất
-    column_mapping = {
-        'Runtime (Minutes)': 'Runtime',
-        'Revenue (Millions)': 'BoxOffice',
-        'Rank': 'ID'
-    }
-    df.rename(columns=column_mapping, inplace=True)
+    def measure(name):
+        return profiler.step(name) if profiler is not None else nullcontext()
     
-    # Chuyển BoxOffice từ triệu sang đơn vị bình thường
-    if 'BoxOffice' in df.columns:
-        df['BoxOffice'] = df['BoxOffice'] * 1_000_000
+    lazy = lazy or bool(columns)
+    source_columns = None
+    if columns:
+        from lazy_preprocessing import plan_source_columns
+        
+        if os.path.abspath(output_path) == os.path.abspath(PROCESSED_PATH):
+            output_path = columns_output_path(output_path, columns)
+            print(f"ℹ️ Chỉ tạo {len(columns)} cột: ghi vào {output_path} thay vì {PROCESSED_PATH}\n")
+        
+        # Chỉ đọc các cột nguồn mà plan cần (theo tên cột trước normalize_raw_columns)
+        raw_columns = read_raw_columns(input_path)
+        needed = plan_source_columns([RAW_COLUMN_MAPPING.get(col, col) for col in raw_columns], columns)
+        source_columns = [col for col in raw_columns if RAW_COLUMN_MAPPING.get(col, col) in needed]
     
+    # Đọc dữ liệu
+    with measure('read_raw_dataset'):
+        df = read_raw_dataset(input_path, columns=source_columns)
+    print(f"📂 Đã đọc {len(df)} phim từ {input_path}\n")
+    
+    with measure('normalize_raw_columns'):
+        df = normalize_raw_columns(df)
     print("✅ Đã chuẩn hóa tên cột\n")
     
     # Khởi tạo preprocessor
-    preprocessor = MovieDataPreprocessor(df)
+    with measure('__init__'):
+        preprocessor = MovieDataPreprocessor(df, copy=not copy_free, profiler=profiler,
+                                             lazy=lazy, columns=columns)
+    # Không giữ tham chiếu tới frame gốc để cột cũ được giải phóng khi bị thay
+    del df
+    preprocessor = preprocessor.remove_duplicates()
     
     # Thực hiện các bước xử lý
+    if workers and workers > 1 and not lazy:
+        # Các bước theo dòng chạy song song trên các phân vùng
+        preprocessor = preprocessor.run_parallel(workers)
+    else:
+        preprocessor = (preprocessor
+                        .clean_year()
+                        .clean_rating()
+                        .clean_runtime()
+                        .clean_box_office()
+                        .clean_budget()
+                        .split_genres()
+                        .extract_country()
+                        .create_decade()
+                        .create_roi()
+                        .create_profit()
+                        .categorize_rating()
+                        .categorize_runtime())
     processed_df = (preprocessor
-                    .remove_duplicates()
-                    .clean_year()
-                    .clean_rating()
-                    .clean_runtime()
-                    .clean_box_office()
-                    .clean_budget()
-                    .split_genres()
-                    .extract_country()
-                    .create_decade()
-                    .create_roi()
-                    .create_profit()
-                    .categorize_rating()
-                    .categorize_runtime()
                     .handle_missing_values()
-                    .save_processed_data(output_path)
+                    .apply_compact_schema()
+                    .save_processed_data(output_path, attribute_index=attribute_index)
                     .get_processed_data())
     
     # Hiển thị thông tin
     print(f"\n📈 THỐNG KÊ DỮ LIỆU SAU XỬ LÝ:")
     print(f"   - Số phim: {len(processed_df)}")
-    print(f"   - Năm từ: {processed_df['Year'].min():.0f} đến {processed_df['Year'].max():.0f}")
-    print(f"   - Rating trung bình: {processed_df['Rating'].mean():.2f}")
+    if 'Year' in processed_df.columns:
+        print(f"   - Năm từ: {processed_df['Year'].min():.0f} đến {processed_df['Year'].max():.0f}")
+    
+    if 'Rating' in processed_df.columns:
+        print(f"   - Rating trung bình: {processed_df['Rating'].mean():.2f}")
     
     if 'Runtime' in processed_df.columns:
         print(f"   - Runtime trung bình: {processed_df['Runtime'].mean():.0f} phút")
@@ -275,16 +516,66 @@ def preprocess_movie_data(input_path: str = 'data/raw_movies.csv',
 
 def main():
     """Main function"""
-    # Kiểm tra file input
+    parser = argparse.ArgumentParser(description='Tiền xử lý dữ liệu phim')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='Xử lý theo chunk N dòng (out-of-core) thay vì đọc cả file vào RAM')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Số process chạy song song các bước theo dòng')
+    parser.add_argument('--copy-free', action='store_true',
+                        help='Dựa vào copy-on-write, không sao chép cả frame vào preprocessor')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Đo peak RSS và tracemalloc từng bước')
+    parser.add_argument('--memory-budget', type=float, default=None,
+                        help='Ngân sách peak RSS (MB); dừng ở bước / chunk kế tiếp khi vượt (bật --profile-memory)')
+    parser.add_argument('--memory-report', help='Ghi kết quả đo bộ nhớ ra file JSON')
+    parser.add_argument('--lazy', action='store_true',
+                        help='Ghi chain thành plan, bỏ bước/cột không cần và gộp các bước trước khi chạy')
+    parser.add_argument('--columns', type=lambda value: [col.strip() for col in value.split(',') if col.strip()],
+                        default=None, help='Chỉ tạo các cột này, phân tách bằng dấu phẩy (bật --lazy)')
+    parser.add_argument('--output', default=PROCESSED_PATH,
+                        help='File output (với --columns, mặc định là processed_movies.<cột>.csv)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Chỉ xử lý các phim mới / đã đổi so với lần chạy trước (theo hash từng dòng)')
+    parser.add_argument('--full-refresh', action='store_true',
+                        help='Với --incremental: xử lý lại toàn bộ và tạo lại manifest')
+    parser.add_argument('--no-attribute-index', action='store_true',
+                        help='Không xây attribute index khi lưu (bước có peak bộ nhớ cao nhất)')
+    args = parser.parse_args()
+    
+    # Kiểm tra file input: ưu tiên raw layer Parquet nếu nó không cũ hơn raw_movies.csv
+    # (data_collection.py chỉ ghi CSV)
     input_path = 'data/raw_movies.csv'
+    parquet_path = 'data/raw_movies.parquet'
+    if os.path.exists(parquet_path) and (not os.path.exists(input_path)
+                                         or os.path.getmtime(parquet_path) >= os.path.getmtime(input_path)):
+        input_path = parquet_path
     
     if not os.path.exists(input_path):
         print(f"❌ Không tìm thấy file {input_path}")
         print(f"💡 Vui lòng chạy data_collection.py trước")
         return
     
+    profiler = None
+    if args.profile_memory or args.memory_budget is not None or args.memory_report:
+        profiler = StepMemoryProfiler(budget_mb=args.memory_budget).start()
+    
     # Xử lý dữ liệu
-    preprocess_movie_data(input_path)
+    try:
+        preprocess_movie_data(input_path, args.output, chunksize=args.chunksize, workers=args.workers,
+                              copy_free=args.copy_free, profiler=profiler,
+                              lazy=args.lazy, columns=args.columns,
+                              incremental=args.incremental, full_refresh=args.full_refresh,
+                              attribute_index=not args.no_attribute_index)
+    except MemoryBudgetExceeded as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            print(f"\n🧠 BỘ NHỚ TỪNG BƯỚC:\n{profiler.report()}")
+            if args.memory_report:
+                profiler.save_report(args.memory_report)
+                print(f"💾 Đã lưu kết quả đo bộ nhớ vào {args.memory_report}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,182 @@
+"""
+Dataset Cache
+Cache file dataset theo nội dung (SHA-256): mỗi nội dung lưu một lần, index URL -> digest,
+kiểm tra toàn vẹn khi đọc và giới hạn dung lượng (LRU)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
+
+def sha256_of(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 của file (đọc theo chunk)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """
+    Cache dataset định địa chỉ theo nội dung
+
+    Cấu trúc thư mục:
+        <root>/blobs/ab/abcdef...   - nội dung file, tên là SHA-256
+        <root>/index.json           - url -> {sha256, size, etag, last_modified, fetched_at, accessed_at}
+
+    - Nhiều URL (mirror) cùng nội dung dùng chung một blob
+    - get() tính lại SHA-256, blob hỏng bị xóa khỏi cache
+    - Tổng dung lượng vượt max_bytes thì xóa blob ít được dùng gần đây nhất
+    """
+
+    def __init__(self, root: str = 'data/.dataset_cache', max_bytes: int = 1024 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, 'index.json')
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'blobs', digest[:2], digest)
+
+    def _load_index(self) -> Dict[str, Dict]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: Dict[str, Dict]):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Thông tin cache của URL (không kiểm tra nội dung), None nếu chưa có"""
+        with self._lock:
+            entry = self._load_index().get(url)
+        if entry is None or not os.path.exists(self.blob_path(entry['sha256'])):
+            return None
+        return entry
+
+    def get(self, url: str, verify: bool = True) -> Optional[str]:
+        """
+        Đường dẫn blob của URL, None nếu chưa có hoặc blob bị hỏng
+
+        verify=True: tính lại SHA-256 và so với digest trong index
+        """
+        with self._lock:
+            index = self._load_index()
+            entry = index.get(url)
+            if entry is None:
+                return None
+            path = self.blob_path(entry['sha256'])
+            if not os.path.exists(path):
+                del index[url]
+                self._save_index(index)
+                return None
+            if verify and (os.path.getsize(path) != entry['size'] or sha256_of(path) != entry['sha256']):
+                print(f"  ⚠️ Blob cache bị hỏng, xóa: {path}")
+                os.remove(path)
+                for other_url in [u for u, e in index.items() if e['sha256'] == entry['sha256']]:
+                    del index[other_url]
+                self._save_index(index)
+                return None
+            entry['accessed_at'] = time.time()
+            self._save_index(index)
+            return path
+
+    def put(self, url: str, path: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None, move: bool = True) -> str:
+        """
+        Đưa file vào cache và gắn với URL
+
+        Args:
+            move: Chuyển file vào cache (mặc định) thay vì sao chép
+
+        Returns:
+            Đường dẫn blob trong cache
+        """
+        digest = sha256_of(path)
+        size = os.path.getsize(path)
+        blob = self.blob_path(digest)
+        with self._lock:
+            if os.path.exists(blob):
+                if move:
+                    os.remove(path)
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                tmp_blob = blob + '.tmp'
+                if move:
+                    shutil.move(path, tmp_blob)
+                else:
+                    shutil.copyfile(path, tmp_blob)
+                os.replace(tmp_blob, blob)
+
+            now = time.time()
+            index = self._load_index()
+            index[url] = {
+                'sha256': digest,
+                'size': size,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': now,
+                'accessed_at': now,
+            }
+            self._evict(index, keep=digest)
+            self._save_index(index)
+        return blob
+
+    def remove(self, url: str):
+        """Bỏ URL khỏi cache; blob bị xóa nếu không còn URL nào dùng"""
+        with self._lock:
+            index = self._load_index()
+            entry = index.pop(url, None)
+            if entry is None:
+                return
+            if not any(e['sha256'] == entry['sha256'] for e in index.values()):
+                path = self.blob_path(entry['sha256'])
+                if os.path.exists(path):
+                    os.remove(path)
+            self._save_index(index)
+
+    def touch(self, url: str):
+        """Cập nhật thời điểm dùng (vd. khi server trả 304)"""
+        with self._lock:
+            index = self._load_index()
+            if url in index:
+                index[url]['accessed_at'] = time.time()
+                self._save_index(index)
+
+    def _evict(self, index: Dict[str, Dict], keep: Optional[str] = None):
+        """Xóa blob ít được dùng gần đây nhất cho tới khi tổng dung lượng <= max_bytes"""
+        blobs: Dict[str, Dict] = {}
+        for entry in index.values():
+            blob = blobs.setdefault(entry['sha256'], {'size': entry['size'], 'accessed_at': 0.0})
+            blob['accessed_at'] = max(blob['accessed_at'], entry['accessed_at'])
+        total = sum(blob['size'] for blob in blobs.values())
+        for digest, blob in sorted(blobs.items(), key=lambda item: item[1]['accessed_at']):
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            path = self.blob_path(digest)
+            if os.path.exists(path):
+                os.remove(path)
+            total -= blob['size']
+            for url in [u for u, e in index.items() if e['sha256'] == digest]:
+                del index[url]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            index = self._load_index()
+        digests = {entry['sha256']: entry['size'] for entry in index.values()}
+        return {'urls': len(index), 'blobs': len(digests), 'bytes': sum(digests.values()),
+                'max_bytes': self.max_bytes}
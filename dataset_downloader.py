@@ -0,0 +1,473 @@
+"""
+Dataset Downloader
+Tải file dataset theo từng chunk (streaming), tiếp tục bằng HTTP Range khi bị gián đoạn,
+bỏ qua file không đổi bằng request có điều kiện (ETag / If-Modified-Since)
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from dataset_cache import DatasetCache
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    """Không tải được file sau khi đã thử lại"""
+
+
+class DownloadCancelled(DownloadError):
+    """Bị hủy giữa chừng (vd. mirror khác đã tải xong trước)"""
+
+
+@dataclass
+class DownloadResult:
+    """
+    Kết quả tải một file
+
+    status: 'downloaded' (tải mới), 'resumed' (tiếp tục từ file .part)
+            hoặc 'not_modified' (server báo file không đổi, dùng bản local)
+    """
+    url: str
+    path: str
+    status: str
+    bytes_downloaded: int
+    size: int
+    seconds: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    first_byte_seconds: Optional[float] = None
+    sha256: Optional[str] = None
+
+    @property
+    def throughput(self) -> float:
+        """Tốc độ tải (bytes/giây)"""
+        return self.bytes_downloaded / self.seconds if self.seconds > 0 else 0.0
+
+
+def filename_for(url: str) -> str:
+    """Tên file local từ URL (vd. movies.csv)"""
+    name = os.path.basename(unquote(urlparse(url).path))
+    return name or 'download'
+
+
+def _format_size(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size:.0f} B"
+        size /= 1024
+
+
+class StreamingDownloader:
+    """
+    Tải file qua requests.Session dùng chung
+
+    - Đọc response theo chunk và ghi thẳng xuống file .part (không giữ cả file trong bộ nhớ)
+    - Bị ngắt giữa chừng: thử lại với backoff, gửi Range: bytes=<đã có>- kèm If-Range để
+      chỉ tải phần còn thiếu (server không hỗ trợ Range thì tải lại từ đầu)
+    - File đã có: gửi If-None-Match / If-Modified-Since, 304 thì giữ nguyên file local
+    - Tải xong mới đổi tên .part thành file đích (atomic), metadata lưu ở <file>.meta.json
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, chunk_size: int = 1 << 16,
+                 timeout=(3.05, 30), max_retries: int = 5, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, progress_interval: float = 1.0, verbose: bool = True):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.progress_interval = progress_interval
+        self.verbose = verbose
+
+    @staticmethod
+    def meta_path(path: str) -> str:
+        return path + '.meta.json'
+
+    @staticmethod
+    def part_path(path: str) -> str:
+        return path + '.part'
+
+    @staticmethod
+    def _read_meta(meta_path: str) -> Dict:
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_meta(meta_path: str, meta: Dict):
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, meta_path)
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter giống OMDbTransport
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def download(self, url: str, path: str, force: bool = False,
+                 cancel_event: Optional[threading.Event] = None,
+                 cache: Optional[DatasetCache] = None,
+                 validate: Optional[Callable[[str], bool]] = None) -> DownloadResult:
+        """
+        Tải url về path
+
+        Args:
+            force: Bỏ qua request có điều kiện, luôn tải lại toàn bộ
+            cancel_event: Khi được set, dừng tải và raise DownloadCancelled
+                (file .part được giữ lại để lần sau tải tiếp)
+            cache: Tải xong thì chuyển file vào DatasetCache (kết quả trỏ tới blob trong cache);
+                ETag / Last-Modified của bản trong cache được dùng cho request có điều kiện
+            validate: validate(path) -> bool, kiểm tra file vừa tải xong trước khi đưa vào cache;
+                file không hợp lệ bị xóa và raise DownloadError
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        part_path = self.part_path(path)
+        part_meta_path = self.meta_path(part_path)
+        meta_path = self.meta_path(path)
+
+        local_path = path
+        entry = cache.lookup(url) if cache is not None and not force else None
+        if entry is not None:
+            meta = {'url': url, 'etag': entry.get('etag'), 'last_modified': entry.get('last_modified')}
+            local_path = cache.blob_path(entry['sha256'])
+        else:
+            meta = self._read_meta(meta_path) if os.path.exists(path) and not force else {}
+        if meta.get('url') != url:
+            meta = {}
+        part_meta = self._read_meta(part_meta_path) if os.path.exists(part_path) else {}
+        if part_meta.get('url') != url or force:
+            part_meta = {}
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+        started = time.perf_counter()
+        first_byte = None
+        downloaded = 0
+        resumed = False
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelled(f"Đã hủy tải {url}")
+            if attempt > 0:
+                delay = self._backoff_delay(attempt - 1)
+                self._log(f"  🔁 Thử lại lần {attempt}/{self.max_retries} sau {delay:.1f}s ({last_error})")
+                time.sleep(delay)
+
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {'Accept-Encoding': 'identity'}  # Range tính theo bytes gốc, không nén
+            if offset > 0:
+                headers['Range'] = f"bytes={offset}-"
+                validator = part_meta.get('etag') or part_meta.get('last_modified')
+                if validator:
+                    # Nếu file trên server đã đổi, server trả 200 (toàn bộ file mới)
+                    headers['If-Range'] = validator
+            elif meta:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    if response.status_code == 304:
+                        if entry is not None and cache.get(url) is None:
+                            # Bản trong cache hỏng: tải lại toàn bộ
+                            entry, meta, local_path = None, {}, path
+                            last_error = DownloadError("Bản trong cache bị hỏng")
+                            continue
+                        if validate is not None and not validate(local_path):
+                            # Bản local không đúng schema: bỏ khỏi cache và tải lại toàn bộ
+                            if entry is not None:
+                                cache.remove(url)
+                            elif os.path.exists(meta_path):
+                                os.remove(meta_path)
+                            entry, meta, local_path = None, {}, path
+                            last_error = DownloadError("Bản local không đúng schema")
+                            continue
+                        elapsed = time.perf_counter() - started
+                        self._log(f"  ✅ File không đổi, dùng bản local: {local_path}")
+                        return DownloadResult(url, local_path, 'not_modified', 0, os.path.getsize(local_path),
+                                              elapsed, meta.get('etag'), meta.get('last_modified'),
+                                              first_byte, entry['sha256'] if entry else None)
+                    if response.status_code == 416 and offset > 0:
+                        # File .part đã đủ (hoặc hỏng): bắt đầu lại từ đầu
+                        os.remove(part_path)
+                        part_meta = {}
+                        last_error = DownloadError("416 Range Not Satisfiable")
+                        continue
+                    if response.status_code in RETRY_STATUS_CODES:
+                        last_error = DownloadError(f"HTTP {response.status_code}")
+                        continue
+                    if response.status_code >= 400:
+                        raise DownloadError(f"HTTP {response.status_code} khi tải {url}")
+
+                    if response.status_code == 206:
+                        resumed = True
+                        mode = 'ab'
+                        total = self._total_size(response, offset)
+                        self._log(f"  ⏯️ Tiếp tục từ {_format_size(offset)}")
+                    else:
+                        mode = 'wb'
+                        offset = 0
+                        total = self._total_size(response, 0)
+                        part_meta = {
+                            'url': url,
+                            'etag': response.headers.get('ETag'),
+                            'last_modified': response.headers.get('Last-Modified'),
+                            'size': total,
+                        }
+                        self._write_meta(part_meta_path, part_meta)
+
+                    downloaded += self._stream_to_file(response, part_path, mode, offset, total,
+                                                       cancel_event)
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                last_error = e
+                continue
+
+            size = os.path.getsize(part_path)
+            expected = part_meta.get('size')
+            if expected is not None and size < expected:
+                last_error = DownloadError(f"Mới nhận {size}/{expected} bytes")
+                continue
+            if expected is not None and size > expected:
+                # Ghi nối nhầm vào file khác: tải lại từ đầu
+                os.remove(part_path)
+                last_error = DownloadError(f"Nhận {size} bytes, nhiều hơn {expected}")
+                continue
+
+            os.replace(part_path, path)
+            if os.path.exists(part_meta_path):
+                os.remove(part_meta_path)
+            if validate is not None and not validate(path):
+                # Không đưa vào cache / ghi meta: lần sau không dùng lại file sai
+                os.remove(path)
+                if os.path.exists(meta_path):
+                    os.remove(meta_path)
+                raise DownloadError(f"File từ {url} không đúng schema")
+            digest = None
+            if cache is not None:
+                path = cache.put(url, path, part_meta.get('etag'), part_meta.get('last_modified'))
+                digest = os.path.basename(path)
+                if os.path.exists(meta_path):
+                    os.remove(meta_path)
+            else:
+                self._write_meta(meta_path, {**part_meta, 'size': size, 'downloaded_at': time.time()})
+            elapsed = time.perf_counter() - started
+            result = DownloadResult(url, path, 'resumed' if resumed else 'downloaded', downloaded, size,
+                                    elapsed, part_meta.get('etag'), part_meta.get('last_modified'),
+                                    first_byte, digest)
+            self._log(f"  ✅ Đã tải {_format_size(size)} trong {elapsed:.1f}s "
+                      f"({_format_size(result.throughput)}/s) -> {path}")
+            return result
+
+        raise DownloadError(f"Không tải được {url} sau {self.max_retries + 1} lần thử: {last_error}")
+
+    @staticmethod
+    def _total_size(response: requests.Response, offset: int) -> Optional[int]:
+        """Kích thước toàn bộ file (từ Content-Range hoặc Content-Length)"""
+        content_range = response.headers.get('Content-Range', '')
+        if '/' in content_range:
+            total = content_range.rsplit('/', 1)[1]
+            if total.isdigit():
+                return int(total)
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit():
+            return offset + int(length)
+        return None
+
+    def _stream_to_file(self, response: requests.Response, part_path: str, mode: str,
+                        offset: int, total: Optional[int],
+                        cancel_event: Optional[threading.Event] = None) -> int:
+        """Ghi response xuống file theo chunk, in tiến độ định kỳ; trả về số bytes đã nhận"""
+        received = 0
+        started = time.perf_counter()
+        last_report = started
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise DownloadCancelled(f"Đã hủy tải {response.url}")
+                if not chunk:
+                    continue
+                f.write(chunk)
+                received += len(chunk)
+                now = time.perf_counter()
+                if now - last_report >= self.progress_interval:
+                    last_report = now
+                    rate = received / (now - started)
+                    done = offset + received
+                    percent = f" ({done / total:.0%})" if total else ''
+                    self._log(f"  ⏳ {_format_size(done)}"
+                              f"{' / ' + _format_size(total) if total else ''}{percent}"
+                              f" - {_format_size(rate)}/s")
+            f.flush()
+            os.fsync(f.fileno())
+        return received
+
+    def close(self):
+        self.session.close()
+
+
+def download_file(url: str, path: str, force: bool = False, cache: Optional[DatasetCache] = None,
+                  **kwargs) -> DownloadResult:
+    """Tải một file bằng StreamingDownloader mặc định"""
+    downloader = StreamingDownloader(**kwargs)
+    try:
+        return downloader.download(url, path, force=force, cache=cache)
+    finally:
+        downloader.close()
+
+
+def mirror_path(download_dir: str, url: str) -> str:
+    """Đường dẫn local riêng cho từng mirror (tránh trùng tên file giữa các mirror)"""
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(download_dir, f"{digest}-{filename_for(url)}")
+
+
+@dataclass
+class MirrorRaceResult:
+    """Mirror thắng cuộc và kết quả của từng mirror (url -> trạng thái / lỗi / thời gian)"""
+    winner: DownloadResult
+    attempts: Dict[str, Dict] = field(default_factory=dict)
+
+    @property
+    def path(self) -> str:
+        return self.winner.path
+
+    @property
+    def url(self) -> str:
+        return self.winner.url
+
+
+def race_mirrors(urls: List[str], download_dir: str = 'data/downloads',
+                 validate: Optional[Callable[[str], bool]] = None,
+                 record_path: Optional[str] = None, cache: Optional[DatasetCache] = None,
+                 force: bool = False, **downloader_kwargs) -> MirrorRaceResult:
+    """
+    Tải đồng thời từ mọi mirror, dùng file đầu tiên tải xong và hợp lệ
+
+    Các mirror còn lại bị hủy ngay (phần đã tải giữ ở .part để lần sau tiếp tục),
+    nên thời gian chờ do mirror nhanh nhất quyết định chứ không phải mirror đầu danh sách.
+
+    Args:
+        validate: validate(path) -> bool, kiểm tra schema của file đã tải
+            (file không hợp lệ bị bỏ qua, chờ mirror tiếp theo)
+        record_path: File JSON ghi lại mirror được chọn và thời gian của từng mirror
+        cache: DatasetCache lưu file đã tải (download_dir chỉ chứa file .part đang tải dở)
+        force: Bỏ qua bản đã có, tải lại toàn bộ
+    """
+    if not urls:
+        raise DownloadError("Không có mirror nào để tải")
+    downloader_kwargs.setdefault('verbose', False)
+    cancel_event = threading.Event()
+    started = time.perf_counter()
+    attempts: Dict[str, Dict] = {url: {'status': 'pending'} for url in urls}
+
+    def fetch(url: str) -> DownloadResult:
+        downloader = StreamingDownloader(**downloader_kwargs)
+        try:
+            return downloader.download(url, mirror_path(download_dir, url), force=force,
+                                       cancel_event=cancel_event, cache=cache, validate=validate)
+        finally:
+            downloader.close()
+
+    winner = None
+    executor = ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix='mirror')
+    try:
+        futures = {executor.submit(fetch, url): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            elapsed = round(time.perf_counter() - started, 3)
+            try:
+                result = future.result()
+            except DownloadCancelled:
+                attempts[url] = {'status': 'cancelled', 'seconds': elapsed}
+                continue
+            except Exception as e:
+                attempts[url] = {'status': 'failed', 'seconds': elapsed, 'error': str(e)}
+                print(f"  ⚠️ Mirror lỗi: {url} ({e})")
+                continue
+            attempts[url] = {'status': result.status, 'seconds': elapsed,
+                             'first_byte_seconds': result.first_byte_seconds, 'bytes': result.size}
+            winner = result
+            # Có file hợp lệ: không chờ các mirror còn lại (bị hủy trong finally)
+            break
+    finally:
+        cancel_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for url, attempt in attempts.items():
+        if attempt['status'] == 'pending':
+            attempt['status'] = 'cancelled'
+    if winner is None:
+        raise DownloadError(f"Không tải được dataset từ {len(urls)} mirror: "
+                            + '; '.join(f"{url}: {attempt.get('error', attempt['status'])}"
+                                        for url, attempt in attempts.items()))
+
+    race = MirrorRaceResult(winner, attempts)
+    print(f"  🏁 Chọn mirror {winner.url} ({winner.status}, {attempts[winner.url]['seconds']:.2f}s)")
+    if record_path:
+        directory = os.path.dirname(record_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        StreamingDownloader._write_meta(record_path, {
+            'chosen': winner.url,
+            'path': winner.path,
+            'latency_seconds': attempts[winner.url]['seconds'],
+            'first_byte_seconds': winner.first_byte_seconds,
+            'recorded_at': time.time(),
+            'mirrors': attempts,
+        })
+    return race
+
+
+def load_from_cache(urls: List[str], cache: DatasetCache,
+                    validate: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+    """
+    Chế độ offline: bản trong cache (đã kiểm tra SHA-256) của mirror đầu tiên có trong cache
+
+    Bản không qua validate bị xóa khỏi cache để lần sau không phải đọc lại
+
+    Returns:
+        Đường dẫn blob, None nếu không mirror nào có trong cache
+    """
+    for url in urls:
+        path = cache.get(url)
+        if path is None:
+            continue
+        if validate is not None and not validate(path):
+            print(f"  ⚠️ Bản trong cache của {url} không đúng schema, xóa khỏi cache")
+            cache.remove(url)
+            continue
+        print(f"  📦 Dùng bản trong cache của {url}")
+        return path
+    return None
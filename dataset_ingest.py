@@ -0,0 +1,193 @@
+"""
+Dataset Ingest
+Đọc file CSV tải về một lần duy nhất: đổi tên cột, chọn cột (usecols) và ép kiểu ngay
+khi parse (pyarrow), ghi thẳng ra Parquet nén; CSV chỉ là output phụ (tùy chọn)
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Chuẩn hóa tên cột của các dataset nguồn về tên dùng trong project
+COLUMN_MAPPING = {
+    # Mapping cho dataset mới
+    'name': 'Title',
+    'year': 'Year',
+    'score': 'Rating',
+    'votes': 'imdbVotes',
+    'gross': 'BoxOffice',
+    'runtime': 'Runtime',
+    'country': 'Country',
+    'company': 'Production',
+    'director': 'Director',
+    'writer': 'Writer',
+    'star': 'Actors',
+    # Mapping cho dataset cũ
+    'Series_Title': 'Title',
+    'Released_Year': 'Year',
+    'IMDB_Rating': 'Rating',
+    'Overview': 'Plot',
+    'Meta_score': 'Metascore',
+    'No_of_Votes': 'imdbVotes',
+    'Gross': 'BoxOffice',
+    'Runtime (Minutes)': 'Runtime'
+}
+
+# Mapping thêm mà data_preprocessing áp dụng (IMDB-Movie-Data): đổi tên luôn khi ingest
+PREPROCESS_COLUMN_MAPPING = {
+    'Runtime (Minutes)': 'Runtime',
+    'Revenue (Millions)': 'BoxOffice',
+    'Rank': 'ID'
+}
+
+# Cột giữ lại sau khi đổi tên và kiểu của chúng ('number' hoặc 'string');
+# cột không có trong danh sách không được parse
+INGEST_SCHEMA = {
+    'ID': 'number',
+    'Title': 'string',
+    'Year': 'number',
+    'rating': 'string',       # Phân loại độ tuổi (R, PG-13, ...)
+    'genre': 'string',
+    'Genre': 'string',
+    'released': 'string',
+    'Rating': 'number',
+    'imdbRating': 'number',
+    'imdbVotes': 'number',
+    'Votes': 'number',
+    'Director': 'string',
+    'Writer': 'string',
+    'Actors': 'string',
+    'Country': 'string',
+    'Language': 'string',
+    'budget': 'number',
+    'Budget': 'number',
+    'BoxOffice': 'number',
+    'Production': 'string',
+    'Runtime': 'number',
+    'Metascore': 'number',
+    'Plot': 'string',
+    'Description': 'string',
+    'imdbID': 'string',
+}
+
+# Các chuỗi được coi là thiếu giá trị (giống mặc định của pandas.read_csv)
+NULL_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+               '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+_INTEGER_PATTERN = r'^\s*[-+]?\d+\s*$'
+_NUMBER_PATTERN = r'^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$'
+
+
+def _plan_columns(source_columns: List[str], column_mapping: Dict[str, str],
+                  schema: Dict[str, str]) -> Dict[str, str]:
+    """Cột nguồn cần đọc -> tên mới (cột đầu tiên map vào một tên mới được giữ)"""
+    plan = {}
+    for column in source_columns:
+        target = column_mapping.get(column, column)
+        if target in schema and target not in plan.values():
+            plan[column] = target
+    return plan
+
+
+def _to_number(values: pa.ChunkedArray, column: str) -> pa.ChunkedArray:
+    """
+    Chuỗi -> số theo quy tắc của pandas: toàn số nguyên và không thiếu thì int64, còn lại float64
+
+    Cột có giá trị không phải số được giữ nguyên dạng chuỗi để bước tiền xử lý làm sạch
+    như trước (vd. Runtime '142 min').
+    """
+    valid = pc.fill_null(pc.match_substring_regex(values, _NUMBER_PATTERN), True)
+    if not pc.all(valid).as_py():
+        print(f"  ⚠️ Cột {column} có giá trị không phải số, giữ dạng chuỗi")
+        return values
+    trimmed = pc.utf8_trim_whitespace(values)
+    if values.null_count == 0 and pc.all(pc.match_substring_regex(values, _INTEGER_PATTERN)).as_py():
+        return pc.cast(trimmed, pa.int64())
+    return pc.cast(trimmed, pa.float64())
+
+
+def read_typed_csv(source: str, column_mapping: Optional[Dict[str, str]] = None,
+                   schema: Optional[Dict[str, str]] = None) -> pa.Table:
+    """
+    Parse CSV một lượt bằng pyarrow: chỉ các cột trong schema (usecols), đổi tên cột
+    ngay khi đọc (column_names) và ép kiểu theo schema
+    """
+    import pyarrow.csv as pv
+
+    column_mapping = {**COLUMN_MAPPING, **PREPROCESS_COLUMN_MAPPING} if column_mapping is None else column_mapping
+    schema = INGEST_SCHEMA if schema is None else schema
+
+    # Chỉ đọc dòng tiêu đề để lập kế hoạch cột
+    source_columns = pd.read_csv(source, nrows=0, encoding='utf-8-sig').columns.tolist()
+    plan = _plan_columns(source_columns, column_mapping, schema)
+    # Cột không dùng đặt tên tạm để không trùng với tên mới
+    column_names = [plan.get(column, f"__skip_{index}") for index, column in enumerate(source_columns)]
+
+    table = pv.read_csv(
+        source,
+        read_options=pv.ReadOptions(column_names=column_names, skip_rows=1, encoding='utf-8'),
+        parse_options=pv.ParseOptions(newlines_in_values=True),
+        convert_options=pv.ConvertOptions(
+            include_columns=list(plan.values()),
+            # Đọc dạng chuỗi rồi ép kiểu có kiểm soát (pyarrow không có errors='coerce')
+            column_types={column: pa.string() for column in plan.values()},
+            null_values=NULL_VALUES,
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=True,
+        ),
+    )
+
+    columns = {}
+    for column in table.column_names:
+        values = table.column(column)
+        columns[column] = _to_number(values, column) if schema[column] == 'number' else values
+    return pa.table(columns)
+
+
+def ingest_csv(source: str, parquet_path: str = 'data/raw_movies.parquet', csv_path: Optional[str] = None,
+               column_mapping: Optional[Dict[str, str]] = None,
+               schema: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Ingest CSV tải về thành raw layer dạng Parquet (zstd) có kiểu
+
+    Args:
+        csv_path: Ghi thêm bản CSV (cùng định dạng raw_movies.csv cũ), None = không ghi
+
+    Returns:
+        DataFrame của raw layer
+    """
+    import pyarrow.parquet as pq
+
+    table = read_typed_csv(source, column_mapping, schema)
+    df = table.to_pandas()
+    # CSV phụ ghi trước để Parquet luôn là file mới hơn (xem data_preprocessing.main)
+    if csv_path:
+        os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+        df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+
+    directory = os.path.dirname(parquet_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = parquet_path + '.tmp'
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, parquet_path)
+    return df
+
+
+def read_raw_columns(path: str) -> List[str]:
+    """Tên cột của raw layer, không đọc dữ liệu"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(path).names)
+    return list(pd.read_csv(path, encoding='utf-8-sig', nrows=0).columns)
+
+
+def read_raw_dataset(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Đọc raw layer (Parquet có kiểu hoặc CSV cũ), chỉ các cột trong columns nếu có"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, encoding='utf-8-sig', usecols=columns)
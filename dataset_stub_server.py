@@ -0,0 +1,213 @@
+"""
+Dataset Stub Server
+Server HTTP tĩnh chạy local phục vụ các file CSV fixture, hỗ trợ Range, ETag,
+If-Modified-Since và giả lập đứt kết nối để test bộ tải dataset
+"""
+
+import argparse
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import unquote, urlparse
+
+
+class DatasetStubServer:
+    """
+    Phục vụ các file trong `directory` qua HTTP
+
+    - ETag / Last-Modified theo kích thước + thời gian sửa file; If-None-Match,
+      If-Modified-Since trả 304
+    - Range: bytes=N- (kèm If-Range) trả 206; support_range=False để giả lập server không hỗ trợ
+    - fail_after_bytes: `fail_times` response đầu tiên bị ngắt kết nối sau khi gửi N bytes
+    - bytes_per_sec: giới hạn tốc độ gửi (None = không giới hạn)
+
+    Dùng như context manager:
+        with DatasetStubServer('tests/fixtures') as server:
+            download_file(server.url + 'movies.csv', 'data/downloads/movies.csv')
+    """
+
+    def __init__(self, directory: str, host: str = '127.0.0.1', port: int = 0,
+                 support_range: bool = True, fail_after_bytes: Optional[int] = None,
+                 fail_times: int = 1, bytes_per_sec: Optional[float] = None, latency_ms: float = 0.0):
+        self.directory = os.path.abspath(directory)
+        self.support_range = support_range
+        self.fail_after_bytes = fail_after_bytes
+        self.fail_times = fail_times
+        self.bytes_per_sec = bytes_per_sec
+        self.latency_ms = latency_ms
+        self.stats = {'requests': 0, 'bytes_sent': 0, 'range_requests': 0,
+                      'not_modified': 0, 'failures': 0}
+        self._lock = threading.Lock()
+        self._thread = None
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                stub._handle(self, send_body=True)
+
+            def do_HEAD(self):
+                stub._handle(self, send_body=False)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, key: str, value: int = 1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            if self.fail_after_bytes is None or self.stats['failures'] >= self.fail_times:
+                return False
+            self.stats['failures'] += 1
+            return True
+
+    def _handle(self, handler: BaseHTTPRequestHandler, send_body: bool):
+        self._count('requests')
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+
+        relative = unquote(urlparse(handler.path).path).lstrip('/')
+        path = os.path.abspath(os.path.join(self.directory, relative))
+        if not path.startswith(self.directory + os.sep) or not os.path.isfile(path):
+            handler.send_response(404)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+        if self._not_modified(handler, etag, stat.st_mtime):
+            self._count('not_modified')
+            handler.send_response(304)
+            handler.send_header('ETag', etag)
+            handler.send_header('Last-Modified', last_modified)
+            handler.end_headers()
+            return
+
+        start = 0
+        status = 200
+        range_header = handler.headers.get('Range')
+        if_range = handler.headers.get('If-Range')
+        if (self.support_range and range_header and range_header.startswith('bytes=')
+                and (if_range is None or if_range in (etag, last_modified))):
+            first = range_header[len('bytes='):].split('-', 1)[0]
+            if first.isdigit():
+                start = int(first)
+                if start >= size:
+                    handler.send_response(416)
+                    handler.send_header('Content-Range', f"bytes */{size}")
+                    handler.send_header('Content-Length', '0')
+                    handler.end_headers()
+                    return
+                status = 206
+                self._count('range_requests')
+
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'text/csv; charset=utf-8')
+        handler.send_header('Content-Length', str(size - start))
+        handler.send_header('ETag', etag)
+        handler.send_header('Last-Modified', last_modified)
+        if self.support_range:
+            handler.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            handler.send_header('Content-Range', f"bytes {start}-{size - 1}/{size}")
+        handler.end_headers()
+        if not send_body:
+            return
+
+        limit = self.fail_after_bytes if self._should_fail() else None
+        sent = 0
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while True:
+                chunk = f.read(16384)
+                if not chunk:
+                    break
+                if limit is not None and sent + len(chunk) > limit:
+                    chunk = chunk[:limit - sent]
+                    handler.wfile.write(chunk)
+                    self._count('bytes_sent', len(chunk))
+                    handler.wfile.flush()
+                    # Ngắt kết nối giữa chừng
+                    handler.close_connection = True
+                    handler.connection.shutdown(2)
+                    return
+                handler.wfile.write(chunk)
+                sent += len(chunk)
+                self._count('bytes_sent', len(chunk))
+                if self.bytes_per_sec:
+                    time.sleep(len(chunk) / self.bytes_per_sec)
+
+    @staticmethod
+    def _not_modified(handler: BaseHTTPRequestHandler, etag: str, mtime: float) -> bool:
+        if_none_match = handler.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        if_modified_since = handler.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+def main():
+    """Chạy server tĩnh độc lập"""
+    parser = argparse.ArgumentParser(description='Server HTTP tĩnh phục vụ dataset fixture')
+    parser.add_argument('--directory', default='data')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--no-range', action='store_true', help='Giả lập server không hỗ trợ Range')
+    parser.add_argument('--fail-after-bytes', type=int, default=None)
+    parser.add_argument('--bytes-per-sec', type=float, default=None)
+    args = parser.parse_args()
+
+    server = DatasetStubServer(args.directory, port=args.port, support_range=not args.no_range,
+                               fail_after_bytes=args.fail_after_bytes, bytes_per_sec=args.bytes_per_sec)
+    print(f"🧪 Dataset stub server phục vụ {server.directory} tại {server.url}")
+    print("⚠️ Nhấn Ctrl+C để dừng server")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,97 +3,101 @@ Download Large IMDb Dataset
 Tải dataset lớn hơn (1000+ phim) từ nguồn công khai
 """
 
+import argparse
 import pandas as pd
 import requests
 import os
 
-def download_imdb_dataset():
+from dataset_cache import DatasetCache
+from dataset_downloader import load_from_cache, race_mirrors
+from dataset_ingest import COLUMN_MAPPING, ingest_csv
+
+# Danh sách các URL dataset công khai (thử lần lượt)
+DATASET_URLS = [
+    # Dataset mới nhất có phim đến 2024
+    "https://raw.githubusercontent.com/danielgrijalva/movie-stats/master/movies.csv",
+    # Dataset dự phòng
+    "https://raw.githubusercontent.com/LearnDataSci/articles/master/Python%20Pandas%20Tutorial%20A%20Complete%20Introduction%20for%20Beginners/IMDB-Movie-Data.csv",
+]
+
+# Các cột bắt buộc (sau khi đổi tên) để một file tải về được coi là hợp lệ
+REQUIRED_COLUMNS = {'Title', 'Year', 'Rating'}
+
+
+def has_required_columns(path):
+    """Kiểm tra nhanh schema của file CSV (chỉ đọc dòng tiêu đề)"""
+    try:
+        columns = pd.read_csv(path, nrows=0).columns
+    except Exception:
+        return False
+    return REQUIRED_COLUMNS <= {COLUMN_MAPPING.get(column, column) for column in columns}
+
+
+def download_imdb_dataset(urls=None, download_dir='data/downloads', output_path='data/raw_movies.csv',
+                          parquet_path='data/raw_movies.parquet', cache_dir='data/.dataset_cache',
+                          cache_max_bytes=1024 * 1024 * 1024, offline=False, force=False):
     """
     Tải dataset IMDb từ GitHub (IMDb Top 1000)
     Nguồn: Công khai, không cần API key
+    
+    File được tải theo kiểu streaming vào download_dir (tiếp tục được nếu bị ngắt,
+    lần sau chỉ tải lại khi file trên server thay đổi) rồi mới đọc bằng pandas.
+    Các mirror được tải đồng thời, mirror nhanh nhất có schema hợp lệ được dùng;
+    lựa chọn ghi vào <download_dir>/mirror_choice.json.
+    
+    File tải xong được lưu trong cache theo SHA-256 ở cache_dir (None = không dùng cache);
+    offline=True chỉ đọc từ cache, không gọi mạng.
+    
+    File CSV chỉ được parse một lần (dataset_ingest): đổi tên cột, chọn cột và ép kiểu
+    ngay khi đọc, ghi ra Parquet có kiểu ở parquet_path; output_path (CSV) là output phụ,
+    None = không ghi CSV.
     """
     print("🎬 Đang tải IMDb Top 1000 Movies Dataset...")
     print("📍 Nguồn: GitHub Public Dataset\n")
     
-    # Danh sách các URL dataset công khai (thử lần lượt)
-    urls = [
-        # Dataset mới nhất có phim đến 2024
-        "https://raw.githubusercontent.com/danielgrijalva/movie-stats/master/movies.csv",
-        # Dataset dự phòng
-        "https://raw.githubusercontent.com/LearnDataSci/articles/master/Python%20Pandas%20Tutorial%20A%20Complete%20Introduction%20for%20Beginners/IMDB-Movie-Data.csv",
-    ]
+    urls = urls or DATASET_URLS
+    
+    cache = DatasetCache(cache_dir, max_bytes=cache_max_bytes) if cache_dir else None
     
-    # Thử từng URL cho đến khi thành công
     df = None
-    for url in urls:
-        print(f"🔄 Đang thử: {url}")
-        url = url  # Gán URL hiện tại
-    
-    # Thử tải từng URL
-    for idx, url in enumerate(urls, 1):
-        try:
-            print(f"\n🔄 [{idx}/{len(urls)}] Đang thử tải từ URL...")
+    try:
+        if offline:
+            if cache is None:
+                raise ValueError("Chế độ offline cần cache (cache_dir)")
+            print("📴 Chế độ offline: chỉ dùng dataset trong cache")
+            path = load_from_cache(urls, cache, validate=has_required_columns)
+            if path is None:
+                raise FileNotFoundError(f"Chưa có mirror nào trong cache {cache_dir}")
+        else:
+            # Tải đồng thời từ mọi mirror, dùng file đầu tiên tải xong và đúng schema
+            print(f"🔄 Đang tải đồng thời từ {len(urls)} mirror:")
+            for idx, url in enumerate(urls, 1):
+                print(f"   [{idx}] {url}")
             print("⏳ Đang tải... (có thể mất vài giây)")
-            df = pd.read_csv(url)
-            
-            print(f"✅ Đã tải thành công {len(df)} phim!")
-            
-            # Hiển thị thông tin
-            print(f"\n📊 Thông tin dataset:")
-            print(f"   - Số lượng phim: {len(df)}")
-            print(f"   - Số cột: {len(df.columns)}")
-            print(f"   - Các cột: {', '.join(df.columns.tolist())}")
-            break  # Thành công thì thoát vòng lặp
-            
-        except Exception as e:
-            print(f"❌ Lỗi với URL {idx}: {e}")
-            if idx < len(urls):
-                print("🔄 Thử URL tiếp theo...")
-            continue
+            race = race_mirrors(urls, download_dir, validate=has_required_columns,
+                                record_path=os.path.join(download_dir, 'mirror_choice.json'),
+                                cache=cache, force=force)
+            path = race.path
+        # Parse một lần: rename + usecols + dtype, ghi Parquet (và CSV phụ)
+        df = ingest_csv(path, parquet_path=parquet_path, csv_path=output_path)
+        
+        print(f"✅ Đã tải thành công {len(df)} phim!")
+        
+        # Hiển thị thông tin
+        print(f"\n📊 Thông tin dataset:")
+        print(f"   - Số lượng phim: {len(df)}")
+        print(f"   - Số cột: {len(df.columns)}")
+        print(f"   - Các cột: {', '.join(df.columns.tolist())}")
+    except Exception as e:
+        print(f"❌ Lỗi: {e}")
     
     if df is None:
         raise Exception("Không thể tải dataset từ bất kỳ URL nào")
     
     try:
-        
-        # Chuẩn hóa tên cột để phù hợp với code hiện tại
-        column_mapping = {
-            # Mapping cho dataset mới
-            'name': 'Title',
-            'year': 'Year',
-            'score': 'Rating',
-            'votes': 'imdbVotes',
-            'gross': 'BoxOffice',
-            'runtime': 'Runtime',
-            'country': 'Country',
-            'company': 'Production',
-            'director': 'Director',
-            'writer': 'Writer',
-            'star': 'Actors',
-            # Mapping cho dataset cũ
-            'Series_Title': 'Title',
-            'Released_Year': 'Year',
-            'IMDB_Rating': 'Rating',
-            'Overview': 'Plot',
-            'Meta_score': 'Metascore',
-            'No_of_Votes': 'imdbVotes',
-            'Gross': 'BoxOffice',
-            'Runtime (Minutes)': 'Runtime'
-        }
-        
-        # Đổi tên cột nếu tồn tại
-        for old_col, new_col in column_mapping.items():
-            if old_col in df.columns:
-                df.rename(columns={old_col: new_col}, inplace=True)
-        
-        # Tạo thư mục data nếu chưa có
-        os.makedirs('data', exist_ok=True)
-        
-        # Lưu file
-        output_path = 'data/raw_movies.csv'
-        df.to_csv(output_path, index=False, encoding='utf-8-sig')
-        
-        print(f"\n💾 Đã lưu tại: {output_path}")
+        print(f"\n💾 Đã lưu tại: {parquet_path}")
+        if output_path:
+            print(f"   - Bản CSV: {output_path}")
         # Kiểm tra năm phim
         if 'Year' in df.columns:
             df['Year'] = pd.to_numeric(df['Year'], errors='coerce')
@@ -214,12 +218,22 @@ def download_alternative_dataset():
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description='Tải dataset IMDb lớn (1000+ phim)')
+    parser.add_argument('--offline', action='store_true', help='Chỉ dùng dataset trong cache, không gọi mạng')
+    parser.add_argument('--force', action='store_true', help='Bỏ qua cache, tải lại toàn bộ')
+    parser.add_argument('--no-cache', action='store_true', help='Không dùng cache dataset')
+    parser.add_argument('--cache-dir', default='data/.dataset_cache')
+    parser.add_argument('--cache-max-mb', type=int, default=1024, help='Dung lượng tối đa của cache (MB)')
+    args = parser.parse_args()
+    
     print("="*60)
     print("  📥 TẢI DATASET IMDB LỚN (1000+ PHIM)")
     print("="*60)
     
     # Thử tải dataset lớn
-    df = download_imdb_dataset()
+    df = download_imdb_dataset(cache_dir=None if args.no_cache else args.cache_dir,
+                               cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+                               offline=args.offline, force=args.force)
     
     # Nếu thất bại, dùng dataset dự phòng
     if df is None:
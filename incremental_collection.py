@@ -0,0 +1,137 @@
+"""
+Incremental Collection cho dữ liệu OMDb
+Index các imdbID đã có để mỗi lần chạy chỉ lấy phim mới / phim cần làm mới
+"""
+
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+
+def index_path_for(save_path: str) -> str:
+    """File index đi kèm với raw store (vd. data/raw_movies.index.csv)"""
+    return os.path.splitext(save_path)[0] + '.index.csv'
+
+
+def _read_columns(path: str) -> List[str]:
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    return pd.read_csv(path, nrows=0, encoding='utf-8-sig').columns.tolist()
+
+
+def _read_store(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns, encoding='utf-8-sig', dtype=str if columns else None)
+
+
+class KnownMovieIndex:
+    """
+    Index gọn các imdbID đã thu thập: imdbID -> thời điểm lấy (epoch giây)
+
+    Lưu ở file CSV hai cột (imdbID, fetched_at) cạnh raw store. Các ID chỉ có
+    trong dataset (không có trong index) được coi như vừa lấy lúc load (fetched_at = bây giờ)
+    để lần chạy đầu với refresh_days không lấy lại toàn bộ dataset.
+    """
+
+    def __init__(self, path: str, fetched_at: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.fetched_at: Dict[str, float] = fetched_at or {}
+
+    @classmethod
+    def load(cls, path: str, dataset_paths: Iterable[str] = ()) -> 'KnownMovieIndex':
+        """Đọc index và bổ sung imdbID từ các dataset có sẵn (chỉ đọc cột imdbID)"""
+        fetched_at: Dict[str, float] = {}
+        now = time.time()
+        for dataset_path in dataset_paths:
+            if not os.path.exists(dataset_path):
+                continue
+            if 'imdbID' not in _read_columns(dataset_path):
+                continue
+            ids = _read_store(dataset_path, columns=['imdbID'])['imdbID'].dropna()
+            fetched_at.update(dict.fromkeys(ids.tolist(), now))
+
+        if os.path.exists(path):
+            index_df = pd.read_csv(path, dtype={'imdbID': str, 'fetched_at': float})
+            fetched_at.update(zip(index_df['imdbID'], index_df['fetched_at']))
+        return cls(path, fetched_at)
+
+    def __len__(self):
+        return len(self.fetched_at)
+
+    def __contains__(self, imdb_id: str) -> bool:
+        return imdb_id in self.fetched_at
+
+    def fresh_ids(self, refresh_days: Optional[float] = None, now: Optional[float] = None) -> Set[str]:
+        """Các ID không cần lấy lại (tất cả nếu refresh_days=None)"""
+        if refresh_days is None:
+            return set(self.fetched_at)
+        cutoff = (now or time.time()) - refresh_days * 86400
+        return {imdb_id for imdb_id, fetched in self.fetched_at.items() if fetched >= cutoff}
+
+    def record(self, imdb_ids: Iterable[str], now: Optional[float] = None):
+        """Ghi nhận các ID vừa lấy chi tiết"""
+        now = now or time.time()
+        for imdb_id in imdb_ids:
+            self.fetched_at[imdb_id] = now
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        pd.DataFrame({
+            'imdbID': list(self.fetched_at),
+            'fetched_at': list(self.fetched_at.values())
+        }).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+
+
+def append_to_raw_store(save_path: str, delta: pd.DataFrame, replaced_ids: Set[str] = frozenset()) -> int:
+    """
+    Ghi phần dữ liệu mới (delta) vào raw store
+
+    - CSV không có phim làm mới và không có cột mới: append trực tiếp vào cuối file
+    - Ngược lại (có phim làm mới / cột mới / Parquet): ghi lại file, bản ghi cũ của
+      các phim làm mới bị thay bằng bản mới
+
+    Returns:
+        Số dòng đã ghi thêm
+    """
+    if delta.empty:
+        return 0
+
+    directory = os.path.dirname(save_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if not os.path.exists(save_path):
+        if save_path.endswith('.parquet'):
+            delta.to_parquet(save_path, index=False)
+        else:
+            delta.to_csv(save_path, index=False, encoding='utf-8-sig')
+        return len(delta)
+
+    columns = _read_columns(save_path)
+    new_columns = [column for column in delta.columns if column not in columns]
+
+    if not save_path.endswith('.parquet') and not replaced_ids and not new_columns:
+        delta.reindex(columns=columns).to_csv(save_path, mode='a', header=False, index=False,
+                                              encoding='utf-8')
+        return len(delta)
+
+    existing = _read_store(save_path)
+    if replaced_ids and 'imdbID' in existing.columns:
+        existing = existing[~existing['imdbID'].isin(replaced_ids)]
+    combined = pd.concat([existing, delta], ignore_index=True)
+
+    tmp_path = save_path + '.tmp'
+    if save_path.endswith('.parquet'):
+        combined.to_parquet(tmp_path, index=False)
+    else:
+        combined.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+    os.replace(tmp_path, save_path)
+    return len(delta)
@@ -0,0 +1,231 @@
+"""
+Incremental Preprocessing
+Tiền xử lý tăng dần theo hash nội dung của từng dòng raw (sau normalize_raw_columns và
+remove_duplicates): chỉ các dòng mới hoặc đã đổi chạy ROW_LOCAL_STEPS, dòng cũ lấy lại từ
+row store. Các bước toàn cục chạy trên dữ liệu đã ghép:
+- handle_missing_values: median của một cột chỉ được tính lại khi giá trị của cột ở các dòng
+  thêm vào khác ở các dòng bị bỏ đi, ngược lại dùng median trong manifest
+- apply_compact_schema, save_processed_data: như chế độ in-memory
+
+Row store (<output>.rows.parquet) giữ kết quả ROW_LOCAL_STEPS (chưa điền missing) kèm hash
+của từng dòng; manifest (<output>.manifest.json) giữ các bước, fingerprint mã nguồn của các
+bước, cột raw và median đã dùng. Đổi mã của bước (hoặc manifest hỏng) thì xử lý lại toàn bộ.
+Kết quả giống hệt chạy preprocess_movie_data trên toàn bộ file.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+import data_preprocessing
+import processed_schema
+from data_preprocessing import ROW_LOCAL_STEPS, MovieDataPreprocessor, normalize_raw_columns
+from dataset_ingest import read_raw_dataset
+from processed_schema import load_processed_data
+
+MANIFEST_VERSION = 1
+
+ROW_HASH_COLUMN = '_row_hash'
+
+
+def row_store_path(output_path: str) -> str:
+    """Row store đi kèm processed CSV (vd. data/processed_movies.rows.parquet)"""
+    return os.path.splitext(output_path)[0] + '.rows.parquet'
+
+
+def manifest_path_for(output_path: str) -> str:
+    """Manifest đi kèm processed CSV (vd. data/processed_movies.manifest.json)"""
+    return os.path.splitext(output_path)[0] + '.manifest.json'
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Hash (uint64) nội dung từng dòng, không phụ thuộc thứ tự cột và kiểu đọc được
+    (cột số so sánh dạng float64, cột khác dạng chuỗi)
+    """
+    normalized = {}
+    for col in sorted(df.columns):
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series):
+            normalized[col] = series.astype('float64')
+        else:
+            normalized[col] = series.astype(str).where(series.notna()).astype(object)
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized, index=df.index), index=False).to_numpy()
+
+
+def code_fingerprint() -> str:
+    """
+    Hash mã nguồn của các module định nghĩa các bước (MovieDataPreprocessor, normalize_raw_columns,
+    schema gọn): sửa một bước hay hàm phụ trợ của nó làm row store và output cũ không còn dùng được
+    """
+    digest = hashlib.sha256()
+    for module in (data_preprocessing, processed_schema):
+        digest.update(inspect.getsource(module).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _source_info(path: str) -> Dict:
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _read_manifest(path: str, fingerprint: str) -> Optional[Dict]:
+    """Manifest cùng phiên bản, cùng bước và cùng mã các bước; None nếu không có, hỏng hoặc đã cũ"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Manifest {path} không đọc được ({e}), xử lý lại toàn bộ")
+        return None
+    if (not isinstance(manifest, dict)
+            or manifest.get('version') != MANIFEST_VERSION
+            or manifest.get('steps') != list(ROW_LOCAL_STEPS)
+            or manifest.get('code') != fingerprint):
+        return None
+    return manifest
+
+
+def _matches_columns(manifest: Optional[Dict], raw_columns: list) -> bool:
+    """Manifest (đã qua _read_manifest) còn dùng được cho các cột raw này"""
+    return (manifest is not None and manifest.get('columns') == raw_columns
+            and isinstance(manifest.get('medians'), dict))
+
+
+def _read_row_store(path: str) -> pd.DataFrame:
+    import pyarrow.parquet as pq
+
+    store = pd.read_parquet(path)
+    # Parquet trả cột list (Genres_List) về dạng ndarray
+    list_columns = [field.name for field in pq.read_schema(path) if str(field.type).startswith('list')]
+    for col in list_columns:
+        store[col] = store[col].map(list, na_action='ignore')
+    return store
+
+
+def _write_atomic_parquet(df: pd.DataFrame, path: str):
+    df.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+
+def _values(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.empty(0)
+    return np.sort(df[col].dropna().to_numpy(dtype='float64'))
+
+
+def _updated_medians(rows: pd.DataFrame, added: pd.DataFrame, removed: pd.DataFrame,
+                     previous: Dict[str, float]) -> Dict[str, float]:
+    """
+    Median các cột số cho handle_missing_values
+
+    Median của cột chỉ được tính lại khi tập giá trị (khác NaN) của cột đổi, tức là giá trị
+    ở các dòng thêm vào khác giá trị ở các dòng bị bỏ đi
+    """
+    medians = {}
+    recomputed = []
+    for col in rows.select_dtypes(include=[np.number]).columns.drop(ROW_HASH_COLUMN, errors='ignore'):
+        if col in previous and np.array_equal(_values(added, col), _values(removed, col)):
+            medians[col] = previous[col]
+        else:
+            medians[col] = float(rows[col].median())
+            recomputed.append(col)
+    if recomputed:
+        print(f"📐 Tính lại median: {', '.join(recomputed)}")
+    return medians
+
+
+def preprocess_movie_data_incremental(input_path: str = 'data/raw_movies.csv',
+                                      output_path: str = 'data/processed_movies.csv',
+                                      full_refresh: bool = False) -> pd.DataFrame:
+    """
+    Tiền xử lý tăng dần: chỉ chạy ROW_LOCAL_STEPS trên các dòng raw mới / đã đổi
+
+    Args:
+        full_refresh: Bỏ qua row store và manifest, xử lý lại toàn bộ
+    """
+    print("🔧 BẮT ĐẦU TIỀN XỬ LÝ DỮ LIỆU (incremental)\n")
+    started = time.perf_counter()
+
+    store_path = row_store_path(output_path)
+    manifest_path = manifest_path_for(output_path)
+    source = _source_info(input_path)
+    fingerprint = code_fingerprint()
+
+    manifest = None if full_refresh else _read_manifest(manifest_path, fingerprint)
+    if manifest is not None and manifest.get('source') == source and os.path.exists(output_path):
+        print(f"⏭️ {input_path} không đổi từ lần xử lý trước, dùng {output_path}")
+        return load_processed_data(output_path)
+
+    raw = normalize_raw_columns(read_raw_dataset(input_path))
+    raw_columns = list(raw.columns)
+    raw = MovieDataPreprocessor(raw, verbose=False, copy=False).remove_duplicates().get_processed_data()
+    hashes = row_hashes(raw)
+
+    store = None
+    if _matches_columns(manifest, raw_columns) and os.path.exists(store_path):
+        try:
+            store = _read_row_store(store_path)
+        except Exception as e:
+            print(f"⚠️ Row store {store_path} không đọc được ({e}), xử lý lại toàn bộ")
+    if store is None:
+        manifest = None
+        store = pd.DataFrame({ROW_HASH_COLUMN: np.empty(0, dtype=np.uint64)})
+
+    # Khớp hash: dòng đã có trong store dùng lại, dòng còn lại là mới hoặc đã đổi
+    positions = pd.Index(store[ROW_HASH_COLUMN]).get_indexer(hashes)
+    is_new = positions < 0
+    removed = np.ones(len(store), dtype=bool)
+    removed[positions[~is_new]] = False
+
+    parts = []
+    if (~is_new).any():
+        parts.append(store.iloc[positions[~is_new]].set_axis(raw.index[~is_new]))
+    processed_delta = store.iloc[:0]
+    if is_new.any():
+        preprocessor = MovieDataPreprocessor(raw[is_new], verbose=False, copy=False)
+        for step in ROW_LOCAL_STEPS:
+            getattr(preprocessor, step)()
+        processed_delta = preprocessor.get_processed_data()
+        processed_delta[ROW_HASH_COLUMN] = hashes[is_new]
+        parts.append(processed_delta)
+    print(f"📂 {len(raw)} phim: {int(is_new.sum())} mới/đã đổi, {int((~is_new).sum())} dùng lại, "
+          f"{int(removed.sum())} bị xóa khỏi raw\n")
+    del raw
+
+    rows = pd.concat(parts).sort_index() if len(parts) > 1 else parts[0] if parts else store.iloc[:0]
+
+    medians = _updated_medians(rows, processed_delta, store[removed], manifest['medians'] if manifest else {})
+
+    processed_df = (MovieDataPreprocessor(rows.drop(columns=ROW_HASH_COLUMN), copy=False)
+                    .handle_missing_values(medians=medians)
+                    .apply_compact_schema()
+                    .save_processed_data(output_path)
+                    .get_processed_data())
+
+    # Xóa manifest trước khi ghi store: dừng giữa chừng thì lần sau xử lý lại toàn bộ
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    _write_atomic_parquet(rows.reset_index(drop=True), store_path)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': MANIFEST_VERSION,
+            'steps': list(ROW_LOCAL_STEPS),
+            'code': fingerprint,
+            'columns': raw_columns,
+            'source': source,
+            'rows': len(rows),
+            'medians': medians,
+        }, f, indent=2, ensure_ascii=False)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    print(f"\n✅ HOÀN THÀNH TIỀN XỬ LÝ TĂNG DẦN trong {time.perf_counter() - started:.2f}s "
+          f"({len(processed_df)} phim)")
+    return processed_df
@@ -0,0 +1,243 @@
+"""
+Lazy Preprocessing
+Bộ lập kế hoạch cho chain của MovieDataPreprocessor ở chế độ lazy: các bước chỉ được ghi vào
+plan, đến get_processed_data / save_processed_data plan mới được tối ưu rồi chạy:
+- bỏ bước thiếu cột đầu vào (no-op) và bước chỉ tạo ra cột không ai đọc
+- chỉ giữ các cột cần cho đầu ra hoặc cho các bước còn lại, chọn ngay từ đầu
+- gộp các bước transform liền nhau thành một stage: chạy trên frame hẹp chỉ gồm các cột
+  stage đọc, ghi kết quả vào frame chính một lần
+
+Kết quả giống hệt chạy tuần tự cả chain rồi chọn các cột đầu ra.
+"""
+
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import pandas as pd
+
+from data_preprocessing import PREPROCESS_CHAIN, MovieDataPreprocessor
+
+# Một bước đã ghi: (tên method, args, kwargs)
+PlannedStep = Tuple[str, tuple, dict]
+
+
+@dataclass(frozen=True)
+class StepSpec:
+    """
+    Cột mà một bước đọc / ghi
+
+    kind: 'transform' (chỉ đọc/ghi các cột khai báo, gộp được), 'filter' (lọc dòng)
+          hoặc 'columnwise' (xử lý độc lập từng cột đang có)
+    needs: 'all' = bước chỉ có tác dụng khi có đủ reads, 'any' = khi có ít nhất một;
+           với 'filter', thiếu reads thì bước đọc mọi cột
+    renames: Cột được đổi tên tại chỗ (cũ, mới)
+    """
+    kind: str
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+    needs: str = 'all'
+    renames: Tuple[Tuple[str, str], ...] = ()
+
+
+STEP_SPECS: Dict[str, StepSpec] = {
+    'remove_duplicates': StepSpec('filter', reads=('Title', 'Year')),
+    'clean_year': StepSpec('transform', reads=('Year',), writes=('Year',)),
+    'clean_rating': StepSpec('transform', reads=('imdbRating', 'Rating'), writes=('Rating',),
+                             needs='any', renames=(('imdbRating', 'Rating'),)),
+    'clean_runtime': StepSpec('transform', reads=('Runtime',), writes=('Runtime',)),
+    'clean_box_office': StepSpec('transform', reads=('BoxOffice',), writes=('BoxOffice',)),
+    'clean_budget': StepSpec('transform', reads=('Budget',), writes=('Budget',)),
+    'split_genres': StepSpec('transform', reads=('Genre',),
+                             writes=('Genres_List', 'Primary_Genre', 'Genre_Count')),
+    'extract_country': StepSpec('transform', reads=('Country',), writes=('Primary_Country',)),
+    'create_decade': StepSpec('transform', reads=('Year',), writes=('Decade',)),
+    'create_roi': StepSpec('transform', reads=('BoxOffice', 'Budget'), writes=('ROI',)),
+    'create_profit': StepSpec('transform', reads=('BoxOffice', 'Budget'), writes=('Profit',)),
+    'categorize_rating': StepSpec('transform', reads=('Rating',), writes=('Rating_Category',)),
+    'categorize_runtime': StepSpec('transform', reads=('Runtime',), writes=('Runtime_Category',)),
+    'handle_missing_values': StepSpec('columnwise'),
+    'apply_compact_schema': StepSpec('columnwise'),
+}
+
+
+def _present(columns: Iterable[str], schema: Sequence[str]) -> List[str]:
+    return [col for col in columns if col in schema]
+
+
+def _is_active(spec: StepSpec, schema: Sequence[str]) -> bool:
+    """Bước có tác dụng trên schema hiện tại không (transform thiếu cột đầu vào là no-op)"""
+    if spec.kind != 'transform':
+        return True
+    present = _present(spec.reads, schema)
+    return bool(present) if spec.needs == 'any' else len(present) == len(spec.reads)
+
+
+def _reads(spec: StepSpec, schema: Sequence[str]) -> List[str]:
+    """Các cột bước thực sự đọc trên schema hiện tại"""
+    present = _present(spec.reads, schema)
+    if spec.kind == 'filter' and len(present) < len(spec.reads):
+        return list(schema)
+    return present
+
+
+def _next_schema(spec: StepSpec, schema: List[str]) -> List[str]:
+    """Schema sau bước, giữ thứ tự cột như khi chạy tuần tự (cột mới nối vào cuối)"""
+    renames = dict(spec.renames)
+    schema = [renames.get(col, col) for col in schema]
+    return schema + [col for col in spec.writes if col not in schema]
+
+
+@dataclass
+class Stage:
+    """
+    Một lượt chạy của plan đã tối ưu: một bước filter/columnwise hoặc nhiều bước transform đã gộp
+
+    columns: Cột stage đọc từ frame chính
+    writes: Cột stage ghi (transform)
+    live: Cột còn cần sau stage (các cột khác bị bỏ khỏi frame)
+    """
+    kind: str
+    steps: List[PlannedStep]
+    columns: List[str] = field(default_factory=list)
+    writes: List[str] = field(default_factory=list)
+    live: Set[str] = field(default_factory=set)
+
+    @property
+    def name(self) -> str:
+        return '+'.join(step[0] for step in self.steps)
+
+
+@dataclass
+class OptimizedPlan:
+    """Plan sau tối ưu: cột cần đọc, các stage theo thứ tự chạy và cột đầu ra"""
+    source_columns: List[str]
+    stages: List[Stage]
+    output_columns: List[str]
+    pruned: List[str]
+    recorded: int
+    available: int
+
+    def explain(self) -> str:
+        lines = [f"🧭 Plan lazy: {self.recorded} bước -> {len(self.stages)} stage, "
+                 f"đọc {len(self.source_columns)}/{self.available} cột, "
+                 f"trả về {len(self.output_columns)} cột"]
+        for stage in self.stages:
+            lines.append(f"   - [{stage.kind}] {stage.name}")
+        if self.pruned:
+            lines.append(f"   - Bỏ qua: {', '.join(self.pruned)}")
+        return '\n'.join(lines)
+
+
+def optimize_plan(steps: Sequence[PlannedStep], schema: Sequence[str],
+                  outputs: Optional[Sequence[str]] = None) -> OptimizedPlan:
+    """
+    Tối ưu plan trên schema của frame đầu vào
+
+    Args:
+        steps: Các bước đã ghi, theo thứ tự gọi
+        schema: Cột của frame đầu vào
+        outputs: Cột cần có trong kết quả (theo thứ tự này); None = mọi cột chain tạo ra
+    """
+    # Lượt xuôi: bỏ bước no-op, ghi lại schema trước mỗi bước còn lại
+    source_schema = schema = list(schema)
+    pruned = set()
+    active = []
+    for index, step in enumerate(steps):
+        spec = STEP_SPECS[step[0]]
+        if not _is_active(spec, schema):
+            pruned.add(index)
+            continue
+        active.append((index, step, schema))
+        schema = _next_schema(spec, schema)
+
+    if outputs is None:
+        outputs = schema
+    else:
+        unknown = [col for col in outputs if col not in schema]
+        if unknown:
+            raise ValueError(f"Chain không tạo ra các cột: {unknown}")
+    outputs = list(outputs)
+
+    # Lượt ngược: giữ bước ghi cột còn cần, tính các cột cần sau từng bước (live)
+    needed = set(outputs)
+    kept = []
+    for index, step, before in reversed(active):
+        spec = STEP_SPECS[step[0]]
+        live = set(needed)
+        reads = _reads(spec, before)
+        if spec.kind == 'transform':
+            if not needed & set(spec.writes):
+                pruned.add(index)
+                continue
+            needed = (needed - set(spec.writes)) | set(reads)
+        elif spec.kind == 'filter':
+            needed |= set(reads)
+        kept.append((step, spec, reads, live))
+    kept.reverse()
+
+    # Gộp các transform liền nhau thành một stage
+    stages: List[Stage] = []
+    for step, spec, reads, live in kept:
+        if spec.kind == 'transform' and stages and stages[-1].kind == 'transform':
+            stage = stages[-1]
+            stage.steps.append(step)
+            stage.columns += [col for col in reads if col not in stage.columns]
+            stage.writes += [col for col in spec.writes if col not in stage.writes]
+            stage.live = live
+        else:
+            stages.append(Stage(spec.kind, [step], list(reads), list(spec.writes), live))
+
+    return OptimizedPlan(
+        source_columns=[col for col in source_schema if col in needed],
+        stages=stages,
+        output_columns=outputs,
+        pruned=[steps[index][0] for index in sorted(pruned)],
+        recorded=len(steps),
+        available=len(source_schema),
+    )
+
+
+def _run_steps(preprocessor: MovieDataPreprocessor, steps: Sequence[PlannedStep]) -> pd.DataFrame:
+    for name, args, kwargs in steps:
+        getattr(preprocessor, name)(*args, **kwargs)
+    return preprocessor.get_processed_data()
+
+
+def _run_stage(df: pd.DataFrame, stage: Stage, verbose: bool) -> pd.DataFrame:
+    if stage.kind == 'transform':
+        # Frame hẹp chỉ gồm cột stage đọc; kết quả ghi vào frame chính bằng một lần assign
+        narrow = df[[col for col in df.columns if col in stage.columns]]
+        result = _run_steps(MovieDataPreprocessor(narrow, verbose=verbose, copy=False), stage.steps)
+        updates = {col: result[col] for col in stage.writes if col in stage.live}
+        dropped = [col for col in df.columns if col not in stage.live]
+        if dropped:
+            df = df.drop(columns=dropped)
+        return df.assign(**updates)
+
+    df = _run_steps(MovieDataPreprocessor(df, verbose=verbose, copy=False), stage.steps)
+    dropped = [col for col in df.columns if col not in stage.live]
+    return df.drop(columns=dropped) if dropped else df
+
+
+def execute_plan(df: pd.DataFrame, plan: OptimizedPlan, verbose: bool = True,
+                 profiler=None) -> pd.DataFrame:
+    """
+    Chạy plan đã tối ưu trên df (df không bị sửa)
+
+    Args:
+        profiler: StepMemoryProfiler, đo từng stage thay vì từng bước
+    """
+    df = df[plan.source_columns]
+    for stage in plan.stages:
+        with profiler.step(stage.name) if profiler is not None else nullcontext():
+            df = _run_stage(df, stage, verbose)
+    if list(df.columns) != plan.output_columns:
+        df = df[plan.output_columns]
+    return df
+
+
+def plan_source_columns(schema: Sequence[str], outputs: Sequence[str],
+                        steps: Sequence[str] = PREPROCESS_CHAIN) -> List[str]:
+    """Các cột cần đọc từ nguồn để chain steps tạo ra outputs"""
+    return optimize_plan([(name, (), {}) for name in steps], schema, outputs).source_columns
@@ -0,0 +1,182 @@
+"""
+Memory Budget
+Đo bộ nhớ từng bước tiền xử lý: peak RSS của process và peak tracemalloc (numpy/pandas
+cũng báo cấp phát cho tracemalloc), dừng sớm khi peak RSS vượt ngân sách cấu hình.
+
+Peak RSS từng bước dùng VmHWM trong /proc/self/status, được reset trước mỗi bước qua
+/proc/self/clear_refs (Linux). Nơi khác dùng ru_maxrss (peak tích lũy từ đầu process).
+
+Ngân sách được kiểm tra giữa các bước: trước bước (RSS hiện tại) và sau bước (peak RSS).
+MemoryBudgetExceeded chỉ được raise ở ranh giới bước, không bao giờ giữa chừng một thao tác
+pandas, nên frame của preprocessor luôn ở trạng thái của bước cuối cùng đã chạy xong.
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+MB = 1024 * 1024
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """Peak RSS của một bước vượt ngân sách bộ nhớ"""
+
+
+def _read_status() -> Dict[str, int]:
+    """VmRSS / VmHWM (bytes) từ /proc/self/status, {} nếu không có"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+    status = {}
+    for line in lines:
+        key, _, value = line.partition(':')
+        if key in ('VmRSS', 'VmHWM'):
+            status[key] = int(value.split()[0]) * 1024
+    return status
+
+
+def _reset_peak_rss() -> bool:
+    """Đặt lại VmHWM về RSS hiện tại (Linux >= 4.0), False nếu không hỗ trợ"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def current_rss_mb() -> Optional[float]:
+    """RSS hiện tại (MB)"""
+    rss = _read_status().get('VmRSS')
+    return rss / MB if rss is not None else None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS (MB) kể từ lần reset gần nhất, hoặc từ đầu process nếu không reset được"""
+    hwm = _read_status().get('VmHWM')
+    if hwm is not None:
+        return hwm / MB
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về bytes
+    return maxrss / MB if sys.platform == 'darwin' else maxrss / 1024
+
+
+class StepMemoryProfiler:
+    """
+    Ghi bộ nhớ của từng bước và kiểm tra ngân sách
+
+    Args:
+        budget_mb: Ngân sách peak RSS (MB); None = chỉ đo
+        trace: Bật tracemalloc (chậm hơn với code Python thuần, gần như không ảnh hưởng numpy)
+    """
+
+    def __init__(self, budget_mb: Optional[float] = None, trace: bool = True):
+        self.budget_mb = budget_mb
+        self.trace = trace
+        self.records: List[Dict] = []
+        self._owns_tracing = False
+
+    def start(self):
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        return self
+
+    def stop(self):
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    def check_budget(self, name: str):
+        """
+        Raise MemoryBudgetExceeded nếu RSS hiện tại đã vượt ngân sách, trước khi bước `name` chạy
+        (bước chưa chạy nên không đổi gì trên dữ liệu)
+        """
+        rss = current_rss_mb()
+        if self.budget_mb is None or rss is None or rss <= self.budget_mb:
+            return
+        self.records.append({'step': name, 'seconds': 0.0, 'rss_before_mb': rss, 'rss_after_mb': rss,
+                             'peak_rss_mb': rss, 'per_step_peak': False, 'aborted': True})
+        raise MemoryBudgetExceeded(
+            f"RSS {rss:.1f} MB vượt ngân sách {self.budget_mb:.1f} MB trước bước '{name}'"
+        )
+
+    @contextmanager
+    def step(self, name: str):
+        """
+        Đo một bước; raise MemoryBudgetExceeded trước bước nếu RSS đã vượt ngân sách
+        (check_budget), hoặc sau bước nếu peak RSS của bước vượt ngân sách
+        """
+        self.check_budget(name)
+        per_step_peak = _reset_peak_rss()
+        rss_before = current_rss_mb()
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+
+        yield
+
+        record = {
+            'step': name,
+            'seconds': round(time.perf_counter() - started, 4),
+            'rss_before_mb': rss_before,
+            'rss_after_mb': current_rss_mb(),
+            'peak_rss_mb': peak_rss_mb(),
+            'per_step_peak': per_step_peak,
+        }
+        if tracing:
+            traced_after, traced_peak = tracemalloc.get_traced_memory()
+            record['traced_peak_mb'] = (traced_peak - traced_before) / MB
+            record['traced_delta_mb'] = (traced_after - traced_before) / MB
+        self.records.append(record)
+
+        peak = record['peak_rss_mb']
+        if self.budget_mb is not None and peak is not None and peak > self.budget_mb:
+            raise MemoryBudgetExceeded(
+                f"Bước '{name}' dùng peak RSS {peak:.1f} MB, vượt ngân sách {self.budget_mb:.1f} MB"
+            )
+
+    @property
+    def peak_mb(self) -> Optional[float]:
+        """Peak RSS lớn nhất trong các bước đã đo"""
+        peaks = [r['peak_rss_mb'] for r in self.records if r['peak_rss_mb'] is not None]
+        return max(peaks) if peaks else None
+
+    def report(self) -> str:
+        """Bảng bộ nhớ từng bước"""
+        lines = [f"{'Bước':24s} {'Thời gian':>10s} {'RSS sau':>10s} {'Peak RSS':>10s} "
+                 f"{'Peak alloc':>11s} {'Δ alloc':>10s}"]
+
+        def mb(value):
+            return f"{value:8.1f}MB" if value is not None else f"{'-':>10s}"
+
+        for r in self.records:
+            lines.append(f"{r['step']:24s} {r['seconds']:9.2f}s {mb(r['rss_after_mb'])} {mb(r['peak_rss_mb'])} "
+                         f" {mb(r.get('traced_peak_mb'))} {mb(r.get('traced_delta_mb'))}"
+                         f"{'  ⛔ dừng trước bước' if r.get('aborted') else ''}")
+        if self.budget_mb is not None:
+            lines.append(f"Ngân sách: {self.budget_mb:.1f} MB, peak cao nhất: {mb(self.peak_mb).strip()}")
+        return '\n'.join(lines)
+
+    def save_report(self, path: str):
+        """Ghi kết quả đo ra JSON"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'budget_mb': self.budget_mb, 'peak_rss_mb': self.peak_mb, 'steps': self.records},
+                      f, indent=2, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,279 @@
+"""
+OMDb Stub Server
+Server giả lập OMDb API chạy local để test / benchmark mà không tốn quota thật
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+PAGE_SIZE = 10
+MAX_PAGES = 100
+
+
+@dataclass
+class StubConfig:
+    """
+    Cấu hình hành vi của stub server
+
+    latency: 'none', 'constant', 'uniform' (0..2*latency_ms),
+             'lognormal' (trung vị latency_ms, độ lệch latency_sigma) hoặc 'exponential'
+    error_rate: tỉ lệ request trả về 500
+    rate_limit_rate: tỉ lệ request trả về 429 (kèm Retry-After)
+    """
+    latency: str = 'lognormal'
+    latency_ms: float = 50.0
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 0.0
+    seed: Optional[int] = None
+
+
+def build_fixture_corpus(path: str = 'data/processed_movies.csv', limit: Optional[int] = None) -> List[Dict]:
+    """
+    Tạo corpus chi tiết phim theo định dạng OMDb từ dataset local
+
+    imdbID được sinh theo thứ tự dòng (tt0000001, tt0000002, ...) nên ổn định giữa các lần chạy.
+    """
+    df = pd.read_csv(path, encoding='utf-8-sig', nrows=limit)
+
+    def text(row, column, default='N/A'):
+        value = row.get(column)
+        return default if value is None or (isinstance(value, float) and math.isnan(value)) else str(value)
+
+    def number(row, column):
+        value = row.get(column)
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return None
+        return float(value)
+
+    corpus = []
+    for position, row in enumerate(df.to_dict('records'), 1):
+        rating = number(row, 'Rating')
+        votes = number(row, 'imdbVotes')
+        runtime = number(row, 'Runtime')
+        box_office = number(row, 'BoxOffice')
+        year = number(row, 'Year')
+        ratings = []
+        if rating is not None:
+            ratings.append({'Source': 'Internet Movie Database', 'Value': f"{rating:.1f}/10"})
+            ratings.append({'Source': 'Rotten Tomatoes', 'Value': f"{min(100, round(rating * 10))}%"})
+        corpus.append({
+            'Title': text(row, 'Title'),
+            'Year': 'N/A' if year is None else str(int(year)),
+            'Rated': text(row, 'rating'),
+            'Released': text(row, 'released'),
+            'Runtime': 'N/A' if runtime is None else f"{int(runtime)} min",
+            'Genre': text(row, 'genre', text(row, 'Genre')),
+            'Director': text(row, 'Director'),
+            'Writer': text(row, 'Writer'),
+            'Actors': text(row, 'Actors'),
+            'Plot': 'N/A',
+            'Language': text(row, 'Language'),
+            'Country': text(row, 'Country'),
+            'Awards': 'N/A',
+            'Poster': 'N/A',
+            'Ratings': ratings,
+            'Metascore': 'N/A',
+            'imdbRating': 'N/A' if rating is None else f"{rating:.1f}",
+            'imdbVotes': 'N/A' if votes is None else f"{int(votes):,}",
+            'imdbID': f"tt{position:07d}",
+            'Type': 'movie',
+            'DVD': 'N/A',
+            # Dataset local lưu BoxOffice đã nhân 1e6 (xem data_preprocessing)
+            'BoxOffice': 'N/A' if box_office is None else f"${int(box_office / 1_000_000):,}",
+            'Production': text(row, 'Production'),
+            'Website': 'N/A',
+            'Response': 'True',
+        })
+    return corpus
+
+
+class OMDbStubServer:
+    """
+    Server HTTP giả lập OMDb: hỗ trợ tìm kiếm (s=, page=) và chi tiết (i=)
+
+    Dùng như context manager:
+        with OMDbStubServer(corpus, StubConfig(latency_ms=20)) as server:
+            collector = MovieDataCollector('test', base_url=server.url)
+    apikey='invalid' trả về lỗi 401 Invalid API key.
+    """
+
+    def __init__(self, corpus: List[Dict], config: Optional[StubConfig] = None,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.corpus = corpus
+        self.config = config or StubConfig()
+        self.by_id = {movie['imdbID']: movie for movie in corpus}
+        self._titles = [movie['Title'].lower() for movie in corpus]
+        self._random = random.Random(self.config.seed)
+        self._random_lock = threading.Lock()
+        self.stats = {'requests': 0, 'search': 0, 'detail': 0, 'errors': 0, 'rate_limited': 0}
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Hỗ trợ keep-alive
+            disable_nagle_algorithm = True  # Tránh trễ thêm ~40ms do Nagle + delayed ACK
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                stub._handle(self)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _sample(self) -> Dict[str, float]:
+        """Chọn ngẫu nhiên độ trễ và lỗi cho một request"""
+        config = self.config
+        with self._random_lock:
+            if config.latency == 'none':
+                delay_ms = 0.0
+            elif config.latency == 'constant':
+                delay_ms = config.latency_ms
+            elif config.latency == 'uniform':
+                delay_ms = self._random.uniform(0, 2 * config.latency_ms)
+            elif config.latency == 'exponential':
+                delay_ms = self._random.expovariate(1 / config.latency_ms) if config.latency_ms > 0 else 0.0
+            else:
+                delay_ms = self._random.lognormvariate(math.log(max(config.latency_ms, 1e-3)),
+                                                       config.latency_sigma)
+            fault = self._random.random()
+        return {'delay': delay_ms / 1000, 'fault': fault}
+
+    def _search(self, params: Dict[str, str]) -> Dict:
+        term = params.get('s', '').strip().lower()
+        year = params.get('y')
+        try:
+            page = max(1, min(MAX_PAGES, int(params.get('page', 1))))
+        except ValueError:
+            page = 1
+        if not term:
+            return {'Response': 'False', 'Error': 'Incorrect IMDb ID.'}
+
+        matches = [
+            movie for movie, title in zip(self.corpus, self._titles)
+            if term in title and (not year or movie['Year'] == year)
+        ]
+        if not matches:
+            return {'Response': 'False', 'Error': 'Movie not found!'}
+        start = (page - 1) * PAGE_SIZE
+        return {
+            'Search': [
+                {key: movie[key] for key in ('Title', 'Year', 'imdbID', 'Type', 'Poster')}
+                for movie in matches[start:start + PAGE_SIZE]
+            ],
+            'totalResults': str(len(matches)),
+            'Response': 'True',
+        }
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        params = {key: values[0] for key, values in parse_qs(urlparse(handler.path).query).items()}
+        self._count('requests')
+        sample = self._sample()
+        if sample['delay'] > 0:
+            time.sleep(sample['delay'])
+
+        status, headers = 200, {}
+        if sample['fault'] < self.config.rate_limit_rate:
+            self._count('rate_limited')
+            status, body = 429, {'Response': 'False', 'Error': 'Request limit reached!'}
+            headers['Retry-After'] = str(self.config.retry_after)
+        elif sample['fault'] < self.config.rate_limit_rate + self.config.error_rate:
+            self._count('errors')
+            status, body = 500, {'Response': 'False', 'Error': 'Internal server error'}
+        elif params.get('apikey') == 'invalid':
+            status, body = 401, {'Response': 'False', 'Error': 'Invalid API key!'}
+        elif 's' in params:
+            self._count('search')
+            body = self._search(params)
+        elif 'i' in params:
+            self._count('detail')
+            body = self.by_id.get(params['i'], {'Response': 'False', 'Error': 'Incorrect IMDb ID.'})
+        else:
+            body = {'Response': 'False', 'Error': 'No API key provided.'}
+
+        payload = json.dumps(body).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json; charset=utf-8')
+        handler.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+
+def main():
+    """Chạy stub server độc lập"""
+    parser = argparse.ArgumentParser(description='Server giả lập OMDb API')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--corpus', default='data/processed_movies.csv')
+    parser.add_argument('--latency', default='lognormal',
+                        choices=['none', 'constant', 'uniform', 'lognormal', 'exponential'])
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.corpus):
+        print(f"❌ Không tìm thấy file {args.corpus}")
+        return
+
+    corpus = build_fixture_corpus(args.corpus)
+    config = StubConfig(latency=args.latency, latency_ms=args.latency_ms,
+                        latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+                        rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    server = OMDbStubServer(corpus, config, port=args.port)
+    print(f"🧪 OMDb stub server ({len(corpus)} phim) đang chạy tại {server.url}")
+    print("⚠️ Nhấn Ctrl+C để dừng server")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+HTTP Transport cho OMDb API
+Session keep-alive dùng chung, connection pool và retry có backoff
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from adaptive_concurrency import AIMDConcurrencyLimiter
+from rate_limiter import TokenBucketRateLimiter
+
+
+class OMDbTransportError(Exception):
+    """Lỗi khi gọi OMDb API (đã thử lại hết số lần cho phép)"""
+
+
+class RetryPolicy:
+    """
+    Chính sách thử lại dùng chung cho OMDbTransport và AsyncMovieDataCollector
+
+    - Thử lại khi timeout, lỗi kết nối, 429 và 5xx, tối đa max_retries lần
+    - Exponential backoff + full jitter, không quá backoff_max
+    - Tôn trọng header Retry-After của server (cũng không quá backoff_max)
+    """
+
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(self, max_retries: int = 4, backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def should_retry(self, status: int) -> bool:
+        return status in self.RETRY_STATUS_CODES
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Thời gian chờ trước lần thử tiếp theo (full jitter)"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    @staticmethod
+    def parse_retry_after(headers) -> Optional[float]:
+        """Giá trị Retry-After (giây) trong headers, None nếu không có hoặc không hợp lệ"""
+        value = headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return None
+
+
+class OMDbTransport:
+    """
+    Gửi request tới OMDb qua một requests.Session dùng chung
+
+    - Giữ kết nối keep-alive trong connection pool (không bắt tay TCP/TLS lại mỗi lần)
+    - Thử lại theo RetryPolicy: exponential backoff + jitter khi timeout, lỗi kết nối, 429 và 5xx
+    - Timeout riêng cho từng request (connect, read)
+    - Mỗi lần gửi (kể cả thử lại) đều lấy token từ rate_limiter nếu có
+    - observer(params, status, elapsed, error, response) được gọi sau mỗi lần gửi để đo đạc
+    - concurrency_limiter (AIMD) giới hạn số request đang chạy theo tình trạng server
+    """
+
+    RETRY_STATUS_CODES = RetryPolicy.RETRY_STATUS_CODES
+
+    def __init__(self, base_url: str = "http://www.omdbapi.com/",
+                 timeout: Union[float, Tuple[float, float]] = (3.05, 10),
+                 max_retries: int = 4, backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 pool_maxsize: int = 16, rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                 observer: Optional[Callable] = None,
+                 concurrency_limiter: Optional[AIMDConcurrencyLimiter] = None):
+        self.base_url = base_url
+        self.concurrency_limiter = concurrency_limiter
+        self.rate_limiter = rate_limiter
+        self.observer = observer
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_policy = RetryPolicy(max_retries, backoff_base, backoff_max)
+
+        self.session = requests.Session()
+        # Retry do transport tự quản lý nên tắt retry của urllib3
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.retry_count = 0
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        return self.retry_policy.delay(attempt, retry_after)
+
+    @staticmethod
+    def _parse_retry_after(response: requests.Response) -> Optional[float]:
+        return RetryPolicy.parse_retry_after(response.headers)
+
+    def _observe(self, params: Dict, status: Optional[int], elapsed: float,
+                 error: Optional[BaseException], response: Optional[requests.Response] = None):
+        if self.observer is not None:
+            self.observer(params, status, elapsed, error, response)
+
+    def get_json(self, params: Dict, timeout: Union[float, Tuple[float, float], None] = None) -> Dict:
+        """
+        Gửi GET tới OMDb và trả về JSON
+
+        Raises:
+            OMDbTransportError: nếu vẫn lỗi sau max_retries lần thử lại
+            QuotaExceededError: nếu rate_limiter báo đã hết hạn mức trong ngày
+        """
+        last_error: Optional[BaseException] = None
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            with self._lock:
+                self.request_count += 1
+                if attempt > 0:
+                    self.retry_count += 1
+            slot = self.concurrency_limiter.acquire() if self.concurrency_limiter is not None else None
+            started = time.perf_counter()
+            response = None
+            try:
+                response = self.session.get(self.base_url, params=params,
+                                            timeout=timeout or self.timeout)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                last_error = e
+                self._observe(params, None, time.perf_counter() - started, e)
+            finally:
+                # Luôn trả slot, kể cả khi session.get raise lỗi ngoài dự kiến (coi là quá tải)
+                if slot is not None:
+                    if response is None:
+                        self.concurrency_limiter.release(slot, None, overloaded=True)
+                    else:
+                        self.concurrency_limiter.release(
+                            slot, time.perf_counter() - started,
+                            overloaded=response.status_code in self.RETRY_STATUS_CODES
+                        )
+
+            if response is not None:
+                elapsed = time.perf_counter() - started
+                self._observe(params, response.status_code, elapsed, None, response)
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    # Lỗi 4xx (vd. 401 Invalid API key): OMDb vẫn trả JSON mô tả lỗi
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise OMDbTransportError(f"HTTP {response.status_code}") from None
+                last_error = OMDbTransportError(f"HTTP {response.status_code}")
+                retry_after = self._parse_retry_after(response)
+
+            if attempt < self.max_retries:
+                time.sleep(self._backoff_delay(attempt, retry_after))
+
+        raise OMDbTransportError(
+            f"Thất bại sau {self.max_retries + 1} lần thử: {last_error}"
+        ) from last_error
+
+    def close(self):
+        """Đóng session và các kết nối trong pool"""
+        self.session.close()
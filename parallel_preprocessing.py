@@ -0,0 +1,111 @@
+"""
+Parallel Preprocessing
+Chạy các bước theo dòng (ROW_LOCAL_STEPS) của MovieDataPreprocessor trên nhiều process:
+chia DataFrame thành các phân vùng liên tiếp theo dòng, xử lý bằng ProcessPoolExecutor
+rồi ghép lại đúng thứ tự ban đầu. Các bước toàn cục (remove_duplicates, handle_missing_values)
+vẫn chạy trên DataFrame đã ghép nên kết quả giống hệt chạy tuần tự.
+
+Dữ liệu gửi qua pickle được giữ nhỏ nhất có thể: process con chỉ nhận các cột mà
+ROW_LOCAL_STEPS đọc (theo STEP_SPECS) và chỉ trả về các cột các bước ghi, trừ Genres_List
+(hàng triệu list nhỏ, pickle tốn hơn tạo lại) được tạo lại trong process chính.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import ROW_LOCAL_STEPS, MovieDataPreprocessor
+from lazy_preprocessing import STEP_SPECS
+
+# Phân vùng nhỏ hơn mức này thì chi phí gửi dữ liệu sang process lớn hơn lợi ích
+MIN_PARTITION_ROWS = 10_000
+
+
+# Cột không gửi về process chính (tạo lại bằng split_genres trên cột Genre)
+REBUILT_COLUMNS = ('Genres_List',)
+
+
+def available_cpus() -> int:
+    """Số CPU process được phép dùng (theo affinity nếu có)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _row_local_columns():
+    """(cột ROW_LOCAL_STEPS đọc, cột ghi, đổi tên) theo STEP_SPECS"""
+    reads, writes, renames = [], [], {}
+    for step in ROW_LOCAL_STEPS:
+        spec = STEP_SPECS[step]
+        reads += [col for col in spec.reads if col not in reads]
+        writes += [col for col in spec.writes if col not in writes]
+        renames.update(spec.renames)
+    return reads, writes, renames
+
+
+def _process_partition(part: pd.DataFrame) -> pd.DataFrame:
+    """Chạy ROW_LOCAL_STEPS trên một phân vùng (trong process con), chỉ trả về các cột được ghi"""
+    preprocessor = MovieDataPreprocessor(part, verbose=False, copy=False)
+    for step in ROW_LOCAL_STEPS:
+        getattr(preprocessor, step)()
+    result = preprocessor.get_processed_data()
+    _, writes, _ = _row_local_columns()
+    return result[[col for col in result.columns if col in writes and col not in REBUILT_COLUMNS]]
+
+
+def split_partitions(df: pd.DataFrame, partitions: int) -> List[pd.DataFrame]:
+    """Chia DataFrame thành các khoảng dòng liên tiếp có kích thước gần bằng nhau"""
+    partitions = max(1, min(partitions, len(df)))
+    bounds = np.linspace(0, len(df), partitions + 1).astype(int)
+    return [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def process_partitions(df: pd.DataFrame, workers: Optional[int] = None,
+                       partitions: Optional[int] = None) -> pd.DataFrame:
+    """
+    Chạy ROW_LOCAL_STEPS song song, trả về DataFrame đã ghép theo thứ tự dòng ban đầu
+
+    Args:
+        workers: Số process (mặc định = số CPU được dùng; không vượt số CPU đó vì process
+                 thừa chỉ thêm chi phí pickle)
+        partitions: Số phân vùng (mặc định = workers, giới hạn để mỗi phân vùng
+                    có ít nhất MIN_PARTITION_ROWS dòng)
+    """
+    cpus = available_cpus()
+    workers = min(workers or cpus, cpus)
+    partitions = partitions or min(workers, max(1, len(df) // MIN_PARTITION_ROWS))
+
+    started = time.perf_counter()
+    if partitions == 1 or workers == 1:
+        preprocessor = MovieDataPreprocessor(df, verbose=False, copy=False)
+        for step in ROW_LOCAL_STEPS:
+            getattr(preprocessor, step)()
+        print(f"✅ Đã chạy {len(ROW_LOCAL_STEPS)} bước theo dòng trong process chính "
+              f"({cpus} CPU, {time.perf_counter() - started:.2f}s)")
+        return preprocessor.get_processed_data()
+
+    reads, _, renames = _row_local_columns()
+    parts = split_partitions(df[[col for col in df.columns if col in reads]], partitions)
+    with ProcessPoolExecutor(max_workers=min(workers, len(parts))) as executor:
+        # map giữ nguyên thứ tự phân vùng
+        processed = list(executor.map(_process_partition, parts))
+
+    # concat nâng kiểu như khi xử lý cả frame (int ở phân vùng này, float ở phân vùng khác -> float)
+    written = pd.concat(processed) if len(processed) > 1 else processed[0]
+    # Ghép vào frame đầy đủ: cột cũ giữ vị trí (kể cả cột đổi tên), cột mới nối vào cuối theo thứ tự tạo
+    merged = df.rename(columns=renames) if any(col in df.columns for col in renames) else df
+    updates = {col: written[col].set_axis(merged.index) for col in written.columns}
+    if 'Genre' in df.columns:
+        rebuilt = MovieDataPreprocessor(df[['Genre']], verbose=False, copy=False).split_genres().get_processed_data()
+        updates.update({col: rebuilt[col] for col in REBUILT_COLUMNS})
+    # Thứ tự cột mới như khi chạy tuần tự (Genres_List trước Primary_Genre, ...)
+    _, writes, _ = _row_local_columns()
+    order = list(merged.columns) + [col for col in writes if col in updates and col not in merged.columns]
+    merged = merged.assign(**updates)[order]
+    print(f"✅ Đã chạy {len(ROW_LOCAL_STEPS)} bước theo dòng trên {len(parts)} phân vùng "
+          f"({min(workers, len(parts))} process, {time.perf_counter() - started:.2f}s)")
+    return merged
@@ -0,0 +1,208 @@
+"""
+Processed Schema
+Schema khai báo cố định cho dữ liệu phim đã xử lý: mỗi cột nhận một kiểu khai báo, không phụ
+thuộc số giá trị khác nhau hay có NaN hay không, nên kiểu giữ nguyên giữa các lần chạy, giữa
+các chunk và giữa đọc CSV / Parquet:
+- category cho cột chuỗi lặp lại nhiều (category có thứ tự cố định cho nhãn phân loại)
+- Int16/Int32/Int64 (nullable, NaN -> <NA>) cho cột nguyên
+- float32 cho cột số thực có ít chữ số có nghĩa
+Cột số chỉ được thu hẹp khi mọi giá trị giữ nguyên (xem narrow_fits): cột nguyên có giá trị lẻ
+(vd. median điền vào) hoặc vượt phạm vi, cột float32 có giá trị nhiều chữ số hơn float32 giữ
+được thì giữ kiểu số gốc thay vì làm tròn âm thầm.
+- list[str] cho Genres_List: Parquet lưu dạng list<string>, CSV lưu repr của list
+Schema được áp dụng cuối MovieDataPreprocessor và lại khi đọc (load_processed_data)
+để mọi nơi dùng dữ liệu đều nhận cùng kiểu.
+"""
+
+import ast
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Nhãn của categorize_rating / categorize_runtime (theo thứ tự tăng dần)
+RATING_LABELS = ['Poor', 'Average', 'Good', 'Excellent']
+RUNTIME_LABELS = ['Short', 'Medium', 'Long', 'Very Long']
+
+COMPACT_SCHEMA = {
+    # Chuỗi lặp lại nhiều -> category
+    'Primary_Genre': 'category',
+    'Primary_Country': 'category',
+    'Country': 'category',
+    'Director': 'category',
+    'Production': 'category',
+    'rating': 'category',
+    'genre': 'category',
+    'Genre': 'category',
+    'Language': 'category',
+    'Rating_Category': 'category',
+    'Runtime_Category': 'category',
+    # Số nguyên -> kiểu nguyên nullable đủ rộng cho mọi giá trị hợp lệ của cột
+    'ID': 'Int32',
+    'Year': 'Int16',
+    'Decade': 'Int16',
+    'Runtime': 'Int16',
+    'Genre_Count': 'Int16',
+    'Metascore': 'Int16',
+    'imdbVotes': 'Int32',
+    'Votes': 'Int32',
+    'budget': 'Int64',
+    'Budget': 'Int64',
+    # Số thực -> float32 (Rating 1 chữ số thập phân, ROI là tỉ số)
+    'Rating': 'float32',
+    'ROI': 'float32',
+    # Danh sách thể loại -> list[str]
+    'Genres_List': 'list',
+}
+
+# Category có thứ tự cố định (giữ được qua CSV)
+ORDERED_CATEGORIES = {
+    'Rating_Category': RATING_LABELS,
+    'Runtime_Category': RUNTIME_LABELS,
+}
+
+
+def _to_category(series: pd.Series, column: str) -> pd.Series:
+    labels = ORDERED_CATEGORIES.get(column)
+    if labels is not None:
+        dtype = pd.CategoricalDtype(labels, ordered=True)
+        if series.dtype == dtype:
+            return series
+        return pd.Series(pd.Categorical(series.astype(object), dtype=dtype), index=series.index, name=series.name)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Category đọc từ Parquet nhiều row group theo thứ tự gặp: sắp xếp như astype('category')
+        categories = series.cat.categories
+        if categories.is_monotonic_increasing:
+            return series
+        return series.cat.reorder_categories(categories.sort_values())
+    return series.astype('category')
+
+
+def _numeric(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    return pd.to_numeric(series, errors='coerce')
+
+
+def _float32_exact(values: np.ndarray) -> bool:
+    """
+    Mọi giá trị đọc lại đúng như cũ từ dạng thập phân ngắn nhất của float32 (vd. 7.1 -> "7.1"
+    -> 7.1), tức là không mất chữ số nào khi lưu float32 hay ghi ra CSV
+    """
+    unique = np.unique(values)
+    with np.errstate(over='ignore'):
+        narrow = unique.astype(np.float32)
+    return np.array_equal(narrow.astype(str).astype(np.float64), unique)
+
+
+def _integer_fits(values: np.ndarray, dtype: str) -> bool:
+    """Mọi giá trị là số nguyên nằm trong phạm vi của dtype"""
+    if not len(values):
+        return True
+    info = np.iinfo(pd.api.types.pandas_dtype(dtype).numpy_dtype)
+    return bool(np.isfinite(values).all() and (values == np.round(values)).all()
+                and values.min() >= info.min and values.max() <= info.max)
+
+
+def narrow_fits(series: pd.Series, kind: str) -> bool:
+    """Cột số đổi sang kiểu khai báo kind (float32 / Int16 / ...) mà không đổi giá trị nào"""
+    if series.dtype == kind:
+        return True
+    values = _numeric(series).to_numpy(dtype='float64', na_value=np.nan)
+    values = values[~np.isnan(values)]
+    if kind == 'float32':
+        return _float32_exact(values)
+    return _integer_fits(values, kind)
+
+
+def _to_integer(series: pd.Series, dtype: str) -> pd.Series:
+    """Kiểu nguyên nullable của cột; giữ kiểu số gốc nếu có giá trị lẻ hoặc vượt phạm vi"""
+    if series.dtype == dtype:
+        return series
+    series = _numeric(series)
+    return series.astype(dtype) if narrow_fits(series, dtype) else series
+
+
+def _to_float32(series: pd.Series) -> pd.Series:
+    """float32 nếu không mất chữ số nào, ngược lại giữ kiểu số gốc"""
+    if series.dtype == np.float32:
+        return series
+    series = _numeric(series)
+    return series.astype(np.float32) if narrow_fits(series, 'float32') else series
+
+
+def _to_list(series: pd.Series) -> pd.Series:
+    """
+    list[str] cho mỗi dòng (thiếu -> []), mỗi dòng một list riêng
+
+    Nhận list (in-memory), ndarray (đọc từ Parquet) hoặc repr của list (đọc từ CSV)
+    """
+    values = series.to_numpy(dtype=object)
+    if all(type(value) is list for value in values):
+        return series
+    parsed: Dict[str, list] = {}
+
+    def as_list(value) -> list:
+        if isinstance(value, list):
+            return value
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, str):
+            if value not in parsed:
+                parsed[value] = ast.literal_eval(value) if value.startswith('[') else \
+                    [item.strip() for item in value.split(',') if item.strip()]
+            return list(parsed[value])
+        return []
+
+    return pd.Series([as_list(value) for value in values], index=series.index, name=series.name, dtype=object)
+
+
+def compact_dtypes(df: pd.DataFrame, schema: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Áp dụng schema khai báo; cột đã đúng kiểu được giữ nguyên (không sao chép)
+
+    Args:
+        schema: Mặc định COMPACT_SCHEMA; cột không có trong schema giữ kiểu hiện tại
+    """
+    schema = COMPACT_SCHEMA if schema is None else schema
+    converted = {}
+    for column, kind in schema.items():
+        if column not in df.columns:
+            continue
+        series = df[column]
+        if kind == 'category':
+            result = _to_category(series, column)
+        elif kind == 'list':
+            result = _to_list(series)
+        elif kind == 'float32':
+            result = _to_float32(series)
+        else:
+            result = _to_integer(series, kind)
+        if result is not series:
+            converted[column] = result
+    return df.assign(**converted) if converted else df
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    """Bộ nhớ (MB) của DataFrame, tính cả nội dung chuỗi"""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def processed_parquet_path(csv_path: str) -> str:
+    """File Parquet đi kèm processed CSV (giữ nguyên kiểu dữ liệu)"""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def load_processed_data(path: str = 'data/processed_movies.csv', columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Đọc dữ liệu đã xử lý với schema gọn
+
+    Ưu tiên file Parquet đi kèm (giữ category/Int16/float32) nếu không cũ hơn CSV, nếu không
+    thì đọc CSV; cả hai đều qua compact_dtypes nên nhận cùng kiểu (Genres_List luôn là list).
+    """
+    parquet_path = processed_parquet_path(path)
+    if os.path.exists(parquet_path) and (not os.path.exists(path)
+                                         or os.path.getmtime(parquet_path) >= os.path.getmtime(path)):
+        return compact_dtypes(pd.read_parquet(parquet_path, columns=columns))
+    return compact_dtypes(pd.read_csv(path, encoding='utf-8-sig', usecols=columns))
@@ -0,0 +1,170 @@
+"""
+Rate Limiter cho OMDb API
+Token bucket (request/giây) + hạn mức request/ngày, chia sẻ giữa nhiều process
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+class QuotaExceededError(Exception):
+    """Đã dùng hết hạn mức request trong ngày"""
+
+
+@contextmanager
+def _file_lock(lock_path: str):
+    """Khóa độc quyền một file (dùng được giữa các process trên cùng máy)"""
+    with open(lock_path, 'a+') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK chỉ chờ ~10 giây rồi báo lỗi
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _today() -> str:
+    # OMDb reset hạn mức theo ngày, dùng ngày UTC để mọi process thống nhất
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+class TokenBucketRateLimiter:
+    """
+    Giới hạn tốc độ gọi API bằng token bucket
+
+    - rate_per_sec: số request trung bình mỗi giây, burst: số request tối đa gửi liền
+    - daily_quota: số request tối đa mỗi ngày (None = không giới hạn)
+    - state_path: file lưu trạng thái; các process dùng chung file sẽ dùng chung
+      một ngân sách. None = chỉ giữ trong bộ nhớ của process hiện tại.
+    """
+
+    def __init__(self, rate_per_sec: float = 5.0, burst: Optional[float] = None,
+                 daily_quota: Optional[int] = None, state_path: Optional[str] = None):
+        if rate_per_sec <= 0:
+            raise ValueError("rate_per_sec phải lớn hơn 0")
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst if burst is not None else max(1.0, rate_per_sec)
+        self.daily_quota = daily_quota
+        self.state_path = state_path
+        self._thread_lock = threading.Lock()
+        self._memory_state: Dict = {}
+
+        if state_path:
+            directory = os.path.dirname(state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def _load(self) -> Dict:
+        if not self.state_path:
+            return dict(self._memory_state)
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save(self, state: Dict):
+        if not self.state_path:
+            self._memory_state = state
+            return
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    @contextmanager
+    def _state(self):
+        """Đọc - sửa - ghi trạng thái trong vùng khóa"""
+        with self._thread_lock:
+            if self.state_path:
+                with _file_lock(self.state_path + '.lock'):
+                    state = self._refresh(self._load())
+                    yield state
+                    self._save(state)
+            else:
+                state = self._refresh(self._load())
+                yield state
+                self._save(state)
+
+    def _refresh(self, state: Dict) -> Dict:
+        """Nạp thêm token theo thời gian đã trôi qua, reset hạn mức khi sang ngày mới"""
+        now = time.time()
+        tokens = state.get('tokens', self.burst)
+        updated = state.get('updated', now)
+        tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate_per_sec)
+
+        today = _today()
+        used_today = state.get('used_today', 0) if state.get('day') == today else 0
+        return {'tokens': tokens, 'updated': now, 'day': today, 'used_today': used_today}
+
+    def try_acquire(self) -> float:
+        """
+        Thử lấy một token
+
+        Returns:
+            0 nếu lấy được, ngược lại là số giây nên chờ trước khi thử lại
+
+        Raises:
+            QuotaExceededError: nếu đã hết hạn mức trong ngày
+        """
+        with self._state() as state:
+            if self.daily_quota is not None and state['used_today'] >= self.daily_quota:
+                raise QuotaExceededError(
+                    f"Đã dùng hết {self.daily_quota} request trong ngày {state['day']} (UTC)"
+                )
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                state['used_today'] += 1
+                return 0.0
+            return (1 - state['tokens']) / self.rate_per_sec
+
+    def acquire(self):
+        """Chờ cho tới khi lấy được một token"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def remaining_quota(self) -> Optional[int]:
+        """Số request còn được phép gửi hôm nay (None nếu không giới hạn)"""
+        if self.daily_quota is None:
+            return None
+        with self._state() as state:
+            return max(0, self.daily_quota - state['used_today'])
+
+    def status(self) -> Dict:
+        """Trạng thái hiện tại của limiter"""
+        with self._state() as state:
+            return {
+                'rate_per_sec': self.rate_per_sec,
+                'tokens': state['tokens'],
+                'day': state['day'],
+                'used_today': state['used_today'],
+                'daily_quota': self.daily_quota,
+                'remaining_today': (None if self.daily_quota is None
+                                    else max(0, self.daily_quota - state['used_today'])),
+            }
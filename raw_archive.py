@@ -0,0 +1,206 @@
+"""
+Raw Archive cho dữ liệu OMDb
+Lưu nguyên response chi tiết phim (NDJSON nén gzip hoặc Parquet) và làm phẳng
+các trường lồng nhau / dạng chuỗi thành cột có kiểu trong một lượt vector hóa
+"""
+
+import gzip
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Ratings của OMDb: [{"Source": "Rotten Tomatoes", "Value": "87%"}, ...]
+RATINGS_TYPE = pa.list_(pa.struct([('Source', pa.string()), ('Value', pa.string())]))
+
+# Nguồn trong Ratings -> tên cột sau khi làm phẳng
+RATING_SOURCES = {
+    'Internet Movie Database': 'Rating_IMDb',          # thang 10
+    'Rotten Tomatoes': 'Rating_RottenTomatoes',        # thang 100 (%)
+    'Metacritic': 'Rating_Metacritic',                 # thang 100
+}
+
+_NUMBER_PATTERN = r'(?P<value>\d+(?:\.\d+)?)'
+
+
+def _archive_format(path: str) -> str:
+    if path.endswith('.parquet'):
+        return 'parquet'
+    if path.endswith('.ndjson.gz') or path.endswith('.jsonl.gz'):
+        return 'ndjson.gz'
+    if path.endswith('.ndjson') or path.endswith('.jsonl'):
+        return 'ndjson'
+    raise ValueError(f"Không hỗ trợ định dạng archive: {path} (.ndjson.gz, .ndjson hoặc .parquet)")
+
+
+def _schema_for(columns: List[str]) -> pa.Schema:
+    """Mọi trường của OMDb là chuỗi, riêng Ratings giữ dạng list<struct>"""
+    return pa.schema([(column, RATINGS_TYPE if column == 'Ratings' else pa.string())
+                      for column in columns])
+
+
+def _normalize(movie: Dict, columns: List[str]) -> Dict:
+    return {
+        column: (movie.get(column) if column == 'Ratings' or movie.get(column) is None
+                 else str(movie[column]))
+        for column in columns
+    }
+
+
+def write_raw_archive(movies: Iterable[Dict], path: str, columns: Optional[List[str]] = None,
+                      append: bool = False, chunk_size: int = 5000) -> int:
+    """
+    Ghi response chi tiết phim vào archive
+
+    - .ndjson.gz / .ndjson: mỗi dòng một response JSON nguyên bản; append=True ghi
+      thêm vào cuối (gzip cho phép nối nhiều member) - hợp với chế độ incremental
+    - .parquet: dạng cột nén zstd, Ratings lưu dạng list<struct> (không stringify);
+      cần danh sách columns (hoặc movies là list) vì Parquet có schema cố định
+
+    Returns:
+        Số phim đã ghi
+    """
+    archive_format = _archive_format(path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    count = 0
+    if archive_format != 'parquet':
+        opener = gzip.open if archive_format == 'ndjson.gz' else open
+        mode = 'at' if append else 'wt'
+        tmp_path = path if append else path + '.tmp'
+        with opener(tmp_path, mode, encoding='utf-8') as f:
+            for movie in movies:
+                f.write(json.dumps(movie, ensure_ascii=False) + '\n')
+                count += 1
+        if not append:
+            os.replace(tmp_path, path)
+        return count
+
+    if append:
+        raise ValueError("Archive Parquet không hỗ trợ append, dùng .ndjson.gz")
+    import pyarrow.parquet as pq
+
+    if columns is None:
+        movies = list(movies)
+        columns = list(dict.fromkeys(key for movie in movies for key in movie))
+    schema = _schema_for(columns)
+    tmp_path = path + '.tmp'
+    with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+        chunk = []
+        for movie in movies:
+            chunk.append(_normalize(movie, columns))
+            if len(chunk) >= chunk_size:
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            count += len(chunk)
+    os.replace(tmp_path, path)
+    return count
+
+
+def read_raw_archive(path: str) -> pa.Table:
+    """Đọc archive thành pyarrow.Table (parse JSON bằng C++, không duyệt từng dòng bằng Python)"""
+    archive_format = _archive_format(path)
+    if archive_format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(path)
+
+    import pyarrow.json as pj
+    compression = 'gzip' if archive_format == 'ndjson.gz' else None
+    # Ratings có thể rỗng ở mọi dòng, khai báo kiểu để không bị suy ra là null
+    parse_options = pj.ParseOptions(explicit_schema=pa.schema([('Ratings', RATINGS_TYPE)]),
+                                    unexpected_field_behavior='infer')
+    with pa.input_stream(path, compression=compression) as stream:
+        return pj.read_json(stream, parse_options=parse_options)
+
+
+def _numbers(values: Union[pa.Array, pa.ChunkedArray], strip: str = ',') -> np.ndarray:
+    """Lấy số đầu tiên trong chuỗi ('1,234,567', '$12,345', '142 min', '87%'); NaN nếu không có"""
+    values = pc.cast(values, pa.string())
+    for char in strip:
+        values = pc.replace_substring(values, char, '')
+    extracted = pc.struct_field(pc.extract_regex(values, _NUMBER_PATTERN), 'value')
+    return pc.cast(extracted, pa.float64()).to_numpy(zero_copy_only=False)
+
+
+def _flatten_ratings_list(ratings: Union[pa.Array, pa.ChunkedArray]) -> Dict[str, np.ndarray]:
+    """Ratings dạng list<struct>: tách theo Source bằng list_flatten + chỉ số dòng cha"""
+    if isinstance(ratings, pa.ChunkedArray):
+        ratings = ratings.combine_chunks()
+    count = len(ratings)
+    items = pc.list_flatten(ratings)
+    parents = pc.list_parent_indices(ratings).to_numpy(zero_copy_only=False)
+    sources = pc.struct_field(items, 'Source')
+    values = _numbers(pc.struct_field(items, 'Value'), strip='')
+
+    columns = {}
+    for source, column in RATING_SOURCES.items():
+        mask = pc.fill_null(pc.equal(sources, source), False).to_numpy(zero_copy_only=False)
+        out = np.full(count, np.nan)
+        out[parents[mask]] = values[mask]
+        columns[column] = out
+    return columns
+
+
+def _flatten_ratings_text(ratings: pd.Series) -> Dict[str, np.ndarray]:
+    """Ratings đã bị stringify (JSON hoặc repr của list trong CSV cũ): tách bằng regex vector hóa"""
+    ratings = ratings.astype('string')
+    columns = {}
+    for source, column in RATING_SOURCES.items():
+        pattern = rf"""{source}['"]\s*,\s*['"]Value['"]\s*:\s*['"]{_NUMBER_PATTERN}"""
+        columns[column] = pd.to_numeric(ratings.str.extract(pattern)['value'],
+                                        errors='coerce').to_numpy(dtype=float)
+    return columns
+
+
+def flatten_raw_movies(data: Union[pa.Table, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Làm phẳng dữ liệu thô của OMDb thành cột có kiểu
+
+    - Ratings -> Rating_IMDb, Rating_RottenTomatoes, Rating_Metacritic (float)
+    - imdbVotes '1,234,567' -> float
+    - BoxOffice '$1,234,567' -> float (USD)
+    - Runtime '142 min' -> float (phút)
+    Giá trị 'N/A' / thiếu thành NaN; các cột khác giữ nguyên.
+    """
+    if isinstance(data, pd.DataFrame):
+        table = pa.Table.from_pandas(data, preserve_index=False)
+    else:
+        table = data
+
+    typed = {}
+    if 'Ratings' in table.column_names:
+        ratings = table.column('Ratings')
+        if pa.types.is_list(ratings.type):
+            typed.update(_flatten_ratings_list(ratings))
+        else:
+            typed.update(_flatten_ratings_text(ratings.to_pandas()))
+        table = table.drop_columns(['Ratings'])
+
+    for column, strip in (('imdbVotes', ','), ('BoxOffice', '$,'), ('Runtime', ',')):
+        if column in table.column_names:
+            typed[column] = _numbers(table.column(column), strip=strip)
+
+    df = table.to_pandas()
+    for column, values in typed.items():
+        df[column] = values
+    return df
+
+
+def load_raw_archive(path: str, dedupe: bool = True) -> pd.DataFrame:
+    """
+    Đọc archive và làm phẳng; dedupe=True giữ bản mới nhất của mỗi imdbID
+    (archive NDJSON append qua nhiều lần chạy incremental có thể chứa bản cũ)
+    """
+    df = flatten_raw_movies(read_raw_archive(path))
+    if dedupe and 'imdbID' in df.columns:
+        df = df.drop_duplicates(subset='imdbID', keep='last').reset_index(drop=True)
+    return df
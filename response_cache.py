@@ -0,0 +1,177 @@
+"""
+Response Cache cho OMDb API
+Lưu response JSON trên đĩa (SQLite) để các lần chạy lại không phải tải lại
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import quote
+
+# Thời gian sống mặc định theo loại request (giây)
+DEFAULT_TTLS = {
+    'search': 7 * 24 * 3600,    # Kết quả tìm kiếm thay đổi khi có phim mới
+    'detail': 30 * 24 * 3600,   # Chi tiết phim (plot=full) hầu như không đổi
+}
+
+
+def endpoint_of(params: Dict) -> str:
+    """Xác định loại request OMDb từ tham số"""
+    if 's' in params:
+        return 'search'
+    if 'i' in params or 't' in params:
+        return 'detail'
+    return 'other'
+
+
+def make_cache_key(params: Dict) -> str:
+    """
+    Tạo key chuẩn hóa từ tham số request
+
+    Bỏ apikey (không ảnh hưởng nội dung), sắp xếp tham số, chuẩn hóa
+    khoảng trắng và chữ hoa/thường của từ khóa tìm kiếm. Tên và giá trị được
+    percent-encode để '&' / '=' trong từ khóa không làm hai request trùng key.
+    """
+    normalized = {}
+    for name, value in params.items():
+        if name == 'apikey' or value is None:
+            continue
+        value = str(value).strip()
+        if name == 's':
+            value = ' '.join(value.lower().split())
+        normalized[name] = value
+    return '&'.join(f"{quote(name, safe='')}={quote(normalized[name], safe='')}" for name in sorted(normalized))
+
+
+class OMDbResponseCache:
+    """
+    Cache response OMDb trong SQLite
+
+    - TTL riêng cho từng loại request (search / detail)
+    - Giới hạn dung lượng, loại bỏ bản ghi ít được dùng gần đây nhất (LRU); tổng dung lượng
+      được cộng dồn trong bảng cache_meta (dùng chung giữa các process) thay vì SUM mỗi lần ghi
+    - Đếm số lần hit / miss
+    """
+
+    def __init__(self, path: str = 'data/.omdb_cache.sqlite', ttls: Optional[Dict[str, float]] = None,
+                 max_bytes: int = 200 * 1024 * 1024):
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Dùng chung một connection giữa các luồng, truy cập được bảo vệ bởi self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS cache_meta (id INTEGER PRIMARY KEY CHECK (id = 0), '
+                           'total_bytes INTEGER NOT NULL)')
+        # Cache tạo từ phiên bản cũ chưa có tổng: tính một lần
+        self._conn.execute('INSERT OR IGNORE INTO cache_meta (id, total_bytes) '
+                           'SELECT 0, COALESCE(SUM(size), 0) FROM responses')
+        self._conn.commit()
+
+    def get(self, params: Dict) -> Optional[Dict]:
+        """Lấy response đã cache (None nếu chưa có hoặc đã hết hạn)"""
+        key = make_cache_key(params)
+        ttl = self.ttls.get(endpoint_of(params))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT body, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or (ttl is not None and now - row[1] > ttl):
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, params: Dict, data: Dict):
+        """Lưu response vào cache rồi loại bớt bản ghi cũ nếu vượt dung lượng"""
+        key = make_cache_key(params)
+        body = json.dumps(data, ensure_ascii=False)
+        now = time.time()
+        size = len(body.encode('utf-8'))
+        with self._lock:
+            # Ghi và cập nhật tổng trong một transaction để các process khác thấy tổng đúng
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, endpoint, body, size, created_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, endpoint_of(params), body, size, now, now)
+                )
+                self._add_total(size - (row[0] if row else 0))
+                self._evict()
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def _add_total(self, delta: int):
+        self._conn.execute('UPDATE cache_meta SET total_bytes = total_bytes + ? WHERE id = 0', (delta,))
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute('SELECT total_bytes FROM cache_meta WHERE id = 0').fetchone()[0]
+
+    def _evict(self):
+        """Xóa các bản ghi LRU cho tới khi tổng dung lượng <= max_bytes"""
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        keys = []
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany('DELETE FROM responses WHERE key = ?', keys)
+        self._add_total(-freed)
+
+    def stats(self) -> Dict:
+        """Thống kê cache: hit/miss, số bản ghi, dung lượng"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            size = self._total_bytes()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.execute('UPDATE cache_meta SET total_bytes = 0 WHERE id = 0')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,278 @@
+"""
+Sharded Collection - Thu thập dữ liệu OMDb bằng nhiều process / nhiều máy
+Mỗi worker xử lý một phần danh sách từ khóa và ghi ra file shard riêng,
+bước merge gộp các shard thành một raw_movies giống hệt khi chạy tuần tự
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from collection_metrics import CollectionMetrics
+from data_collection import POPULAR_QUERIES, MovieDataCollector
+from rate_limiter import QuotaExceededError, TokenBucketRateLimiter
+from response_cache import OMDbResponseCache
+
+
+def shard_path(shard_dir: str, shard_index: int, shard_count: int) -> str:
+    """Đường dẫn file của một shard (vd. shard-003-of-008.ndjson)"""
+    return os.path.join(shard_dir, f"shard-{shard_index:03d}-of-{shard_count:03d}.ndjson")
+
+
+def partial_marker_path(path: str) -> str:
+    """File đánh dấu shard bị dừng giữa chừng (vd. shard-003-of-008.ndjson.partial)"""
+    return path + '.partial'
+
+
+def shard_metrics(metrics_dir: str, shard_index: int, shard_count: int) -> CollectionMetrics:
+    """
+    Số liệu riêng của một shard (vd. omdb_collection.shard-003-of-008.json / .prom), nhãn
+    shard="3" để textfile collector không gặp series trùng giữa các process
+    """
+    name = f"omdb_collection.shard-{shard_index:03d}-of-{shard_count:03d}"
+    return CollectionMetrics(json_path=os.path.join(metrics_dir, name + '.json'),
+                             prometheus_path=os.path.join(metrics_dir, name + '.prom'),
+                             labels={'shard': str(shard_index)})
+
+
+def shard_queries(queries: List[str], shard_index: int, shard_count: int) -> List[int]:
+    """Vị trí các từ khóa thuộc về shard (chia xen kẽ để cân bằng tải)"""
+    return list(range(shard_index, len(queries), shard_count))
+
+
+def collect_shard(api_key: str, queries: List[str], shard_index: int, shard_count: int,
+                  shard_dir: str = 'data/shards', base_url: str = "http://www.omdbapi.com/",
+                  max_workers: int = 4, max_pages: int = 1, rate_per_sec: float = 5.0,
+                  daily_quota: Optional[int] = None, rate_limit_state: Optional[str] = None,
+                  cache_path: Optional[str] = None, metrics_dir: Optional[str] = None,
+                  metrics_flush_sec: Optional[float] = None) -> int:
+    """
+    Thu thập một shard và ghi ra file NDJSON
+
+    Mỗi dòng có dạng {"query_index", "position", "data"}: vị trí của phim trong
+    danh sách từ khóa gốc, dùng để merge theo đúng thứ tự của lần chạy tuần tự.
+    File được ghi vào .tmp rồi đổi tên nên chỉ shard chạy xong mới được merge.
+    Hết hạn mức giữa chừng thì shard vẫn được ghi với những phim đã lấy, kèm file
+    .partial ghi lý do và số từ khóa đã xong để merge báo lại.
+    Có metrics_dir thì số liệu của shard được ghi ra file riêng (xem shard_metrics),
+    ghi định kỳ mỗi metrics_flush_sec giây nếu có.
+
+    Returns:
+        Số phim đã ghi
+
+    Raises:
+        RuntimeError: nếu API key không hợp lệ (không ghi shard)
+    """
+    rate_limiter = TokenBucketRateLimiter(rate_per_sec=rate_per_sec, daily_quota=daily_quota,
+                                          state_path=rate_limit_state)
+    cache = OMDbResponseCache(cache_path) if cache_path else None
+    metrics = shard_metrics(metrics_dir, shard_index, shard_count) if metrics_dir else None
+    if metrics is not None and metrics_flush_sec:
+        metrics.start_periodic_flush(metrics_flush_sec)
+    collector = MovieDataCollector(api_key, base_url=base_url, rate_limiter=rate_limiter,
+                                   cache=cache, metrics=metrics)
+    try:
+        return _collect_shard(collector, metrics, queries, shard_index, shard_count, shard_dir,
+                              max_workers, max_pages)
+    finally:
+        if metrics is not None:
+            metrics.stop()
+            print(f"[shard {shard_index + 1}/{shard_count}] 📊 Số liệu: {metrics.summary_line()}")
+
+
+def _collect_shard(collector: MovieDataCollector, metrics: Optional[CollectionMetrics], queries: List[str],
+                   shard_index: int, shard_count: int, shard_dir: str, max_workers: int, max_pages: int) -> int:
+    """Phần thu thập và ghi file của collect_shard (số liệu được dừng và ghi ở collect_shard)"""
+    os.makedirs(shard_dir, exist_ok=True)
+    path = shard_path(shard_dir, shard_index, shard_count)
+    tmp_path = path + '.tmp'
+    query_indexes = shard_queries(queries, shard_index, shard_count)
+    prefix = f"[shard {shard_index + 1}/{shard_count}]"
+    print(f"{prefix} 🎬 {len(query_indexes)} từ khóa")
+
+    marker_path = partial_marker_path(path)
+    if os.path.exists(marker_path):
+        os.remove(marker_path)
+
+    seen_ids = set()
+    count = 0
+    done = 0
+    stopped = None
+    with open(tmp_path, 'w', encoding='utf-8') as f, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for query_index in query_indexes:
+                query = queries[query_index]
+                movies = collector.search_movies(query, max_pages=max_pages)
+                if movies is None:
+                    raise RuntimeError(f"{prefix} API key không hợp lệ")
+
+                pending = []
+                for position, movie in enumerate(movies):
+                    imdb_id = movie.get('imdbID')
+                    if imdb_id and imdb_id not in seen_ids:
+                        seen_ids.add(imdb_id)
+                        pending.append((position, imdb_id))
+
+                results = executor.map(collector.get_movie_details, [imdb_id for _, imdb_id in pending])
+                for (position, imdb_id), details in zip(pending, results):
+                    if details:
+                        record = {'query_index': query_index, 'position': position, 'data': details}
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                        count += 1
+                        if metrics is not None:
+                            metrics.record_titles()
+                    else:
+                        # Lấy lỗi thì cho phép lấy lại ở từ khóa sau (giống chạy tuần tự)
+                        seen_ids.discard(imdb_id)
+                done += 1
+                print(f"{prefix} 📍 {query}: {len(pending)} phim mới")
+        except QuotaExceededError as e:
+            # Hết hạn mức: giữ những phim đã lấy, đánh dấu shard chưa đủ
+            stopped = str(e)
+            if metrics is not None:
+                metrics.record_error('quota_exceeded')
+        except RuntimeError:
+            f.close()
+            os.remove(tmp_path)
+            raise
+
+    os.replace(tmp_path, path)
+    if stopped is not None:
+        with open(marker_path, 'w', encoding='utf-8') as marker:
+            json.dump({'reason': stopped, 'completed_queries': done,
+                       'total_queries': len(query_indexes)}, marker, ensure_ascii=False)
+        print(f"{prefix} ⛔ {stopped}. Dừng sau {done}/{len(query_indexes)} từ khóa, "
+              f"đã ghi {count} phim vào {path}")
+    else:
+        print(f"{prefix} ✅ Đã ghi {count} phim vào {path}")
+    return count
+
+
+def merge_shards(shard_dir: str, shard_count: int, save_path: str = 'data/raw_movies.csv') -> pd.DataFrame:
+    """
+    Gộp các shard: sắp theo (query_index, position), bỏ trùng imdbID (giữ lần xuất hiện đầu)
+
+    Kết quả giống với MovieDataCollector.collect_popular_movies chạy tuần tự
+    trên cùng danh sách từ khóa. Shard bị dừng giữa chừng (hết hạn mức) vẫn được gộp
+    và được liệt kê trong cảnh báo.
+    """
+    paths = [shard_path(shard_dir, index, shard_count) for index in range(shard_count)]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Thiếu {len(missing)} shard chưa chạy xong: {', '.join(missing)}")
+
+    for path in paths:
+        if os.path.exists(partial_marker_path(path)):
+            with open(partial_marker_path(path), 'r', encoding='utf-8') as f:
+                partial = json.load(f)
+            print(f"⚠️ {os.path.basename(path)} chưa đủ: {partial['completed_queries']}/"
+                  f"{partial['total_queries']} từ khóa ({partial['reason']})")
+
+    records = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    records.append((record['query_index'], record['position'], record['data']))
+    records.sort(key=lambda record: (record[0], record[1]))
+
+    seen_ids = set()
+    movies: List[Dict] = []
+    for _, _, details in records:
+        imdb_id = details.get('imdbID')
+        if imdb_id in seen_ids:
+            continue
+        seen_ids.add(imdb_id)
+        movies.append(details)
+
+    df = pd.DataFrame(movies)
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    df.to_csv(save_path, index=False, encoding='utf-8-sig')
+    print(f"\n✅ Đã gộp {shard_count} shard: {len(df)} phim vào {save_path}")
+    return df
+
+
+def run_sharded(api_key: str, queries: List[str], shard_count: int, shard_dir: str = 'data/shards',
+                save_path: str = 'data/raw_movies.csv', **shard_kwargs) -> Optional[pd.DataFrame]:
+    """
+    Chạy tất cả shard song song bằng ProcessPoolExecutor rồi merge
+
+    Returns:
+        DataFrame đã gộp, None nếu có shard thất bại (vd. API key không hợp lệ)
+    """
+    print(f"🚀 Thu thập bằng {shard_count} process, shard lưu tại {shard_dir}")
+    failed = []
+    with ProcessPoolExecutor(max_workers=shard_count) as executor:
+        futures = [
+            executor.submit(collect_shard, api_key, queries, index, shard_count, shard_dir, **shard_kwargs)
+            for index in range(shard_count)
+        ]
+        for future in futures:
+            try:
+                future.result()
+            except RuntimeError as e:
+                print(f"❌ {e}")
+                failed.append(e)
+    if failed:
+        print(f"\n❌ {len(failed)}/{shard_count} shard thất bại, không gộp")
+        return None
+    return merge_shards(shard_dir, shard_count, save_path)
+
+
+def main():
+    """
+    Ví dụ:
+        python sharded_collection.py --shards 8                       # chạy 8 process trên máy này
+        python sharded_collection.py --shards 8 --shard-index 3 \\
+            --shard-dir /mnt/shared/shards                            # máy thứ 4 chỉ chạy shard 3
+        python sharded_collection.py --shards 8 --merge \\
+            --shard-dir /mnt/shared/shards                            # gộp khi mọi shard đã xong
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Thu thập dữ liệu OMDb bằng nhiều shard')
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 1, help='Tổng số shard')
+    parser.add_argument('--shard-index', type=int, default=None, help='Chỉ chạy một shard (0-based)')
+    parser.add_argument('--merge', action='store_true', help='Chỉ gộp các shard đã có')
+    parser.add_argument('--shard-dir', default='data/shards')
+    parser.add_argument('--output', default='data/raw_movies.csv')
+    parser.add_argument('--workers', type=int, default=4, help='Số luồng lấy chi tiết trong mỗi shard')
+    parser.add_argument('--max-pages', type=int, default=int(os.getenv('OMDB_MAX_PAGES', '3')))
+    parser.add_argument('--base-url', default="http://www.omdbapi.com/")
+    args = parser.parse_args()
+
+    if args.merge:
+        merge_shards(args.shard_dir, args.shards, args.output)
+        return
+
+    api_key = os.getenv('OMDB_API_KEY')
+    if not api_key or api_key == 'your_api_key_here':
+        print("⚠️ Không tìm thấy API key. Tạo file .env với nội dung: OMDB_API_KEY=your_key")
+        return
+
+    # Các process trên cùng máy dùng chung một ngân sách request
+    shard_kwargs = dict(
+        base_url=args.base_url, max_workers=args.workers, max_pages=args.max_pages,
+        rate_per_sec=float(os.getenv('OMDB_RATE_PER_SEC', '5')),
+        daily_quota=int(os.getenv('OMDB_DAILY_QUOTA', '1000')),
+        rate_limit_state='data/.omdb_rate_limit.json',
+        cache_path=None if os.getenv('OMDB_CACHE', '1') == '0' else 'data/.omdb_cache.sqlite',
+        metrics_dir=os.getenv('OMDB_METRICS_DIR', 'data/metrics'),
+        metrics_flush_sec=float(os.environ['OMDB_METRICS_FLUSH_SEC']) if os.getenv('OMDB_METRICS_FLUSH_SEC') else None,
+    )
+
+    if args.shard_index is not None:
+        collect_shard(api_key, POPULAR_QUERIES, args.shard_index, args.shards, args.shard_dir, **shard_kwargs)
+    else:
+        run_sharded(api_key, POPULAR_QUERIES, args.shards, args.shard_dir, args.output, **shard_kwargs)
+
+
+if __name__ == '__main__':
+    main()